@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+アフィリエイトリンク正規化モジュール
+Amazon URL・'SEARCH:<query>' を日本リージョンのリンクに正規化してトラッキングIDを付ける
+同じリンクは何度も正規化されるため、(リンク, トラッキングID) ごとに結果をLRUキャッシュする
+"""
+
+import re
+from functools import lru_cache
+from urllib.parse import quote, urlparse, parse_qsl, urlencode, urlunparse
+
+# 記事本文中のAmazonリンク（URLに使えるASCII文字だけを拾い、直後の日本語や空白で止める）
+AMAZON_URL_PATTERN = re.compile(r"https?://(?:www\.)?amazon\.(?:co\.jp|com)/[A-Za-z0-9\-._~:/?#\[\]@!$&'()*+,;=%]*")
+# 文末の句読点・Markdownの閉じ括弧などはURLに含めない
+_TRAILING_PUNCTUATION = ".,;:!?'\")]"
+
+
+@lru_cache(maxsize=4096)
+def normalize_affiliate_link(base: str, tag: str) -> str:
+    """
+    任意の Amazon URL / 'SEARCH:<query>' を、
+    日本リージョンで確実に開けるリンクに正規化し、tag を必ず付ける。
+    """
+    if not base:
+        return ""
+
+    # 検索指定（SEARCH: クエリ）
+    if base.startswith("SEARCH:"):
+        q = base.split(":", 1)[1].strip()
+        return f"https://www.amazon.co.jp/s?k={quote(q)}&tag={tag}&language=ja_JP"
+
+    # URLでない場合は検索にフォールバック
+    if not base.startswith("http"):
+        q = base.strip()
+        return f"https://www.amazon.co.jp/s?k={quote(q)}&tag={tag}&language=ja_JP"
+
+    # URLを amazon.co.jp に正規化し、tag/language を追加
+    p = list(urlparse(base))
+    p[0] = "https"
+    p[1] = "www.amazon.co.jp"  # netloc を日本に固定
+    # 同じキーが複数あるパラメータも順序ごと残し、tag だけを差し替える
+    q = [(k, v) for k, v in parse_qsl(p[4], keep_blank_values=True) if k != "tag"]
+    q.append(("tag", tag))  # 既存があっても上書き
+    if not any(k == "language" for k, _ in q):
+        q.append(("language", "ja_JP"))
+    p[4] = urlencode(q)
+    return urlunparse(p)
+
+
+def _split_trailing(url: str):
+    """URLの末尾の句読点を (URL, 末尾) に分ける（対応する開き括弧がURL内にある閉じ括弧は残す）"""
+    end = len(url)
+    while end and url[end - 1] in _TRAILING_PUNCTUATION:
+        char = url[end - 1]
+        if char == ")" and url.count("(", 0, end) >= url.count(")", 0, end):
+            break
+        if char == "]" and url.count("[", 0, end) >= url.count("]", 0, end):
+            break
+        end -= 1
+    return url[:end], url[end:]
+
+
+def _retag_match(match, tag: str) -> str:
+    url, trailing = _split_trailing(match.group())
+    return normalize_affiliate_link(url, tag) + trailing
+
+
+def retag_text(text: str, tag: str) -> str:
+    """文字列中のAmazonリンクを、指定したトラッキングIDで正規化したリンクに置き換える"""
+    if "amazon." not in text:
+        return text
+    return AMAZON_URL_PATTERN.sub(lambda match: _retag_match(match, tag), text)
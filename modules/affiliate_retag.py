@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+保存済み記事のトラッキングID一括置き換えモジュール
+amazon_associate_id を変更したときに、generated_articles.json・article_history.json の記事本文と商品リンクを
+新しいトラッキングIDのリンクに書き換える
+ファイル全体を読み込まず、記事1件ずつデコード・書き換え・書き出しを行い、一時ファイルから置き換える
+本文を書き換えた履歴の記事は content_hash・content_length も計算し直す
+
+使い方:
+    python -m modules.affiliate_retag --tag newtag-22 data/generated_articles.json data/article_history.json
+"""
+
+import argparse
+import json
+import logging
+import os
+from typing import Any, Dict, List, TextIO, Tuple
+
+from .affiliate_links import retag_text
+from .article_history_manager import generate_content_hash
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+INDENT = 2
+
+_WHITESPACE = " \t\r\n"
+
+
+class _JsonStream:
+    """チャンク単位で読みながら、JSONの値を1つずつ raw_decode する"""
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 処理済みの部分は捨てて、保持するのは読みかけの値だけにする
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """空白を読み飛ばして次の文字を返す（終端なら空文字）"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSONの形式が不正です: '{char}' が必要な位置に '{found}' があります")
+        self.pos += 1
+
+    def read_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 数値などはチャンクの境目で途切れていても読めてしまうため、続きがあれば読み足して確認する
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def retag_value(value: Any, tag: str) -> Tuple[Any, int]:
+    """値に含まれる全ての文字列のAmazonリンクを書き換え、(新しい値, 書き換えた文字列の数) を返す"""
+    if isinstance(value, str):
+        retagged = retag_text(value, tag)
+        return retagged, int(retagged != value)
+    if isinstance(value, list):
+        items = [retag_value(item, tag) for item in value]
+        return [item for item, _ in items], sum(count for _, count in items)
+    if isinstance(value, dict):
+        changed = 0
+        result = {}
+        for key, item in value.items():
+            result[key], count = retag_value(item, tag)
+            changed += count
+        if "content_hash" in result and result.get("content") != value.get("content"):
+            # 履歴の記事は重複チェックに使うハッシュを本文に合わせる
+            result["content_hash"] = generate_content_hash(result["content"])
+            if "content_length" in result:
+                result["content_length"] = len(result["content"])
+        return result, changed
+    return value, 0
+
+
+def _dumps(value: Any, depth: int) -> str:
+    """json.dump(indent=2) でファイル全体を書いた場合と同じ字下げで1つの値を書き出す"""
+    text = json.dumps(value, ensure_ascii=False, indent=INDENT)
+    return text.replace("\n", "\n" + " " * (INDENT * depth))
+
+
+def _stream_array(stream: _JsonStream, out: TextIO, depth: int, tag: str, stats: Dict):
+    """配列の要素（記事）を1件ずつ書き換えて書き出す"""
+    stream.expect("[")
+    if stream.peek() == "]":
+        stream.pos += 1
+        out.write("[]")
+        return
+    out.write("[")
+    pad = "\n" + " " * (INDENT * (depth + 1))
+    first = True
+    while True:
+        record, changed = retag_value(stream.read_value(), tag)
+        stats["records"] += 1
+        stats["changed_strings"] += changed
+        out.write(("" if first else ",") + pad + _dumps(record, depth + 1))
+        first = False
+        if stream.peek() == ",":
+            stream.pos += 1
+            continue
+        stream.expect("]")
+        break
+    out.write("\n" + " " * (INDENT * depth) + "]")
+
+
+def retag_file(path: str, tag: str, chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    JSONファイルのリンクを1件ずつ書き換える
+
+    最上位が配列（generated_articles.json）ならその要素を、オブジェクト（article_history.json）なら
+    配列の値の要素を1件ずつ処理する。それ以外の値はそのまま書き換える。
+
+    Returns:
+        Dict: 処理した記事数・書き換えた文字列の数
+    """
+    stats = {"file": path, "records": 0, "changed_strings": 0}
+    tmp_file = path + ".tmp"
+    try:
+        with open(path, 'r', encoding='utf-8') as f, open(tmp_file, 'w', encoding='utf-8') as out:
+            stream = _JsonStream(f, chunk_size)
+            first_char = stream.peek()
+            if first_char == "[":
+                _stream_array(stream, out, 0, tag, stats)
+            elif first_char == "{":
+                stream.expect("{")
+                out.write("{")
+                first = True
+                while stream.peek() != "}":
+                    if not first:
+                        stream.expect(",")
+                    key = stream.read_value()
+                    stream.expect(":")
+                    out.write(("" if first else ",") + "\n" + " " * INDENT + json.dumps(key, ensure_ascii=False) + ": ")
+                    if stream.peek() == "[":
+                        _stream_array(stream, out, 1, tag, stats)
+                    else:
+                        value, changed = retag_value(stream.read_value(), tag)
+                        stats["changed_strings"] += changed
+                        out.write(_dumps(value, 1))
+                    first = False
+                stream.expect("}")
+                out.write("\n}" if not first else "}")
+            else:
+                raise ValueError(f"JSONの配列またはオブジェクトではありません: {path}")
+            if stream.peek():
+                raise ValueError(f"JSONの後に余分なデータがあります: {path}")
+        os.replace(tmp_file, path)
+    except Exception:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    logger.info(f"トラッキングIDを書き換えました: {stats}")
+    return stats
+
+
+def retag_files(paths: List[str], tag: str) -> List[Dict]:
+    """存在するファイルだけを順に書き換える"""
+    results = []
+    for path in paths:
+        if not os.path.exists(path):
+            logger.info(f"ファイルが無いためスキップ: {path}")
+            continue
+        results.append(retag_file(path, tag))
+    return results
+
+
+def main(argv=None):
+    """保存済み記事のリンクを新しいトラッキングIDに書き換えるCLI"""
+    parser = argparse.ArgumentParser(description="保存済み記事のAmazonリンクのトラッキングIDを書き換える")
+    parser.add_argument("paths", nargs="*", default=["data/generated_articles.json", "data/article_history.json"],
+                        help="書き換えるJSONファイル")
+    parser.add_argument("--tag", required=True, help="新しいトラッキングID（amazon.associate_id）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    for result in retag_files(args.paths, args.tag):
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
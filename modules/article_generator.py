@@ -7,29 +7,114 @@ import openai
 import random
 import logging
 import re
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 from .article_history_manager import ArticleHistoryManager
 from .similarity_analyzer import SimilarityAnalyzer
+from .llm_response_cache import LLMResponseCache
+from .rate_limiter import RateLimiter, backoff_delay, estimate_request_tokens, parse_retry_after
+from .prompt_templates import PromptTemplateRegistry, fallback_title
+from .request_resilience import CircuitBreaker, CircuitOpenError, HedgedRequestExecutor
+from .usage_ledger import UsageLedger, TokenBudgetExceeded
+from .single_flight import SingleFlight, make_flight_key
+from .title_pool import TitleCandidatePool
+from .fallback_article_engine import FallbackArticleEngine
+from .markdown_document import ArticleDocument, Block, PARAGRAPH, AFFILIATE_DISCLAIMER
+from .model_router import ModelRouter
 
 logger = logging.getLogger(__name__)
 
+# モデルルーターを無効にした場合に使うモデル
+DEFAULT_MODEL = "gpt-4.1-mini"
+
+TITLE_SYSTEM_PROMPT = "あなたはSEOに精通したコピーライターです。検索エンジンで上位表示されやすく、クリックされやすいタイトルを生成してください。タイトルは30文字以内で、具体的で魅力的にしてください。"
+
 class ArticleGenerator:
-    def __init__(self, openai_api_key: str, enable_duplicate_check: bool = True):
+    def __init__(self, openai_api_key: str, enable_duplicate_check: bool = True, llm_config: Optional[Dict] = None):
         """
         記事生成器を初期化
         
         Args:
             openai_api_key: OpenAI APIキー
             enable_duplicate_check: 重複チェック機能を有効にするか
+            llm_config: LLM呼び出しの設定（config.jsonの "llm" セクション）
         """
+        self.llm_config = llm_config or {}
+
         # OpenAI APIキーの検証
         if not openai_api_key or openai_api_key == "your-openai-api-key-here":
             raise ValueError("有効なOpenAI APIキーが設定されていません。config.jsonを確認してください。")
         
+        # レートリミッターを初期化（有効時は429の再試行をリミッター側で制御する）
+        rate_limit_config = self.llm_config.get('rate_limit', {})
+        if rate_limit_config.get('enabled', True):
+            self.rate_limiter = RateLimiter(
+                requests_per_minute=rate_limit_config.get('requests_per_minute', 500),
+                tokens_per_minute=rate_limit_config.get('tokens_per_minute', 200000),
+                max_concurrency=rate_limit_config.get('max_concurrency', 8),
+                min_concurrency=rate_limit_config.get('min_concurrency', 1)
+            )
+            self.max_rate_limit_retries = rate_limit_config.get('max_retries', 2)
+        else:
+            self.rate_limiter = None
+            self.max_rate_limit_retries = 0
+        self.backoff_base_seconds = rate_limit_config.get('backoff_base_seconds', 1.0)
+        self.backoff_max_seconds = rate_limit_config.get('backoff_max_seconds', 30.0)
+        
+        # ヘッジリクエストとサーキットブレーカーを初期化
+        hedging_config = self.llm_config.get('hedging', {})
+        if hedging_config.get('enabled', True):
+            self.hedger = HedgedRequestExecutor(
+                hedge_percentile=hedging_config.get('percentile', 0.95),
+                min_samples=hedging_config.get('min_samples', 20),
+                default_hedge_delay=hedging_config.get('default_delay_seconds', 15.0),
+                min_hedge_delay=hedging_config.get('min_delay_seconds', 1.0)
+            )
+        else:
+            self.hedger = None
+        
+        # サーキットブレーカーはモデルごと（フォールバック先のモデルの失敗で主モデルを止めない）
+        self.breaker_config = self.llm_config.get('circuit_breaker', {})
+        self.circuit_breakers: Optional[Dict[str, CircuitBreaker]] = {} if self.breaker_config.get('enabled', True) else None
+        self._breaker_lock = threading.Lock()
+        
+        # 呼び出し種別ごとのモデル選択（SLOを外れたモデルは降格してチェーンの次を使う）
+        routing_config = self.llm_config.get('model_routing', {})
+        if routing_config.get('enabled', True):
+            self.model_router = ModelRouter(
+                routes=routing_config.get('routes'),
+                window_size=routing_config.get('window_size', 50),
+                min_samples=routing_config.get('min_samples', 10),
+                max_error_rate=routing_config.get('max_error_rate', 0.3),
+                demote_seconds=routing_config.get('demote_seconds', 300.0)
+            )
+        else:
+            self.model_router = None
+        
+        # 同一プロンプトの同時リクエストを1回にまとめる
+        self.single_flight = SingleFlight() if self.llm_config.get('coalesce_requests', True) else None
+        
+        # トークン使用量台帳を初期化
+        ledger_config = self.llm_config.get('usage_ledger', {})
+        if ledger_config.get('enabled', True):
+            self.usage_ledger = UsageLedger(
+                ledger_file=ledger_config.get('ledger_file', 'data/llm_usage.jsonl'),
+                daily_token_budget=ledger_config.get('daily_token_budget')
+            )
+        else:
+            self.usage_ledger = None
+        
         # OpenAIクライアントの初期化
+        client_options = {"timeout": self.llm_config.get('timeout_seconds', 60.0)}
+        if self.llm_config.get('base_url'):
+            # ローカルのスタブサーバーなどOpenAI互換のエンドポイントを使う場合
+            client_options["base_url"] = self.llm_config['base_url']
+        if self.rate_limiter:
+            client_options["max_retries"] = 0
         try:
-            self.client = openai.OpenAI(api_key=openai_api_key)
+            self.client = openai.OpenAI(api_key=openai_api_key, **client_options)
         except Exception as e:
             logger.error(f"OpenAIクライアントの初期化に失敗: {e}")
             raise
@@ -50,6 +135,44 @@ class ArticleGenerator:
             self.history_manager = None
             self.similarity_analyzer = None
             logger.info("重複チェック機能は無効です")
+        
+        # レスポンスキャッシュを初期化
+        cache_config = self.llm_config.get('cache', {})
+        if cache_config.get('enabled', True):
+            self.response_cache = LLMResponseCache(
+                cache_dir=cache_config.get('cache_dir', 'data/llm_cache'),
+                max_entries=cache_config.get('max_entries', 1000),
+                max_bytes=cache_config.get('max_bytes', 50 * 1024 * 1024),
+                ttl_seconds=cache_config.get('ttl_seconds'),
+                replay_mode=cache_config.get('replay_mode', False),
+                access_flush_hits=cache_config.get('access_flush_hits', 20)
+            )
+        else:
+            self.response_cache = None
+        
+        # タイトル候補プール（まとめて生成した候補から過去記事と重ならないものを使う）
+        title_pool_config = self.llm_config.get('title_pool', {})
+        if title_pool_config.get('enabled', True):
+            self.title_pool = TitleCandidatePool(
+                history_manager=self.history_manager,
+                min_uniqueness=title_pool_config.get('min_uniqueness', 0.4)
+            )
+            self.title_batch_size = title_pool_config.get('batch_size', 8)
+        else:
+            self.title_pool = None
+            self.title_batch_size = 0
+        
+        # API障害時のフォールバック記事エンジン（過去記事と重なりにくい組み合わせを選ぶ）
+        fallback_config = self.llm_config.get('fallback_engine', {})
+        self.fallback_engine = FallbackArticleEngine(
+            history_manager=self.history_manager,
+            variants_per_section=fallback_config.get('variants_per_section', 4),
+            seed=fallback_config.get('seed')
+        )
+        
+        # 記事プロンプトのテンプレートレジストリ
+        self.prompt_registry = PromptTemplateRegistry(genre_prompt_provider=self._get_genre_specific_prompt)
+        
         self.article_types = ["レビュー", "ハウツー", "商品紹介"]
         self.hashtags_pool = {
             "占い": ["#占い", "#タロット", "#スピリチュアル", "#開運", "#パワーストーン", "#風水"],
@@ -62,7 +185,232 @@ class ArticleGenerator:
             "キッチン・時短家事": ["#キッチン", "#時短家事", "#便利グッズ", "#料理", "#暮らしの工夫"]
         }
     
-    def generate_seo_title(self, product_info: Dict, article_type: str) -> str:
+    def _create_chat_completion(self, call_type: str, messages: List[Dict], max_tokens: int,
+                                temperature: float, model: Optional[str] = None, use_cache: bool = True,
+                                context: Optional[Dict] = None) -> str:
+        """
+        Chat Completions APIを呼び出して応答本文を返す（レスポンスキャッシュ対応）
+        
+        Args:
+            call_type: 呼び出し種別（"title", "article" など。TTLの判定に使用）
+            messages: 送信するメッセージ
+            max_tokens: 最大トークン数
+            temperature: 温度パラメータ
+            model: 使用するモデル（省略時はモデルルーターが呼び出し種別ごとに選ぶ）
+            use_cache: Falseの場合はキャッシュを参照せず新しい応答を取得する
+            context: 使用量台帳に記録する付加情報（category, article_type など）
+        """
+        params = {"max_tokens": max_tokens, "temperature": temperature}
+        call_context = {"call_type": call_type, **(context or {})}
+        
+        # 試行するモデルの順序（キャッシュ・合流のキーには降格に左右されない主モデルを使う）
+        if model:
+            models = [model]
+        elif self.model_router:
+            model = self.model_router.primary_model(call_type)
+            models = self.model_router.select_models(call_type)
+        else:
+            model = DEFAULT_MODEL
+            models = [model]
+        
+        cache_key = None
+        if use_cache and self.response_cache and self.response_cache.is_cacheable(call_type):
+            cache_key = self.response_cache.make_key(model, messages, params)
+            cached = self.response_cache.get(cache_key, call_type)
+            if cached is not None:
+                logger.info(f"レスポンスキャッシュを使用 ({call_type})")
+                self._record_usage(cached.get("model", model), call_context, outcome="cache_hit")
+                return cached["content"]
+            if self.response_cache.replay_mode:
+                raise RuntimeError(f"replayモードでキャッシュが見つかりません ({call_type})")
+        
+        # 日次トークン予算を超えている場合は生成を止める
+        if self.usage_ledger:
+            self.usage_ledger.check_budget()
+        
+        def request():
+            return self._request_with_routing(models, messages, params, call_context)
+        
+        # 新しい応答が必要な呼び出し（use_cache=False）は合流させない
+        if use_cache and self.single_flight:
+            response, shared = self.single_flight.do(make_flight_key(model, messages, params), request)
+            if shared:
+                # 先行リクエストの応答を共有したため、使用量とキャッシュの記録は先行側に任せる
+                self._record_usage(model, call_context, outcome="coalesced")
+                return response.choices[0].message.content.strip()
+        else:
+            response = request()
+        content = response.choices[0].message.content.strip()
+        
+        if cache_key:
+            self.response_cache.put(cache_key, call_type, {"content": content, "model": getattr(response, 'model', None) or model})
+        
+        return content
+    
+    def _get_circuit_breaker(self, model: str) -> Optional[CircuitBreaker]:
+        if self.circuit_breakers is None:
+            return None
+        with self._breaker_lock:
+            breaker = self.circuit_breakers.get(model)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    failure_threshold=self.breaker_config.get('failure_threshold', 5),
+                    reset_timeout=self.breaker_config.get('reset_timeout_seconds', 60.0),
+                    name=model
+                )
+                self.circuit_breakers[model] = breaker
+            return breaker
+    
+    def _request_with_routing(self, models: List[str], messages: List[Dict], params: Dict, call_context: Dict):
+        """モデルチェーンを順に試す（サーキットブレーカーが開いているモデルは飛ばす）"""
+        last_error = None
+        for model in models:
+            breaker = self._get_circuit_breaker(model)
+            if breaker and not breaker.allow_request():
+                self._record_usage(model, call_context, outcome="circuit_open")
+                logger.warning(f"{model} のサーキットブレーカーが開いているため次のモデルを試します")
+                continue
+            try:
+                return self._request_with_rate_limit(model, messages, params, call_context, breaker)
+            except Exception as e:
+                last_error = e
+                if model != models[-1]:
+                    logger.warning(f"{model} の呼び出しに失敗したため次のモデルを試します: {e}")
+        
+        if last_error is None:
+            # 障害中は全モデルのタイムアウトを待たずにフォールバックへ回す
+            raise CircuitOpenError("全モデルのサーキットブレーカーが開いているためAPI呼び出しをスキップしました")
+        raise last_error
+    
+    def _request_with_rate_limit(self, model: str, messages: List[Dict], params: Dict, call_context: Dict,
+                                 breaker: Optional[CircuitBreaker] = None):
+        """
+        レートリミッターの枠内でAPIを呼び出す（429・タイムアウト時は同時実行数を下げて再試行）
+        
+        モデルルーターとサーキットブレーカーには、待ち行列や再試行の待ち時間を含まない
+        HTTP呼び出しのレイテンシと、再試行を尽くした最終的な成否だけを記録する。
+        """
+        call_type = call_context["call_type"]
+        estimated_tokens = estimate_request_tokens(messages, params.get('max_tokens', 0))
+        
+        for retry_index in range(self.max_rate_limit_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire(estimated_tokens)
+            started = time.monotonic()
+            try:
+                response = self._send_request(model, messages, params, call_type, estimated_tokens)
+            except Exception as e:
+                latency = time.monotonic() - started
+                outcome = self._classify_llm_error(e)
+                self._record_usage(model, call_context, latency=latency, retry_index=retry_index, outcome=outcome)
+                if self.rate_limiter:
+                    self.rate_limiter.release(estimated_tokens, outcome=outcome)
+                if outcome in ("rate_limited", "timeout") and retry_index < self.max_rate_limit_retries:
+                    # 枠を解放した状態で待つ（retry-after の指定があればそれ以上待つ）
+                    response_headers = getattr(getattr(e, 'response', None), 'headers', None)
+                    delay = backoff_delay(retry_index, self.backoff_base_seconds, self.backoff_max_seconds,
+                                          retry_after=parse_retry_after(response_headers))
+                    logger.warning(f"APIのレート制限により{delay:.1f}秒後に再試行します ({retry_index + 1}/{self.max_rate_limit_retries}): {e}")
+                    time.sleep(delay)
+                    continue
+                if self.model_router:
+                    self.model_router.record(call_type, model, latency, success=False)
+                if breaker:
+                    breaker.record_failure()
+                raise
+            
+            latency = time.monotonic() - started
+            usage = self._extract_usage(response)
+            self._record_usage(model, call_context, usage=usage, latency=latency,
+                               retry_index=retry_index, outcome="success")
+            if self.rate_limiter:
+                self.rate_limiter.release(estimated_tokens, actual_tokens=usage['total_tokens'] or None, outcome="success")
+            if self.model_router:
+                self.model_router.record(call_type, model, latency, success=True)
+            if breaker:
+                breaker.record_success()
+            return response
+    
+    def _send_request(self, model: str, messages: List[Dict], params: Dict, call_type: str, estimated_tokens: int):
+        """
+        確保済みの枠の中でHTTPリクエストを送る
+        
+        ヘッジはここだけに掛け、待ち行列や再試行の待ち時間をレイテンシに含めない。
+        ヘッジで追加送信した分はレートリミッターに計上する。
+        """
+        def create():
+            return self.client.chat.completions.create(model=model, messages=messages, **params)
+        
+        if not self.hedger:
+            return create()
+        on_hedge = (lambda: self.rate_limiter.charge(estimated_tokens)) if self.rate_limiter else None
+        return self.hedger.execute(create, key=call_type, on_hedge=on_hedge)
+    
+    def _record_usage(self, model: str, call_context: Dict, usage: Optional[Dict] = None,
+                      latency: float = 0.0, retry_index: int = 0, outcome: str = "success"):
+        """使用量台帳に1回分の呼び出しを記録"""
+        if not self.usage_ledger:
+            return
+        usage = usage or {}
+        context = dict(call_context)
+        call_type = context.pop('call_type')
+        self.usage_ledger.record(
+            call_type,
+            model,
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            completion_tokens=usage.get('completion_tokens', 0),
+            cached_tokens=usage.get('cached_tokens', 0),
+            latency=latency,
+            retry_index=retry_index,
+            outcome=outcome,
+            **context
+        )
+    
+    @staticmethod
+    def _extract_usage(response) -> Dict:
+        """レスポンスの usage をトークン数の辞書に変換"""
+        usage = getattr(response, 'usage', None)
+        details = getattr(usage, 'prompt_tokens_details', None) if usage else None
+        return {
+            "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+            "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0,
+            "total_tokens": getattr(usage, 'total_tokens', 0) or 0,
+            "cached_tokens": getattr(details, 'cached_tokens', 0) or 0
+        }
+    
+    @staticmethod
+    def _classify_llm_error(error: Exception) -> str:
+        """API呼び出しの例外を結果種別に分類"""
+        if isinstance(error, openai.RateLimitError):
+            return "rate_limited"
+        if isinstance(error, (openai.APITimeoutError, TimeoutError)):
+            return "timeout"
+        return "error"
+    
+    def get_rate_limit_metrics(self) -> Dict:
+        """レートリミッターのメトリクス（待ち行列の長さ・待機時間など）を取得"""
+        return self.rate_limiter.get_metrics() if self.rate_limiter else {}
+    
+    def get_resilience_metrics(self) -> Dict:
+        """ヘッジリクエストとサーキットブレーカーのメトリクスを取得"""
+        return {
+            "hedging": self.hedger.get_metrics() if self.hedger else {},
+            "circuit_breaker": {model: breaker.get_metrics() for model, breaker in list((self.circuit_breakers or {}).items())}
+        }
+    
+    def get_routing_metrics(self) -> Dict:
+        """モデルルーターのメトリクス（呼び出し種別×モデルごとのレイテンシ・エラー率・降格状態）を取得"""
+        return self.model_router.get_metrics() if self.model_router else {}
+    
+    def get_coalescing_metrics(self) -> Dict:
+        """リクエスト合流のメトリクス（実行数・合流数）を取得"""
+        return self.single_flight.get_metrics() if self.single_flight else {}
+    
+    def get_usage_summary(self, group_by: str = "call_type", since: Optional[str] = None) -> Dict:
+        """使用量台帳を集計（group_by: "day", "category", "call_type" など）"""
+        return self.usage_ledger.summarize(group_by, since) if self.usage_ledger else {}
+    
+    def generate_seo_title(self, product_info: Dict, article_type: str, use_cache: bool = True) -> str:
         """SEOを意識したタイトルを生成"""
         prompts = {
             "レビュー": f"「{product_info['name']}」の詳細レビュー記事のSEOタイトルを生成してください。商品の特徴やメリットを含め、検索されやすいタイトルにしてください。",
@@ -71,238 +419,157 @@ class ArticleGenerator:
         }
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4.1-mini",
+            # 候補プールから過去記事と重ならないタイトルを取り出す
+            if self.title_pool:
+                title = self._take_pooled_title(product_info, article_type, prompts[article_type], use_cache)
+                if title:
+                    return title
+            
+            title = self._create_chat_completion(
+                "title",
                 messages=[
-                    {"role": "system", "content": "あなたはSEOに精通したコピーライターです。検索エンジンで上位表示されやすく、クリックされやすいタイトルを生成してください。タイトルは30文字以内で、具体的で魅力的にしてください。"},
+                    {"role": "system", "content": TITLE_SYSTEM_PROMPT},
                     {"role": "user", "content": prompts[article_type]}
                 ],
                 max_tokens=100,
-                temperature=0.7
+                temperature=0.7,
+                use_cache=use_cache,
+                context={"category": product_info.get('selected_category'), "article_type": article_type}
             )
             
-            title = response.choices[0].message.content.strip()
-            # タイトルから余分な記号や改行を除去
-            title = re.sub(r'[「」『』]', '', title)
-            title = title.replace('\n', '').strip()
-            
-            return title
+            return self._clean_title(title)
+        except TokenBudgetExceeded:
+            raise
         except Exception as e:
             print(f"タイトル生成エラー: {e}")
             # フォールバック用のタイトル
-            fallback_titles = {
-                "レビュー": f"{product_info['name']}の詳細レビュー！実際に使ってみた感想",
-                "ハウツー": f"{product_info['selected_category']}初心者必見！{product_info['name']}の使い方ガイド",
-                "商品紹介": f"{product_info['selected_category']}のおすすめ商品5選！選び方のポイントも解説"
-            }
-            return fallback_titles[article_type]
+            return fallback_title(product_info['name'], product_info['selected_category'], article_type)
     
-    def generate_article_content(self, products: List[Dict], article_type: str, title: str) -> str:
+    def generate_title_candidates(self, product_info: Dict, article_type: str, prompt: str,
+                                  count: int, use_cache: bool = True) -> List[str]:
+        """1回の呼び出しで複数のタイトル候補を生成"""
+        content = self._create_chat_completion(
+            "title_batch",
+            messages=[
+                {"role": "system", "content": TITLE_SYSTEM_PROMPT},
+                {"role": "user", "content": f"{prompt}\nタイトルを{count}件、互いに切り口を変えて1行に1つずつ出力してください。番号や記号は付けないでください。"}
+            ],
+            max_tokens=60 * count,
+            temperature=0.9,
+            use_cache=use_cache,
+            context={"category": product_info.get('selected_category'), "article_type": article_type}
+        )
+        
+        titles = []
+        for line in content.split('\n'):
+            # 指示に反して付いた番号・箇条書き記号を除去
+            line = re.sub(r'^\s*(?:[-*・]|\d+[.)．、]|[（(]?\d+[）)])\s*', '', line)
+            title = self._clean_title(line)
+            if title and not title.startswith('http'):
+                titles.append(title)
+        return titles
+    
+    def _take_pooled_title(self, product_info: Dict, article_type: str, prompt: str, use_cache: bool) -> Optional[str]:
+        """候補プールからタイトルを取り出す（空の場合は候補をまとめて補充する）"""
+        product_name = product_info['name']
+        title = self.title_pool.take_best(product_name, article_type)
+        if title:
+            return title
+        
+        # キャッシュ済みの候補が全て使用済みだった場合は、キャッシュを使わずに取り直す
+        for use_cached_batch in ([True, False] if use_cache else [False]):
+            candidates = self.generate_title_candidates(
+                product_info, article_type, prompt, self.title_batch_size, use_cache=use_cached_batch
+            )
+            self.title_pool.add_candidates(product_name, article_type, candidates)
+            title = self.title_pool.take_best(product_name, article_type)
+            if title:
+                return title
+        return None
+    
+    @staticmethod
+    def _clean_title(title: str) -> str:
+        """タイトルから余分な記号や改行を除去"""
+        title = re.sub(r'[「」『』]', '', title)
+        return title.replace('\n', '').strip()
+    
+    def get_title_pool_metrics(self) -> Dict:
+        """タイトル候補プールのメトリクスを取得"""
+        return self.title_pool.get_metrics() if self.title_pool else {}
+    
+    def generate_article_content(self, products: List[Dict], article_type: str, title: str, use_cache: bool = True) -> str:
         """記事本文を生成"""
         main_product = products[0]
         category = main_product['selected_category']
         
-        # ジャンル別の記事生成プロンプト
-        genre_specific_prompts = self._get_genre_specific_prompt(category, main_product)
-        
-        # 記事タイプ別のプロンプト
-        prompts = {
-            "レビュー": f"""
-以下の商品について、実際に使用したかのような詳細なレビュー記事を日本語で書いてください。
-
-商品名: {main_product['name']}
-カテゴリ: {category}
-説明: {main_product['description']}
-価格帯: {main_product['price_range']}円
-
-{genre_specific_prompts}
-
-記事の構成:
-## 概要
-商品の基本情報と第一印象を自然な文章で説明
-
-## メリット
-実際に使ってみて感じた良い点を3つ程度、具体的なエピソードを交えて説明
-
-## デメリット
-気になった点や注意すべき点を2つ程度、客観的に説明
-
-## まとめ
-総合評価と、どのような人におすすめかを明確に記述
-
-要件:
-- 500-1000文字程度
-- 自然で読みやすい日本語
-- 実体験に基づいた具体的な表現
-- 読者にとって有益で信頼できる情報
-- 商品名は記事中に2-3回自然に登場
-- 過度な宣伝文句は避ける
-""",
-            "ハウツー": f"""
-以下の商品を活用した{category}のハウツー記事を日本語で書いてください。
-
-商品名: {main_product['name']}
-カテゴリ: {category}
-説明: {main_product['description']}
-
-記事の構成:
-## 概要
-なぜこの方法が効果的なのか、背景と目的を説明
-
-## メリット
-この方法を実践することで得られる具体的な利点
-
-## デメリット
-注意点や制限事項、失敗しやすいポイント
-
-## まとめ
-実践のコツと期待できる効果、継続のポイント
-
-要件:
-- 500-1000文字程度
-- 初心者でも理解できる分かりやすい説明
-- 具体的な手順やコツを含める
-- 実践的で役立つ情報
-- 自然で読みやすい日本語
-- 商品名は文脈に合わせて自然に組み込む
-""",
-            "商品紹介": f"""
-{category}分野のおすすめ商品について、比較検討に役立つ紹介記事を日本語で書いてください。
-
-主要商品: {main_product['name']}
-その他の商品: {', '.join([p['name'] for p in products[1:]])}
-
-記事の構成:
-## 概要
-{category}商品選びの重要性と、良い商品の見分け方
-
-## メリット
-おすすめ商品に共通する優れた特徴と利点
-
-## デメリット
-選ぶ際の注意点や、避けるべきポイント
-
-## まとめ
-最終的な推奨と、読者への具体的なアドバイス
-
-要件:
-- 500-1000文字程度
-- 比較の観点を含めた客観的な評価
-- 読者の選択に役立つ実用的な情報
-- 各商品の特徴を簡潔に説明
-- 自然で読みやすい日本語
-- 押し売り感のない信頼できる内容
-"""
-        }
+        # 静的な指示を先頭に、商品情報を末尾に置いたコンパイル済みテンプレートを使用
+        template = self.prompt_registry.get(article_type, category)
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {"role": "system", "content": """あなたは日本語が母語の経験豊富なアフィリエイトライターです。以下の要件を厳守してください：
-
-1. 自然で読みやすい日本語で書く
-2. 文章の流れを重視し、段落間の繋がりを意識する
-3. 読者目線で有益な情報を提供する
-4. 商品の良い面だけでなく、客観的な視点も含める
-5. 過度な宣伝文句は避け、信頼できる内容にする
-6. 文字数は500-1000文字程度に収める
-7. 見出しは「##」を使用してMarkdown形式で記述する"""},
-                    {"role": "user", "content": prompts[article_type]}
-                ],
+            content = self._create_chat_completion(
+                "article",
+                messages=template.build_messages(products),
                 max_tokens=1500,
-                temperature=0.6  # 温度を下げて一貫性を向上
+                temperature=0.6,  # 温度を下げて一貫性を向上
+                use_cache=use_cache,
+                context={"category": category, "article_type": article_type}
             )
             
-            content = response.choices[0].message.content.strip()
             return content
+        except TokenBudgetExceeded:
+            raise
         except Exception as e:
             print(f"記事生成エラー: {e}")
             return self._generate_fallback_content(products, article_type)
     
     def _generate_fallback_content(self, products: List[Dict], article_type: str) -> str:
-        """APIエラー時のフォールバック記事"""
-        main_product = products[0]
-        category = main_product['selected_category']
-        
-        fallback_content = f"""
-## 概要
-
-{category}分野で注目を集めている「{main_product['name']}」について詳しくご紹介します。{main_product['description']}として、多くの方に愛用されています。
-
-## メリット
-
-この商品の主な利点は以下の通りです：
-
-1. **使いやすさ**: 初心者の方でも簡単に始められる設計になっています。
-2. **コストパフォーマンス**: {main_product['price_range']}円という価格帯で、十分な価値を提供します。
-3. **信頼性**: 多くのユーザーから高い評価を得ている実績があります。
-
-## デメリット
-
-一方で、以下の点にご注意ください：
-
-1. **個人差**: 効果や使用感には個人差があります。
-2. **継続の必要性**: 最大限の効果を得るには継続的な使用が重要です。
-
-## まとめ
-
-「{main_product['name']}」は、{category}に興味のある方にとって価値のある選択肢です。特に初心者の方や、コストパフォーマンスを重視する方におすすめできます。
-"""
-        return fallback_content
+        """APIエラー時のフォールバック記事（フレーズバンクの組み合わせでオフライン生成）"""
+        return self.fallback_engine.compose(products, article_type)
     
     def insert_affiliate_links(self, content: str, products: List[Dict]) -> str:
         """記事中にアフィリエイトリンクをOGPリンクカード形式で自然に挿入"""
+        return self.build_linked_document(ArticleDocument.parse(content), products).to_markdown()
+    
+    def build_linked_document(self, document: ArticleDocument, products: List[Dict]) -> ArticleDocument:
+        """解析済みの記事にアフィリエイトリンク（OGPリンクカード）を配置したドキュメントを作成"""
         # アフィリエイト免責事項を冒頭に追加
-        disclaimer = "※本記事にはアフィリエイトリンクを含みます\n\n"
+        disclaimer = [Block(PARAGRAPH, AFFILIATE_DISCLAIMER)]
         
         if not products:
-            return disclaimer + content
+            return document.with_insertions({}, prefix=disclaimer)
         
         main_product = products[0]
         product_name = main_product['name']
         product_url = main_product.get('url', main_product.get('amazon_link', ''))
         
-        # 記事の構造を解析
-        sections = content.split('\n\n')
-        modified_sections = []
+        # 挿入位置 → その直前に置くブロック
+        insertions: Dict[int, List[Block]] = {}
         
-        link_inserted = False
-        
-        for i, section in enumerate(sections):
-            modified_sections.append(section)
-            
-            # メリット部分の後に自然な形でアフィリエイトリンクをOGPカード形式で挿入
-            if ('## メリット' in section or 'メリット' in section) and not link_inserted and product_url:
-                # 商品紹介文を追加
+        if product_url:
+            # メリットのセクションの後に自然な形でアフィリエイトリンクをOGPカード形式で挿入
+            merit_section = document.find_section('メリット', exclude='デメリット')
+            if merit_section:
+                position = merit_section[2]
                 intro_text = f"{product_name}は、多くの読者から高い評価を得ている商品です。詳細は以下からご確認いただけます。"
-                modified_sections.append(intro_text)
-                # OGPリンクカード生成のため、URLを単独行で配置
-                modified_sections.append(product_url)
-                link_inserted = True
-        
-        # もしまだリンクが挿入されていない場合は、記事の最後に自然な形で追加
-        if not link_inserted and product_url:
-            intro_text = f"今回ご紹介した{product_name}について、詳細は以下からご確認いただけます。"
-            modified_sections.append(intro_text)
+            else:
+                # メリットのセクションが無い場合は記事の最後に追加
+                position = len(document)
+                intro_text = f"今回ご紹介した{product_name}について、詳細は以下からご確認いただけます。"
             # OGPリンクカード生成のため、URLを単独行で配置
-            modified_sections.append(product_url)
-        
-        # 追加の商品がある場合は、まとめ部分に挿入
-        if len(products) > 1:
-            for j, product in enumerate(products[1:], 1):
-                additional_product_url = product.get('url', product.get('amazon_link', ''))
-                if additional_product_url:
-                    additional_intro = f"また、{product['name']}も併せてご検討ください。"
-                    # まとめ部分の前に挿入
-                    if len(modified_sections) > 2:
-                        modified_sections.insert(-1, additional_intro)
-                        modified_sections.insert(-1, additional_product_url)
-                    else:
-                        modified_sections.append(additional_intro)
-                        modified_sections.append(additional_product_url)
+            insertions.setdefault(position, []).extend([Block(PARAGRAPH, intro_text), Block.link_card(product_url)])
+        
+        # 追加の商品がある場合は、まとめ部分（最後の段落の前）に挿入
+        additional_blocks = []
+        for product in products[1:]:
+            additional_product_url = product.get('url', product.get('amazon_link', ''))
+            if additional_product_url:
+                additional_blocks.append(Block(PARAGRAPH, f"また、{product['name']}も併せてご検討ください。"))
+                additional_blocks.append(Block.link_card(additional_product_url))
+        if additional_blocks:
+            position = len(document) - 1 if len(document) > 1 else len(document)
+            insertions.setdefault(position, []).extend(additional_blocks)
         
-        return disclaimer + '\n\n'.join(modified_sections)
+        return document.with_insertions(insertions, prefix=disclaimer)
     
     def generate_note_tags(self, category: str, article_type: str) -> List[str]:
         """note用のタグを生成"""
@@ -355,15 +622,22 @@ class ArticleGenerator:
         main_product = products[0]
         category = main_product['selected_category']
         
+        # 日次トークン予算を使い切っている場合は生成しない
+        if self.usage_ledger:
+            self.usage_ledger.check_budget()
+        
         # 重複チェック機能が有効な場合、複数回試行
         for attempt in range(max_retries):
             logger.info(f"記事生成試行 {attempt + 1}/{max_retries}")
             
+            # 再生成時はキャッシュを使わず新しい応答を取得する
+            use_cache = attempt == 0
+            
             # タイトル生成
-            title = self.generate_seo_title(main_product, article_type)
+            title = self.generate_seo_title(main_product, article_type, use_cache=use_cache)
             
             # 記事本文生成
-            content = self.generate_article_content(products, article_type, title)
+            content = self.generate_article_content(products, article_type, title, use_cache=use_cache)
             
             # 重複チェック
             if self.enable_duplicate_check and self.history_manager and self.similarity_analyzer:
@@ -387,8 +661,9 @@ class ArticleGenerator:
                 else:
                     logger.info("類似記事は見つかりませんでした。記事生成を続行します。")
             
-            # アフィリエイトリンク挿入
-            final_content = self.insert_affiliate_links(content, products)
+            # アフィリエイトリンク挿入（以降の処理は解析済みのドキュメントを共有する）
+            document = self.build_linked_document(ArticleDocument.parse(content), products)
+            final_content = document.to_markdown()
             
             # タグ生成
             tags = self.generate_note_tags(category, article_type)
@@ -399,6 +674,7 @@ class ArticleGenerator:
             article_data = {
                 "title": title,
                 "content": final_content,
+                "document": document,
                 "tags": tags,
                 "x_post_patterns": x_patterns,
                 "article_type": article_type,
@@ -411,6 +687,7 @@ class ArticleGenerator:
             if self.enable_duplicate_check and self.history_manager:
                 try:
                     article_id = self.history_manager.add_article(article_data)
+                    article_data["history_id"] = article_id
                     logger.info(f"記事を履歴に追加しました (ID: {article_id})")
                 except Exception as e:
                     logger.warning(f"記事履歴への追加に失敗: {e}")
@@ -420,7 +697,7 @@ class ArticleGenerator:
         # ここに到達することはないが、安全のため
         raise RuntimeError("記事生成に失敗しました")
     
-    def _get_genre_specific_prompt(self, category: str, product: Dict) -> str:
+    def _get_genre_specific_prompt(self, category: str, product: Optional[Dict] = None) -> str:
         """ジャンル別の記事生成プロンプトを取得"""
         genre_prompts = {
             "占い": """
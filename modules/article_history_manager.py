@@ -13,8 +13,20 @@ import re
 from difflib import SequenceMatcher
 import logging
 
+from .product_record import as_dicts
+
 logger = logging.getLogger(__name__)
 
+
+def generate_content_hash(content: str) -> str:
+    """記事内容のハッシュ値を生成"""
+    # 記事内容を正規化（空白、改行、記号を統一）
+    normalized_content = re.sub(r'\s+', ' ', content.lower())
+    normalized_content = re.sub(r'[^\w\s]', '', normalized_content)
+
+    return hashlib.md5(normalized_content.encode('utf-8')).hexdigest()
+
+
 class ArticleHistoryManager:
     def __init__(self, history_file: str = "data/article_history.json"):
         self.history_file = history_file
@@ -71,9 +83,11 @@ class ArticleHistoryManager:
                 "category": article_data.get('category', ''),
                 "article_type": article_data.get('article_type', ''),
                 "tags": article_data.get('tags', []),
-                "products": article_data.get('products', []),
+                "products": as_dicts(article_data.get('products', [])),
                 "created_at": datetime.now().isoformat(),
                 "note_url": article_data.get('note_url', ''),
+                # 投稿が完了したら mark_posted() で True にする（商品ローテーションは投稿済みの記事だけを数える）
+                "posted": False,
                 "keywords": self.extract_keywords(article_data.get('content', ''))
             }
             
@@ -87,13 +101,22 @@ class ArticleHistoryManager:
             logger.error(f"記事の履歴追加に失敗: {e}")
             return None
     
+    def mark_posted(self, article_id: int, note_url: str = "") -> bool:
+        """履歴の記事を投稿済みにする"""
+        for article in reversed(self.history_data["articles"]):
+            if article.get("id") == article_id:
+                article["posted"] = True
+                article["posted_at"] = datetime.now().isoformat()
+                if note_url:
+                    article["note_url"] = note_url
+                self.save_history()
+                return True
+        logger.warning(f"投稿済みにする記事が履歴にありません (ID: {article_id})")
+        return False
+    
     def generate_content_hash(self, content: str) -> str:
         """記事内容のハッシュ値を生成"""
-        # 記事内容を正規化（空白、改行、記号を統一）
-        normalized_content = re.sub(r'\s+', ' ', content.lower())
-        normalized_content = re.sub(r'[^\w\s]', '', normalized_content)
-        
-        return hashlib.md5(normalized_content.encode('utf-8')).hexdigest()
+        return generate_content_hash(content)
     
     def extract_keywords(self, content: str) -> List[str]:
         """記事内容からキーワードを抽出"""
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+投稿前の記事検証モジュール
+ブラウザを起動する前に、文字数・見出し・免責事項・リンク数・タグ数・タイトルを検証し、
+その場で直せるものは修正し、直せないものは投稿対象から外す
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from .markdown_document import AFFILIATE_DISCLAIMER, LINK_CARD, PARAGRAPH, Block, ensure_document
+from .prompt_templates import fallback_title
+from .title_pool import TitleCandidatePool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUIRED_SECTIONS = ["概要", "メリット", "デメリット", "まとめ"]
+
+
+class ValidationResult:
+    def __init__(self, article: Dict, errors: List[str], repairs: List[str]):
+        """
+        Args:
+            article: 修正を反映した記事データ（元の記事データは変更しない）
+            errors: 修正できなかった問題（1件でもあれば投稿しない）
+            repairs: その場で修正した内容
+        """
+        self.article = article
+        self.errors = errors
+        self.repairs = repairs
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+
+class ArticleValidator:
+    def __init__(self, min_length: int = 300, max_length: int = 10000,
+                 required_sections: Optional[List[str]] = None, min_links: int = 1,
+                 min_tags: int = 1, max_tags: int = 5, title_pool: Optional[TitleCandidatePool] = None):
+        """
+        記事検証器を初期化
+
+        Args:
+            min_length: 本文の最小文字数（免責事項とURLを除く）
+            max_length: 本文の最大文字数
+            required_sections: 必須の見出し
+            min_links: 必要なリンクカード数
+            min_tags: 必要なタグ数（不足はカテゴリ名のタグで補う）
+            max_tags: タグ数の上限（超過分は切り詰める）
+            title_pool: URLになっていたタイトルの差し替えに使うタイトル候補プール
+        """
+        self.min_length = min_length
+        self.max_length = max_length
+        self.required_sections = required_sections or DEFAULT_REQUIRED_SECTIONS
+        self.min_links = min_links
+        self.min_tags = min_tags
+        self.max_tags = max_tags
+        self.title_pool = title_pool
+
+    def validate(self, article_data: Dict) -> ValidationResult:
+        """1件の記事を検証・修正"""
+        article = dict(article_data)
+        errors: List[str] = []
+        repairs: List[str] = []
+        products = article.get('products') or []
+        document = ensure_document(article.get('document') or article.get('content', ''))
+
+        # タイトル
+        title = (article.get('title') or '').strip()
+        if title.startswith('http'):
+            title = self._replacement_title(article, products)
+            repairs.append(f"URLのタイトルを置き換え: {title}")
+        if title:
+            article['title'] = title
+        else:
+            errors.append("タイトルがありません")
+
+        # 文字数
+        body_length = sum(
+            len(block.text) for block in document.blocks
+            if block.kind != LINK_CARD and block.text != AFFILIATE_DISCLAIMER
+        )
+        if body_length < self.min_length:
+            errors.append(f"本文が短すぎます（{body_length}文字 < {self.min_length}文字）")
+        elif body_length > self.max_length:
+            errors.append(f"本文が長すぎます（{body_length}文字 > {self.max_length}文字）")
+
+        # 見出し
+        headings = document.headings
+        for section in self.required_sections:
+            # 「メリット」が「デメリット」に一致しないよう、より長い必須見出しを含むものは除く
+            longer = [other for other in self.required_sections if other != section and section in other]
+            if not any(section in heading and not any(other in heading for other in longer) for heading in headings):
+                errors.append(f"見出し「{section}」がありません")
+
+        # リンクカード
+        if len(document.link_urls) < self.min_links:
+            product_url = products[0].get('url', products[0].get('amazon_link', '')) if products else ''
+            if product_url:
+                document = document.with_insertions({len(document): [
+                    Block(PARAGRAPH, f"今回ご紹介した{products[0]['name']}について、詳細は以下からご確認いただけます。"),
+                    Block.link_card(product_url)
+                ]})
+                repairs.append("商品リンクを末尾に追加")
+            if len(document.link_urls) < self.min_links:
+                errors.append(f"リンクが不足しています（{len(document.link_urls)}件 < {self.min_links}件）")
+
+        # 免責事項
+        if not any(AFFILIATE_DISCLAIMER in block.text for block in document.blocks):
+            document = document.with_insertions({}, prefix=[Block(PARAGRAPH, AFFILIATE_DISCLAIMER)])
+            repairs.append("免責事項を冒頭に追加")
+
+        # タグ
+        tags = list(dict.fromkeys(article.get('tags') or []))
+        if len(tags) > self.max_tags:
+            tags = tags[:self.max_tags]
+            repairs.append(f"タグを{self.max_tags}個に切り詰め")
+        if len(tags) < self.min_tags and article.get('category'):
+            tags.append(f"#{article['category']}")
+            repairs.append("カテゴリ名のタグを追加")
+        if len(tags) < self.min_tags:
+            errors.append(f"タグが不足しています（{len(tags)}個 < {self.min_tags}個）")
+        article['tags'] = tags
+
+        if repairs:
+            article['document'] = document
+            article['content'] = document.to_markdown()
+
+        return ValidationResult(article, errors, repairs)
+
+    def _replacement_title(self, article: Dict, products: List[Dict]) -> str:
+        """記事タイプに合ったタイトル（候補プールに未使用の候補があればそれを使う）"""
+        if not products:
+            return ""
+        name = products[0]['name']
+        article_type = article.get('article_type', "レビュー")
+        if self.title_pool:
+            title = self.title_pool.take_best(name, article_type)
+            if title:
+                return title
+        category = article.get('category') or products[0].get('selected_category', "")
+        return fallback_title(name, category, article_type)
+
+    def validate_batch(self, articles: List[Dict]) -> List[ValidationResult]:
+        """複数の記事を順に検証（結果は入力と同じ順序）"""
+        return [self.validate(article) for article in articles]
+
+    @staticmethod
+    def log_result(result: ValidationResult):
+        """検証結果をログに出力"""
+        title = result.article.get('title', '')
+        for repair in result.repairs:
+            logger.info(f"記事を修正 ({title}): {repair}")
+        for error in result.errors:
+            logger.warning(f"記事の検証に失敗 ({title}): {error}")
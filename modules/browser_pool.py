@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+ブラウザプールモジュール
+Chromium をスケジューラーの実行中ずっと起動したままにし、投稿ごとに新しい BrowserContext を払い出す
+投稿のたびにブラウザを起動・終了する時間とメモリの急増を避けつつ、Cookie等は投稿ごとに保存済みセッションから作り直す
+一定回数使ったブラウザやメモリ使用量（RSS）が上限を超えたブラウザは入れ替え、落ちたブラウザは次の払い出し時に起動し直す
+"""
+
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Set
+
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_ARGS = ['--no-sandbox', '--disable-dev-shm-usage']
+_BROWSER_PROCESS_NAMES = ('chrome', 'chromium', 'headless_shell')
+
+
+def _list_pids() -> Set[int]:
+    """/proc から実行中のプロセスIDを取得（/proc が無い環境では空）"""
+    try:
+        return {int(name) for name in os.listdir('/proc') if name.isdigit()}
+    except OSError:
+        return set()
+
+
+def _read_stat(pid: int) -> Optional[Dict]:
+    """プロセスの名前・親プロセスID・RSS（KB）"""
+    try:
+        with open(f'/proc/{pid}/status', 'r', encoding='utf-8') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+    except (OSError, ValueError):
+        return None
+    rss = status.get('VmRSS', '0 kB').split()[0]
+    return {
+        'name': status.get('Name', '').strip(),
+        'ppid': int(status.get('PPid', '0').strip() or 0),
+        'rss_kb': int(rss) if rss.isdigit() else 0
+    }
+
+
+def _find_browser_root(before: Set[int]) -> Optional[int]:
+    """起動前後の差分から、新しく起動したブラウザの親プロセスを探す"""
+    stats = {pid: _read_stat(pid) for pid in _list_pids() - before}
+    started = {pid: stat for pid, stat in stats.items()
+               if stat and any(name in stat['name'].lower() for name in _BROWSER_PROCESS_NAMES)}
+    roots = [pid for pid, stat in started.items() if stat['ppid'] not in started]
+    return min(roots) if roots else None
+
+
+def process_tree_rss_mb(root_pid: Optional[int]) -> float:
+    """ブラウザ本体とその子プロセス（レンダラー・GPUなど）のRSS合計（MB）。取得できなければ0"""
+    if not root_pid:
+        return 0.0
+    stats = {pid: _read_stat(pid) for pid in _list_pids()}
+    children: Dict[int, List[int]] = {}
+    for pid, stat in stats.items():
+        if stat:
+            children.setdefault(stat['ppid'], []).append(pid)
+    total_kb = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        stat = stats.get(pid)
+        if not stat:
+            continue
+        total_kb += stat['rss_kb']
+        stack.extend(children.get(pid, []))
+    return total_kb / 1024
+
+
+class _PooledBrowser:
+    """プール内の1つのブラウザと使用状況"""
+
+    __slots__ = ('browser', 'pid', 'uses', 'active', 'retiring', 'crashed')
+
+    def __init__(self, browser: Browser, pid: Optional[int]):
+        self.browser = browser
+        self.pid = pid
+        self.uses = 0
+        self.active = 0
+        self.retiring = False
+        self.crashed = False
+
+    @property
+    def available(self) -> bool:
+        return not self.retiring and not self.crashed and self.browser.is_connected()
+
+
+class BrowserPool:
+    def __init__(self, headless: bool = True, size: int = 1, max_uses: int = 20, max_rss_mb: float = 1024):
+        """
+        ブラウザプールを初期化
+
+        Args:
+            headless: ヘッドレスモードで起動するか
+            size: 同時に起動しておくブラウザの数
+            max_uses: 1つのブラウザで作るコンテキストの上限（超えたら入れ替える）
+            max_rss_mb: ブラウザ1つあたりのメモリ使用量の上限（MB、0以下で確認しない）
+        """
+        self.headless = headless
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.playwright = None
+        self.browsers: List[_PooledBrowser] = []
+        self.contexts: Dict[BrowserContext, _PooledBrowser] = {}
+        # asyncio.run ごとにイベントループが変わるため、ロックは実行中のループで作る
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+        self.stats = {'launched': 0, 'recycled': 0, 'crashed': 0, 'contexts': 0}
+
+    def _get_lock(self) -> asyncio.Lock:
+        """実行中のイベントループのロック（ループが変わったら作り直す）"""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def start(self):
+        """Playwright を起動（ブラウザは最初の払い出し時に起動する）"""
+        if self.playwright is None:
+            self.playwright = await async_playwright().start()
+            logger.info(f"ブラウザプールを開始しました（最大{self.size}個）")
+
+    async def stop(self):
+        """全てのブラウザと Playwright を終了"""
+        async with self._get_lock():
+            for pooled in self.browsers:
+                await self._close_browser(pooled)
+            self.browsers = []
+            self.contexts.clear()
+            if self.playwright is not None:
+                await self.playwright.stop()
+                self.playwright = None
+                logger.info(f"ブラウザプールを終了しました: {self.stats}")
+
+    async def _launch(self) -> _PooledBrowser:
+        before = _list_pids()
+        browser = await self.playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        pooled = _PooledBrowser(browser, _find_browser_root(before))
+
+        def on_disconnected(_):
+            if not pooled.retiring:
+                pooled.crashed = True
+                logger.warning("プール内のブラウザが予期せず終了しました（次の払い出し時に起動し直します）")
+
+        browser.on('disconnected', on_disconnected)
+        self.browsers.append(pooled)
+        self.stats['launched'] += 1
+        logger.info(f"ブラウザを起動しました（PID: {pooled.pid}）")
+        return pooled
+
+    async def _close_browser(self, pooled: _PooledBrowser):
+        pooled.retiring = True
+        try:
+            if pooled.browser.is_connected():
+                await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f"ブラウザの終了に失敗: {e}")
+
+    async def _retire(self, pooled: _PooledBrowser, reason: str):
+        """入れ替え対象にし、使用中のコンテキストが無くなった時点で終了する"""
+        if not pooled.retiring:
+            pooled.retiring = True
+            self.stats['recycled'] += 1
+            logger.info(f"ブラウザを入れ替えます（{reason}）")
+        if pooled.active == 0:
+            await self._close_browser(pooled)
+            if pooled in self.browsers:
+                self.browsers.remove(pooled)
+
+    async def _sweep(self):
+        """落ちたブラウザを取り除く"""
+        for pooled in list(self.browsers):
+            if pooled.crashed or (not pooled.retiring and not pooled.browser.is_connected()):
+                self.stats['crashed'] += 1
+                self.browsers.remove(pooled)
+                for context, owner in list(self.contexts.items()):
+                    if owner is pooled:
+                        del self.contexts[context]
+
+    async def _select(self) -> _PooledBrowser:
+        await self._sweep()
+        candidates = [pooled for pooled in self.browsers if pooled.available]
+        if len(candidates) < self.size:
+            return await self._launch()
+        return min(candidates, key=lambda pooled: (pooled.active, pooled.uses))
+
+    async def new_context(self, **context_options) -> BrowserContext:
+        """
+        新しいコンテキストを払い出す（使い終わったら release() を呼ぶ）
+
+        Args:
+            context_options: browser.new_context() の引数（user_agent・storage_state など）
+
+        Returns:
+            BrowserContext: このプールのブラウザで作ったコンテキスト
+        """
+        await self.start()
+        async with self._get_lock():
+            for attempt in range(2):
+                pooled = await self._select()
+                try:
+                    context = await pooled.browser.new_context(**context_options)
+                except Exception:
+                    if attempt or pooled.browser.is_connected():
+                        raise
+                    # 払い出しの直前に落ちていたブラウザは起動し直して1回だけやり直す
+                    pooled.crashed = True
+                    continue
+                pooled.uses += 1
+                pooled.active += 1
+                self.contexts[context] = pooled
+                self.stats['contexts'] += 1
+                return context
+
+    async def release(self, context: BrowserContext):
+        """コンテキストを閉じ、使用回数・メモリ使用量を見てブラウザを入れ替える"""
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"コンテキストの終了に失敗: {e}")
+        async with self._get_lock():
+            pooled = self.contexts.pop(context, None)
+            if pooled is None:
+                return
+            pooled.active -= 1
+            if pooled.retiring:
+                await self._retire(pooled, "入れ替え待ち")
+            elif self.max_uses and pooled.uses >= self.max_uses:
+                await self._retire(pooled, f"使用回数 {pooled.uses}回")
+            elif self.max_rss_mb > 0:
+                rss_mb = process_tree_rss_mb(pooled.pid)
+                if rss_mb > self.max_rss_mb:
+                    await self._retire(pooled, f"メモリ使用量 {rss_mb:.0f}MB")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+商品カタログの列指向ビュー
+価格帯を数値の最小・最大価格の配列に、ジャンルを整数コードに、キーワードをビット集合に変換し、
+「X円以下・ジャンルY・キーワードZを共有する商品」のような条件をベクトル演算でまとめて評価する
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_PRICE_PATTERN = re.compile(r'(\d[\d,]*)')
+
+# 0-255 の各値の立っているビット数
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def parse_price_range(price_range: str) -> Tuple[float, float]:
+    """
+    "15000-30000" 形式の価格帯を (最小, 最大) に変換
+
+    単一の価格は (価格, 価格)、解釈できない場合は (nan, nan) を返す。
+    """
+    values = [float(value.replace(',', '')) for value in _PRICE_PATTERN.findall(str(price_range or ''))]
+    if not values:
+        return float('nan'), float('nan')
+    return min(values), max(values)
+
+
+class CatalogColumns:
+    def __init__(self, products: Iterable[Dict]):
+        """
+        列指向ビューを構築
+
+        Args:
+            products: "id", "genre", "keywords", "price_range" を持つ商品レコード（カタログ順）
+        """
+        products = list(products)
+        self.ids: List[str] = [product["id"] for product in products]
+        self.row_of: Dict[str, int] = {product_id: row for row, product_id in enumerate(self.ids)}
+
+        prices = [parse_price_range(product.get("price_range", "")) for product in products]
+        self.min_price = np.array([price[0] for price in prices], dtype=np.float64)
+        self.max_price = np.array([price[1] for price in prices], dtype=np.float64)
+
+        # ジャンルは出現順に整数コードへ
+        self.genre_names: List[str] = []
+        self.genre_codes: Dict[str, int] = {}
+        codes = []
+        for product in products:
+            genre = product.get("genre", "")
+            if genre not in self.genre_codes:
+                self.genre_codes[genre] = len(self.genre_names)
+                self.genre_names.append(genre)
+            codes.append(self.genre_codes[genre])
+        self.genre = np.array(codes, dtype=np.int32)
+
+        # キーワードはビット位置を割り当て、商品ごとに uint8 のビット列に詰める
+        self.keyword_bits: Dict[str, int] = {}
+        rows = []
+        for product in products:
+            bits = []
+            for keyword in product.get("keywords", []):
+                key = keyword.lower()
+                if key not in self.keyword_bits:
+                    self.keyword_bits[key] = len(self.keyword_bits)
+                bits.append(self.keyword_bits[key])
+            rows.append(bits)
+        width = max(1, (len(self.keyword_bits) + 7) // 8)
+        self.keywords = np.zeros((len(products), width), dtype=np.uint8)
+        for row, bits in enumerate(rows):
+            for bit in bits:
+                self.keywords[row, bit >> 3] |= np.uint8(1 << (bit & 7))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def keyword_mask(self, keywords: Iterable[str]) -> np.ndarray:
+        """キーワードの集合を1行分のビット列に変換（未知のキーワードは無視）"""
+        mask = np.zeros(self.keywords.shape[1], dtype=np.uint8)
+        for keyword in keywords:
+            bit = self.keyword_bits.get(keyword.lower())
+            if bit is not None:
+                mask[bit >> 3] |= np.uint8(1 << (bit & 7))
+        return mask
+
+    def shared_keyword_counts(self, mask: np.ndarray) -> np.ndarray:
+        """各商品がビット列 mask と共有するキーワード数"""
+        # mask のビットが立っているバイト列だけを見る（キーワード数が多くても数列分の計算で済む）
+        columns = np.flatnonzero(mask)
+        if columns.size == 0:
+            return np.zeros(len(self.ids), dtype=np.int64)
+        return _POPCOUNT[self.keywords[:, columns] & mask[columns]].sum(axis=1, dtype=np.int64)
+
+    def filter(self, genres: Optional[Iterable[str]] = None, price_max: Optional[float] = None,
+               price_min: Optional[float] = None, keywords_any: Optional[Iterable[str]] = None,
+               keywords_all: Optional[Iterable[str]] = None, exclude_ids: Iterable[str] = ()) -> np.ndarray:
+        """
+        条件を満たす行の真偽値配列
+
+        Args:
+            genres: いずれかのジャンルに属する
+            price_max: 価格帯の上限がこの金額以下
+            price_min: 価格帯の下限がこの金額以上
+            keywords_any: いずれかのキーワードを持つ
+            keywords_all: 全てのキーワードを持つ
+            exclude_ids: 除外する商品ID
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        if genres is not None:
+            codes = [self.genre_codes[genre] for genre in genres if genre in self.genre_codes]
+            mask &= np.isin(self.genre, codes)
+        if price_max is not None:
+            mask &= self.max_price <= price_max
+        if price_min is not None:
+            mask &= self.min_price >= price_min
+        if keywords_any is not None:
+            mask &= self.shared_keyword_counts(self.keyword_mask(keywords_any)) > 0
+        if keywords_all is not None:
+            keywords_all = list(keywords_all)
+            required = self.keyword_mask(keywords_all)
+            # 未知のキーワードを含む場合は該当なし
+            if int(_POPCOUNT[required].sum()) < len({keyword.lower() for keyword in keywords_all}):
+                mask[:] = False
+            else:
+                columns = np.flatnonzero(required)
+                mask &= ((self.keywords[:, columns] & required[columns]) == required[columns]).all(axis=1)
+        for product_id in exclude_ids:
+            row = self.row_of.get(product_id)
+            if row is not None:
+                mask[row] = False
+        return mask
+
+    def query(self, **conditions) -> List[str]:
+        """条件（filter と同じ引数）を満たす商品IDをカタログ順に返す"""
+        return [self.ids[row] for row in np.flatnonzero(self.filter(**conditions))]
+
+    def related(self, product_id: str, limit: int, price_ratio: Optional[float] = 1.5,
+                same_genre: bool = True) -> List[str]:
+        """
+        指定した商品と関連の強い商品IDを返す
+
+        共有キーワード数が多い順、同数なら中心価格が近い順。
+        price_ratio を指定した場合は、価格帯の上限が基準商品の上限×price_ratio 以下の商品に絞る。
+        """
+        row = self.row_of.get(product_id)
+        if row is None or limit <= 0:
+            return []
+        genres = [self.genre_names[self.genre[row]]] if same_genre else None
+        price_max = None
+        if price_ratio is not None and not np.isnan(self.max_price[row]):
+            price_max = self.max_price[row] * price_ratio
+        mask = self.filter(genres=genres, price_max=price_max, exclude_ids=[product_id])
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+
+        shared = self.shared_keyword_counts(self.keywords[row])[candidates]
+        center = (self.min_price + self.max_price) / 2
+        distance = np.abs(center[candidates] - center[row])
+        distance = np.where(np.isnan(distance), np.inf, distance)
+        # lexsort は最後のキーが第1キー
+        order = np.lexsort((candidates, distance, -shared))
+        return [self.ids[candidates[i]] for i in order[:limit]]
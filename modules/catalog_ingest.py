@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+商品カタログ取り込みモジュール
+保存済みのAmazon商品ページ・検索結果ページのHTMLをプロセスプールでlxmlにより解析し、
+商品名・ASIN・価格・キーワードを抽出して、ASINで重複を除いたうえで商品カタログへ差分マージする
+前回から内容の変わっていないファイル（SHA-256が同じ）は解析しない
+
+使い方:
+    python -m modules.catalog_ingest saved_pages/gadgets --genre 家電・ガジェット
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from lxml import html
+
+from .catalog_columns import parse_price_range
+from .product_index import split_terms
+
+logger = logging.getLogger(__name__)
+
+HTML_SUFFIXES = (".html", ".htm")
+MAX_KEYWORDS = 5
+MAX_DESCRIPTION_LENGTH = 100
+
+_ASIN_PATTERN = re.compile(r'^[A-Z0-9]{10}$')
+_DP_PATTERN = re.compile(r'/(?:dp|gp/product)/([A-Z0-9]{10})')
+_PRICE_PATTERN = re.compile(r'\d[\d,]*')
+_CHARSET_PATTERN = re.compile(rb'charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+def _text(nodes) -> str:
+    for node in nodes:
+        text = " ".join(node.text_content().split()) if hasattr(node, "text_content") else str(node).strip()
+        if text:
+            return text
+    return ""
+
+
+def _parse_price(text: str) -> Optional[int]:
+    match = _PRICE_PATTERN.search(text or "")
+    return int(match.group().replace(",", "")) if match else None
+
+
+def _unique(values: List[str], limit: int) -> List[str]:
+    seen = []
+    for value in values:
+        value = value.strip()
+        if value and value not in seen:
+            seen.append(value)
+    return seen[:limit]
+
+
+def _parse_product_page(tree) -> List[Dict]:
+    """商品ページ（#productTitle を持つページ）"""
+    name = _text(tree.xpath('//*[@id="productTitle"]'))
+    asin = _text(tree.xpath('//input[@id="ASIN"]/@value | //input[@name="ASIN"]/@value'))
+    if not _ASIN_PATTERN.match(asin):
+        match = _DP_PATTERN.search(_text(tree.xpath('//link[@rel="canonical"]/@href')))
+        asin = match.group(1) if match else ""
+    if not name or not asin:
+        return []
+
+    price = _parse_price(_text(tree.xpath(
+        '//*[@id="corePrice_feature_div"]//span[contains(@class,"a-offscreen")]'
+        ' | //*[@id="priceblock_ourprice"] | //*[@id="price"]'
+    )))
+    breadcrumbs = [" ".join(node.text_content().split())
+                   for node in tree.xpath('//*[@id="wayfinding-breadcrumbs_feature_div"]//a')]
+    meta_keywords = _text(tree.xpath('//meta[@name="keywords"]/@content'))
+    keywords = _unique([keyword for keyword in re.split(r'[,、]', meta_keywords)] + breadcrumbs[::-1] + split_terms(name),
+                       MAX_KEYWORDS)
+    description = _text(tree.xpath('//*[@id="feature-bullets"]//li//span[contains(@class,"a-list-item")]')) \
+        or _text(tree.xpath('//meta[@name="description"]/@content')) or name
+    availability = _text(tree.xpath('//*[@id="availability"]'))
+
+    return [{
+        "asin": asin,
+        "name": name,
+        "price": price,
+        "keywords": keywords,
+        "category": breadcrumbs[-1] if breadcrumbs else "",
+        "description": description[:MAX_DESCRIPTION_LENGTH],
+        "availability": availability,
+        "source": "product"
+    }]
+
+
+def _parse_search_page(tree) -> List[Dict]:
+    """検索結果ページ（data-asin を持つ結果カードの一覧）"""
+    query = _text(tree.xpath('//input[@id="twotabsearchtextbox"]/@value'))
+    query_terms = split_terms(query)
+    items = []
+    for card in tree.xpath('//div[@data-component-type="s-search-result"][@data-asin]'):
+        asin = card.get("data-asin", "")
+        name = _text(card.xpath('.//h2//span | .//h2'))
+        if not _ASIN_PATTERN.match(asin) or not name:
+            continue
+        items.append({
+            "asin": asin,
+            "name": name,
+            "price": _parse_price(_text(card.xpath('.//span[contains(@class,"a-price")]/span[contains(@class,"a-offscreen")]'))),
+            "keywords": _unique(query_terms + split_terms(name), MAX_KEYWORDS),
+            "category": "",
+            "description": name[:MAX_DESCRIPTION_LENGTH],
+            "source": "search"
+        })
+    return items
+
+
+def parse_page(content: bytes) -> List[Dict]:
+    """HTMLから商品情報を抽出（商品ページなら1件、検索結果ページなら複数件）"""
+    # 文字コードの指定が無い保存ページはlxmlがLatin-1とみなすため、UTF-8を既定にする
+    match = _CHARSET_PATTERN.search(content[:4096])
+    encoding = match.group(1).decode("ascii") if match else "utf-8"
+    tree = html.fromstring(content, parser=html.HTMLParser(encoding=encoding))
+    if tree.xpath('//*[@id="productTitle"]'):
+        return _parse_product_page(tree)
+    return _parse_search_page(tree)
+
+
+def _process_file(task: Tuple[str, Optional[str]]) -> Tuple[str, str, Optional[List[Dict]], Optional[str]]:
+    """
+    プロセスプールのワーカー: ファイルを読んでハッシュを取り、変わっていれば解析する
+
+    Returns:
+        (パス, ハッシュ, 抽出結果（変更なしならNone）, エラー)
+    """
+    path, known_hash = task
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if digest == known_hash:
+            return path, digest, None, None
+        return path, digest, parse_page(content), None
+    except Exception as e:
+        return path, known_hash or "", None, str(e)
+
+
+def write_json_atomic(path: str, data: Dict, indent: Optional[int] = None):
+    """一時ファイルに書いてから置き換える（読み込み中のプロセスが途中の内容を見ないように）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.write("\n")
+    os.replace(tmp_file, path)
+
+
+def merge_price_range(price_range: str, price: int) -> str:
+    """
+    価格帯に取得した価格を反映する（範囲内ならそのまま、範囲外なら広げる）
+
+    "15000-30000" のような手書きの価格帯を単一の価格で上書きしないようにする。
+    価格帯が空・解釈できない場合は取得した価格だけの価格帯にする。
+    """
+    low, high = parse_price_range(price_range)
+    if low != low:
+        return str(price)
+    low, high = min(low, price), max(high, price)
+    return str(int(low)) if low == high else f"{int(low)}-{int(high)}"
+
+
+def _merge_item(existing: Dict, item: Dict) -> Dict:
+    """同じASINの抽出結果をまとめる（商品ページの情報を検索結果より優先）"""
+    if existing["source"] == "product" and item["source"] != "product":
+        preferred, other = existing, item
+    else:
+        preferred, other = item, existing
+    merged = dict(other)
+    merged.update({key: value for key, value in preferred.items() if value})
+    return merged
+
+
+class CatalogIngester:
+    def __init__(self, catalog_file: str = "data/product_catalog.json",
+                 state_file: str = "data/catalog_ingest_state.json", max_workers: Optional[int] = None):
+        """
+        取り込みを初期化
+
+        Args:
+            catalog_file: マージ先のカタログファイル
+            state_file: ファイルごとのハッシュと抽出したASINを記録する状態ファイル
+            max_workers: 解析に使うプロセス数（Noneならコア数）
+        """
+        self.catalog_file = catalog_file
+        self.state_file = state_file
+        self.max_workers = max_workers
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("files", {})
+        except Exception as e:
+            logger.warning(f"取り込み状態の読み込みに失敗（全ファイルを解析します）: {e}")
+            return {}
+
+    @staticmethod
+    def list_pages(directory: str) -> List[str]:
+        paths = []
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(HTML_SUFFIXES))
+        return sorted(paths)
+
+    def extract(self, paths: List[str], state: Dict[str, Dict]) -> Tuple[Dict[str, Dict], Dict[str, Dict], int]:
+        """
+        変更のあったファイルを並列に解析
+
+        Returns:
+            (ASIN → 抽出結果, 新しい状態, 解析したファイル数)
+        """
+        tasks = [(path, state.get(path, {}).get("sha256")) for path in paths]
+        items: Dict[str, Dict] = {}
+        new_state: Dict[str, Dict] = {}
+        parsed = 0
+        chunksize = max(1, len(tasks) // ((self.max_workers or os.cpu_count() or 1) * 8))
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for path, digest, extracted, error in executor.map(_process_file, tasks, chunksize=chunksize):
+                if error:
+                    logger.warning(f"解析に失敗: {path}: {error}")
+                    if path in state:
+                        new_state[path] = state[path]
+                    continue
+                if extracted is None:
+                    new_state[path] = state[path]
+                    continue
+                parsed += 1
+                new_state[path] = {"sha256": digest, "asins": [item["asin"] for item in extracted]}
+                for item in extracted:
+                    asin = item["asin"]
+                    items[asin] = _merge_item(items[asin], item) if asin in items else item
+        return items, new_state, parsed
+
+    @staticmethod
+    def _asin_of(record: Dict) -> Optional[str]:
+        match = _DP_PATTERN.search(record.get("link", ""))
+        return match.group(1) if match else None
+
+    def merge(self, catalog: Dict, items: Dict[str, Dict], genre: str) -> Tuple[int, int]:
+        """
+        抽出結果をカタログへマージ（既存のASINは価格帯を取得した価格まで広げるだけで、手書きの商品名・説明は残す）
+
+        Returns:
+            (追加件数, 更新件数)
+        """
+        genre_info = catalog.get("genres", {}).get(genre)
+        if genre_info is None:
+            raise ValueError(f"カタログに無いジャンルです: {genre}")
+        code = genre_info.get("code", "item")
+
+        products = catalog.setdefault("products", [])
+        by_asin = {self._asin_of(record): record for record in products if self._asin_of(record)}
+        numbers = [int(record["id"].rsplit("-", 1)[1]) for record in products
+                   if record.get("id", "").startswith(code + "-") and record["id"].rsplit("-", 1)[1].isdigit()]
+        next_number = max(numbers, default=0) + 1
+
+        added = updated = 0
+        for asin, item in items.items():
+            price_range = str(item["price"]) if item.get("price") else ""
+            record = by_asin.get(asin)
+            if record:
+                if price_range:
+                    merged = merge_price_range(record.get("price_range", ""), item["price"])
+                    if merged != record.get("price_range"):
+                        record["price_range"] = merged
+                        updated += 1
+                continue
+            if not price_range:
+                logger.info(f"価格が取れない商品は追加しません: {asin} {item['name']}")
+                continue
+            record = {
+                "id": f"{code}-{next_number:03d}",
+                "genre": genre,
+                "name": item["name"],
+                "category": item.get("category") or genre,
+                "keywords": item["keywords"],
+                "price_range": price_range,
+                "description": item["description"],
+                "link": f"https://www.amazon.co.jp/dp/{asin}"
+            }
+            products.append(record)
+            by_asin[asin] = record
+            next_number += 1
+            added += 1
+        return added, updated
+
+    def run(self, directory: str, genre: str) -> Dict:
+        """
+        ディレクトリ内のHTMLを取り込んでカタログを更新
+
+        Returns:
+            Dict: 取り込み結果の集計
+        """
+        paths = self.list_pages(directory)
+        state = self._load_state()
+        items, new_state, parsed = self.extract(paths, state)
+
+        with open(self.catalog_file, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+        added, updated = self.merge(catalog, items, genre)
+        if added or updated:
+            catalog["version"] = catalog.get("version", 0) + 1
+            catalog["updated_at"] = date.today().isoformat()
+            write_json_atomic(self.catalog_file, catalog, indent=2)
+
+        # 今回のディレクトリ外のファイルの状態はそのまま残す
+        directory_prefix = os.path.join(directory, "")
+        merged_state = {path: entry for path, entry in state.items() if not path.startswith(directory_prefix)}
+        merged_state.update(new_state)
+        write_json_atomic(self.state_file, {"files": merged_state})
+
+        result = {
+            "files": len(paths),
+            "parsed": parsed,
+            "skipped": len(paths) - parsed,
+            "asins": len(items),
+            "added": added,
+            "updated": updated,
+            "version": catalog.get("version")
+        }
+        logger.info(f"カタログ取り込み完了: {result}")
+        return result
+
+
+def main(argv=None):
+    """保存済みHTMLからカタログを更新するCLI"""
+    parser = argparse.ArgumentParser(description="保存済みの商品ページHTMLを商品カタログへ取り込む")
+    parser.add_argument("directory", help="HTMLファイルを置いたディレクトリ")
+    parser.add_argument("--genre", required=True, help="追加する商品のジャンル（カタログの genres のキー）")
+    parser.add_argument("--catalog", default="data/product_catalog.json", help="カタログファイル")
+    parser.add_argument("--state", default="data/catalog_ingest_state.json", help="取り込み状態ファイル")
+    parser.add_argument("--workers", type=int, default=None, help="解析に使うプロセス数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    result = CatalogIngester(args.catalog, args.state, args.workers).run(args.directory, args.genre)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+オフライン用フォールバック記事エンジン
+API障害時に、セクション別・カテゴリ別のフレーズバンクを組み合わせて記事を生成する
+シード付きの組み合わせで文面を変化させ、過去記事と重複しにくい候補を選びながら組み立てる
+"""
+
+import logging
+import random
+import threading
+from itertools import count
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 5
+
+# 記事タイプ別の導入文
+TYPE_OPENERS = {
+    "レビュー": [
+        "{category}分野で注目を集めている「{product}」を、実際の使用感を中心にレビューします。",
+        "今回は「{product}」をしばらく使ってみて分かったことを、率直にまとめました。",
+        "「{product}」が気になっている方に向けて、使ってみた印象を詳しくお伝えします。"
+    ],
+    "ハウツー": [
+        "「{product}」を取り入れて、{category}をもっと手軽に始める方法をご紹介します。",
+        "{category}を無理なく続けたい方に向けて、「{product}」を使ったやり方を解説します。",
+        "初めての方でも迷わないよう、「{product}」の活用手順をポイントごとに整理しました。"
+    ],
+    "商品紹介": [
+        "{category}の商品選びで迷っている方に向けて、「{product}」を中心におすすめをご紹介します。",
+        "数ある{category}関連のアイテムの中から、「{product}」をはじめ注目の商品をピックアップしました。",
+        "{category}のアイテムを比較検討するときのポイントと、「{product}」などのおすすめ商品をまとめました。"
+    ]
+}
+
+# セクション別の共通フレーズ
+PHRASE_BANKS = {
+    "概要": [
+        "{description}として、多くの方に選ばれています。",
+        "価格帯は{price_range}円ほどで、はじめの一歩として手に取りやすいのが特徴です。",
+        "口コミでも評価が高く、継続して使っている人が多い印象です。",
+        "日常の中に自然に取り入れやすく、特別な準備がほとんど要りません。",
+        "シンプルな作りながら、必要な機能がきちんと押さえられています。",
+        "初心者から経験者まで、幅広い層に支持されているアイテムです。",
+        "購入前に気になるポイントを中心に、順番に見ていきましょう。"
+    ],
+    "メリット": [
+        "**使いやすさ**: 初めてでも直感的に扱える設計になっています。",
+        "**コストパフォーマンス**: {price_range}円という価格帯で、十分な満足感が得られます。",
+        "**信頼性**: 多くのユーザーから高い評価を得ている実績があります。",
+        "**続けやすさ**: 準備や片付けの手間が少なく、毎日の習慣にしやすいです。",
+        "**手軽さ**: 思い立ったときにすぐ始められる気軽さがあります。",
+        "**満足感**: 使うたびに小さな変化を感じられ、前向きな気持ちになれます。",
+        "**汎用性**: 目的に合わせてさまざまな使い方ができます。",
+        "**品質**: 細部まで丁寧に作られていて、長く使える安心感があります。"
+    ],
+    "デメリット": [
+        "**個人差**: 効果や使用感には個人差があります。",
+        "**継続の必要性**: 最大限の効果を得るには継続的な使用が重要です。",
+        "**慣れが必要**: 使い始めは少し戸惑う場面があるかもしれません。",
+        "**価格の変動**: 時期や販売店によって価格が変わることがあります。",
+        "**置き場所**: 事前に保管場所を決めておくと安心です。",
+        "**好みが分かれる点**: デザインや使い心地の好みは人によって異なります。"
+    ],
+    "まとめ": [
+        "「{product}」は、{category}に興味のある方にとって価値のある選択肢です。",
+        "特に初心者の方や、コストパフォーマンスを重視する方におすすめできます。",
+        "自分の目的やライフスタイルに合うかどうかを確認したうえで、検討してみてください。",
+        "無理のないペースで取り入れることが、長く続けるためのコツです。",
+        "気になった方は、まずは商品の詳細をチェックしてみてはいかがでしょうか。",
+        "日々の暮らしを少し豊かにしてくれるアイテムとして、候補に加えてみてください。"
+    ]
+}
+
+# カテゴリ固有のフレーズ（共通フレーズに追加して使う）
+CATEGORY_PHRASES = {
+    "占い": {
+        "概要": ["毎日の気持ちを整えるきっかけとして、占いを取り入れる方が増えています。"],
+        "メリット": ["**気持ちの整理**: 自分と向き合う時間が自然に生まれます。",
+                   "**楽しさ**: 家族や友人と一緒に楽しめるのも魅力です。"],
+        "デメリット": ["**解釈の幅**: 結果の読み取り方に慣れるまで少し時間がかかります。"],
+        "まとめ": ["前向きな気持ちで一日を始めたい方にぴったりです。"]
+    },
+    "フィットネス": {
+        "概要": ["自宅で体を動かす習慣づくりに役立つアイテムとして人気があります。"],
+        "メリット": ["**運動習慣**: すき間時間に体を動かすきっかけになります。",
+                   "**自宅で完結**: ジムに通わなくてもトレーニングができます。"],
+        "デメリット": ["**無理は禁物**: 体調に合わせて負荷を調整することが大切です。"],
+        "まとめ": ["運動を習慣にしたい方の心強い味方になってくれます。"]
+    },
+    "書籍": {
+        "概要": ["読みやすい構成で、忙しい方でも少しずつ読み進められます。"],
+        "メリット": ["**学びの多さ**: 日常ですぐに試せる考え方が詰まっています。",
+                   "**読みやすさ**: 専門的な内容も平易な言葉で説明されています。"],
+        "デメリット": ["**実践が鍵**: 読むだけでなく行動に移すことで価値が高まります。"],
+        "まとめ": ["新しい視点を得たい方に、ぜひ手に取ってほしい一冊です。"]
+    },
+    "家電・ガジェット": {
+        "概要": ["生活の手間を減らしてくれるガジェットとして注目されています。"],
+        "メリット": ["**時短効果**: 毎日の作業時間を短縮できます。",
+                   "**操作性**: 設定や操作がわかりやすく、すぐに使いこなせます。"],
+        "デメリット": ["**対応環境**: 手持ちの機器との相性を事前に確認しておきましょう。"],
+        "まとめ": ["便利さを実感しやすく、暮らしのアップデートにおすすめです。"]
+    },
+    "美容・パーソナルケア": {
+        "概要": ["毎日のセルフケアを手軽にしてくれるアイテムとして人気です。"],
+        "メリット": ["**手軽なケア**: 忙しい日でも短時間でケアができます。",
+                   "**気分転換**: ケアの時間そのものがリラックスタイムになります。"],
+        "デメリット": ["**肌との相性**: 気になる方は目立たない部分で試してから使いましょう。"],
+        "まとめ": ["自分磨きの時間を大切にしたい方におすすめです。"]
+    },
+    "アウトドア・スポーツ": {
+        "概要": ["アウトドアやスポーツの時間をより快適にしてくれるアイテムです。"],
+        "メリット": ["**携帯性**: 持ち運びやすく、外出先でも活躍します。",
+                   "**耐久性**: 屋外での使用にも耐えるしっかりした作りです。"],
+        "デメリット": ["**天候への備え**: 使用環境によってはメンテナンスが必要です。"],
+        "まとめ": ["外で過ごす時間をもっと楽しみたい方にぴったりです。"]
+    },
+    "ヘルスケア・見守り": {
+        "概要": ["日々の健康管理を無理なく続けるためのサポート役として役立ちます。"],
+        "メリット": ["**記録のしやすさ**: 毎日のデータを手間なく残せます。",
+                   "**安心感**: 家族の様子や自分の体調の変化に気づきやすくなります。"],
+        "デメリット": ["**あくまで目安**: 気になる症状がある場合は専門家に相談しましょう。"],
+        "まとめ": ["健康を意識した暮らしを始めたい方におすすめです。"]
+    },
+    "キッチン・時短家事": {
+        "概要": ["毎日の料理や家事の負担を軽くしてくれるアイテムとして人気です。"],
+        "メリット": ["**家事の時短**: 調理や片付けの時間を短くできます。",
+                   "**お手入れの簡単さ**: 洗いやすく、清潔に保ちやすい設計です。"],
+        "デメリット": ["**収納スペース**: キッチンの広さに合わせてサイズを確認しましょう。"],
+        "まとめ": ["家事の時間を減らして、自分の時間を増やしたい方にぴったりです。"]
+    }
+}
+
+SECTION_ORDER = ["概要", "メリット", "デメリット", "まとめ"]
+# セクションごとの採用フレーズ数
+SECTION_SIZES = {"概要": 2, "メリット": 3, "デメリット": 2, "まとめ": 2}
+# 番号付きリストで出力するセクション
+LIST_SECTIONS = {"メリット", "デメリット"}
+LIST_LEADS = {
+    "メリット": ["この商品の主な利点は以下の通りです：", "実際に感じた良い点をまとめます：", "注目したいポイントは次の通りです："],
+    "デメリット": ["一方で、以下の点にご注意ください：", "購入前に知っておきたい点もあります：", "気になった点も正直にお伝えします："]
+}
+
+
+def text_shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """記号・空白を除いた文字n-gramのハッシュ集合"""
+    chars = "".join(ch for ch in text if ch.isalnum())
+    return {hash(chars[i:i + size]) for i in range(max(0, len(chars) - size + 1))}
+
+
+class FallbackArticleEngine:
+    def __init__(self, history_manager=None, variants_per_section: int = 4, seed: Optional[int] = None):
+        """
+        フォールバック記事エンジンを初期化
+
+        Args:
+            history_manager: 新規性チェックに使う ArticleHistoryManager
+            variants_per_section: セクションごとに生成して比較する候補数
+            seed: 乱数シードの基準値（省略時はランダム）
+        """
+        self.history_manager = history_manager
+        self.variants_per_section = max(1, variants_per_section)
+        self.base_seed = seed if seed is not None else random.randrange(1 << 30)
+        self._counter = count()
+        self._lock = threading.Lock()
+
+        # 履歴記事のshingle集合（新規性チェック用）
+        self.history_shingles: Set[int] = set()
+        self._indexed_history_count = 0
+
+        # カテゴリごとにフレーズバンクを一度だけ結合しておく
+        self._banks: Dict[str, Dict[str, List[str]]] = {}
+        for category, extra in CATEGORY_PHRASES.items():
+            self._banks[category] = {
+                section: PHRASE_BANKS[section] + extra.get(section, []) for section in SECTION_ORDER
+            }
+        self._default_bank = PHRASE_BANKS
+
+    def _sync_history(self):
+        """履歴に追加された記事のshingleを取り込む"""
+        if not self.history_manager:
+            return
+        articles = self.history_manager.history_data.get("articles", [])
+        for article in articles[self._indexed_history_count:]:
+            self.history_shingles |= text_shingles(article.get("content", ""))
+        self._indexed_history_count = len(articles)
+
+    def novelty(self, text: str) -> float:
+        """履歴に含まれないshingleの割合（1.0で完全に新規）"""
+        shingles = text_shingles(text)
+        if not shingles:
+            return 1.0
+        return 1.0 - len(shingles & self.history_shingles) / len(shingles)
+
+    def compose(self, products: List[Dict], article_type: str, seed: Optional[int] = None) -> str:
+        """
+        フォールバック記事を組み立てる
+
+        Args:
+            products: 商品リスト（先頭が主要商品）
+            article_type: 記事タイプ
+            seed: 乱数シード（同じシード・同じ履歴なら同じ記事になる）
+
+        Returns:
+            str: Markdown形式の記事本文
+        """
+        main_product = products[0]
+        category = main_product.get('selected_category', '')
+        fields = {
+            "product": main_product.get('name', ''),
+            "category": category,
+            "description": main_product.get('description', '').rstrip('。'),
+            "price_range": main_product.get('price_range', '')
+        }
+        if seed is None:
+            seed = self.base_seed + next(self._counter)
+        rng = random.Random(f"{seed}:{fields['product']}:{article_type}")
+        bank = self._banks.get(category, self._default_bank)
+
+        with self._lock:
+            self._sync_history()
+
+            sections = []
+            for section in SECTION_ORDER:
+                candidates = [self._compose_section(section, bank, fields, article_type, products, rng)
+                              for _ in range(self.variants_per_section)]
+                # 履歴との重なりが最も少ない候補を採用
+                sections.append(max(candidates, key=self.novelty))
+
+            content = "\n" + "\n\n".join(sections) + "\n"
+            # 連続したフォールバック同士も重ならないよう、生成した記事も取り込む
+            self.history_shingles |= text_shingles(content)
+
+        return content
+
+    def _compose_section(self, section: str, bank: Dict[str, List[str]], fields: Dict,
+                         article_type: str, products: List[Dict], rng: random.Random) -> str:
+        phrases = rng.sample(bank[section], k=min(SECTION_SIZES[section], len(bank[section])))
+        phrases = [phrase.format(**fields) for phrase in phrases]
+
+        if section == "概要":
+            opener = rng.choice(TYPE_OPENERS.get(article_type, TYPE_OPENERS["レビュー"])).format(**fields)
+            body = opener + "".join(phrases)
+            if article_type == "商品紹介" and len(products) > 1:
+                others = "、".join(f"「{p['name']}」" for p in products[1:])
+                body += f"あわせて{others}も取り上げます。"
+            return f"## {section}\n\n{body}"
+
+        if section in LIST_SECTIONS:
+            lead = rng.choice(LIST_LEADS[section])
+            items = "\n".join(f"{i}. {phrase}" for i, phrase in enumerate(phrases, 1))
+            return f"## {section}\n\n{lead}\n\n{items}"
+
+        return f"## {section}\n\n{''.join(phrases)}"
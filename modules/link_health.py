@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+アフィリエイトリンクの死活確認モジュール
+カタログと記事履歴のAmazon商品リンク（/dp/）を重複なく集め、aiohttp の接続プールで並行にHEAD（必要ならGET）を送って
+リダイレクトをたどり、取り扱い終了などで商品ページに届かないリンクを記録する
+CAPTCHA・サインインへの転送、429・5xx、トップページ・検索結果以外への転送は判定不能として前回の結果を変えない
+リンク切れの応答が連続して failure_threshold 回続いたリンクだけをリンク切れとし、リンク生成時に検索リンクへ切り替える
+
+使い方:
+    python -m modules.link_health --catalog data/product_catalog.json --history data/article_history.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+try:
+    import aiohttp
+except ImportError:  # requirements.txt に含まれるが、リンク確認を使わない環境では不要
+    aiohttp = None
+
+from .catalog_ingest import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_ORIGIN = "https://www.amazon.co.jp"
+MAX_REDIRECTS = 5
+# HEADを受け付けないサーバーへはGETで確認し直す
+HEAD_UNSUPPORTED_STATUSES = (403, 405, 501)
+BROKEN_STATUSES = (404, 410)
+# ボット対策・サインインのページ（商品の状態とは無関係なので判定しない）
+BLOCKED_PATH_PREFIXES = ("/errors/validateCaptcha", "/ap/signin", "/ap/challenge")
+
+OK = "ok"
+BROKEN = "broken"
+UNKNOWN = "unknown"
+
+_DP_PATTERN = re.compile(r'/(?:dp|gp/product)/([A-Z0-9]{10})')
+
+
+def _is_search_or_home(path: str) -> bool:
+    """取り扱い終了の商品の転送先（トップページ・検索結果）か"""
+    return path in ("", "/") or path == "/s" or path.startswith("/s/")
+
+
+def classify_response(status: Optional[int], final_url: str, redirected: bool) -> Tuple[str, str]:
+    """
+    最終的な応答を (OK / BROKEN / UNKNOWN, 理由) に分類
+
+    BROKEN は「リンク切れの可能性がある応答」で、連続回数を数えてからリンク切れとする。
+    """
+    path = urlparse(final_url).path
+    if path.startswith(BLOCKED_PATH_PREFIXES):
+        return UNKNOWN, "blocked"
+    if status is None:
+        return UNKNOWN, "no_response"
+    if status == 429 or status >= 500:
+        return UNKNOWN, f"status {status}"
+    if status in BROKEN_STATUSES:
+        return BROKEN, f"status {status}"
+    if redirected and not _DP_PATTERN.search(path):
+        if _is_search_or_home(path):
+            # 商品ページ以外（トップページ・検索結果）へ転送される商品は取り扱い終了とみなす
+            return BROKEN, "redirected_away"
+        return UNKNOWN, "redirected_elsewhere"
+    if 200 <= status < 300:
+        return OK, ""
+    return UNKNOWN, f"status {status}"
+
+
+def canonical_product_url(url: str) -> Optional[str]:
+    """tag・language などのクエリや商品名のパスを除いた商品ページURL（商品リンクでなければNone）"""
+    match = _DP_PATTERN.search(url or "")
+    return f"{PRODUCT_ORIGIN}/dp/{match.group(1)}" if match else None
+
+
+class LinkHealthChecker:
+    def __init__(self, state_file: str = "data/link_health.json", ttl_hours: float = 24,
+                 max_connections: int = 32, per_host_limit: int = 4, timeout: float = 10.0,
+                 base_url: Optional[str] = None, failure_threshold: int = 2):
+        """
+        リンク確認を初期化
+
+        Args:
+            state_file: 確認結果を保存するファイル
+            ttl_hours: 確認結果の有効期限（これより新しい結果のURLは確認し直さない）
+            max_connections: 接続プール全体の同時接続数
+            per_host_limit: ホストごとの同時接続数
+            timeout: 1リクエストのタイムアウト（秒）
+            base_url: 確認先（スタブサーバーで試す場合に指定。省略時はAmazon）
+            failure_threshold: リンク切れの応答がこの回数続いたらリンク切れとする
+        """
+        self.state_file = state_file
+        self.ttl = ttl_hours * 3600
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.origin = (base_url or PRODUCT_ORIGIN).rstrip("/")
+        self.failure_threshold = max(1, failure_threshold)
+        self.results: Dict[str, Dict] = self._load_state()
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"リンク確認結果の読み込みに失敗: {e}")
+            return {}
+
+    def save(self):
+        write_json_atomic(self.state_file, self.results)
+
+    @staticmethod
+    def collect_urls(catalog_records: Iterable[Dict] = (), history_articles: Iterable[Dict] = ()) -> List[str]:
+        """カタログと記事履歴から、確認対象の商品ページURLを重複なく集める"""
+        urls = {}
+        for record in catalog_records:
+            url = canonical_product_url(record.get("link", ""))
+            if url:
+                urls[url] = None
+        for article in history_articles:
+            for product in article.get("products", []):
+                url = canonical_product_url(product.get("amazon_link", ""))
+                if url:
+                    urls[url] = None
+        return list(urls)
+
+    def is_broken(self, url: str) -> bool:
+        """リンク切れと確認済みか（未確認・確認できなかったリンクはFalse）"""
+        result = self.results.get(canonical_product_url(url) or "")
+        return bool(result and result.get("broken"))
+
+    def get_broken_urls(self) -> List[str]:
+        return [url for url, result in self.results.items() if result.get("broken")]
+
+    def _is_fresh(self, url: str, now: float) -> bool:
+        result = self.results.get(url)
+        if result and result.get("failures") and not result.get("broken"):
+            # リンク切れの疑いがあるリンクは、有効期限内でも次の確認で確かめ直す
+            return False
+        return bool(result and now - result.get("checked_at", 0) < self.ttl)
+
+    async def _request(self, session, method: str, url: str):
+        async with session.request(method, url, allow_redirects=False) as response:
+            return response.status, response.headers.get("Location")
+
+    async def _probe(self, session, url: str) -> Dict:
+        """リダイレクトを1つずつたどって最終的な応答を分類"""
+        current = self.origin + urlparse(url).path
+        redirects = []
+        method = "HEAD"
+        status = None
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                status, location = await self._request(session, method, current)
+                if method == "HEAD" and status in HEAD_UNSUPPORTED_STATUSES:
+                    method = "GET"
+                    status, location = await self._request(session, method, current)
+                if 300 <= status < 400 and location:
+                    current = urljoin(current, location)
+                    redirects.append(current)
+                    continue
+                break
+            else:
+                return {"outcome": UNKNOWN, "status": None, "final_url": current, "redirects": redirects,
+                        "reason": "too_many_redirects"}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {"outcome": UNKNOWN, "status": None, "final_url": current, "redirects": redirects,
+                    "reason": f"error: {e}"}
+
+        outcome, reason = classify_response(status, current, bool(redirects))
+        return {"outcome": outcome, "status": status, "final_url": current, "redirects": redirects, "reason": reason}
+
+    def _apply(self, url: str, probe: Dict, now: float) -> Optional[Dict]:
+        """
+        分類結果を保存済みの結果に反映（判定不能なら何も変えずにNone）
+
+        リンク切れの応答は連続回数を数え、failure_threshold 回続いた時点でリンク切れにする。
+        """
+        outcome = probe.pop("outcome")
+        if outcome == UNKNOWN:
+            return None
+        previous = self.results.get(url, {})
+        failures = previous.get("failures", 0) + 1 if outcome == BROKEN else 0
+        result = dict(probe, checked_at=now, failures=failures, broken=failures >= self.failure_threshold)
+        self.results[url] = result
+        return result
+
+    async def check(self, urls: Iterable[str], force: bool = False) -> Dict[str, Dict]:
+        """
+        有効期限切れ・未確認のURLをまとめて確認
+
+        Args:
+            urls: 商品ページURL（クエリ付きでもよい）
+            force: 有効期限内の結果があっても確認し直す
+
+        Returns:
+            Dict[str, Dict]: 今回確認できたURL → 結果（判定不能だったURLは含まず、前回の結果のまま）
+        """
+        if aiohttp is None:
+            raise RuntimeError("リンク確認には aiohttp が必要です（pip install aiohttp）")
+        now = time.time()
+        targets = list(dict.fromkeys(filter(None, (canonical_product_url(url) for url in urls))))
+        targets = [url for url in targets if force or not self._is_fresh(url, now)]
+        if not targets:
+            return {}
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host_limit)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            probed = await asyncio.gather(*(self._probe(session, url) for url in targets))
+
+        checked = {}
+        unknown = 0
+        for url, probe in zip(targets, probed):
+            reason = probe["reason"]
+            result = self._apply(url, probe, now)
+            if result is None:
+                unknown += 1
+                logger.debug(f"リンクの状態を判定できません: {url}（{reason}）")
+                continue
+            checked[url] = result
+            if result["broken"]:
+                logger.warning(f"リンク切れを検出: {url}（{reason}、{result['failures']}回連続）")
+            elif result["failures"]:
+                logger.info(f"リンク切れの疑い: {url}（{reason}、{result['failures']}/{self.failure_threshold}回）")
+        self.save()
+        logger.info(f"リンク確認完了: {len(targets)}件中 {sum(r['broken'] for r in checked.values())}件がリンク切れ、"
+                    f"{unknown}件は判定不能（前回の結果を維持）")
+        return checked
+
+    def check_sync(self, urls: Iterable[str], force: bool = False) -> Dict[str, Dict]:
+        """イベントループ外から確認する"""
+        return asyncio.run(self.check(urls, force=force))
+
+
+def main(argv=None):
+    """カタログと記事履歴のリンクを確認するCLI"""
+    parser = argparse.ArgumentParser(description="アフィリエイトリンクの死活確認")
+    parser.add_argument("--catalog", default="data/product_catalog.json", help="カタログファイル")
+    parser.add_argument("--history", default="data/article_history.json", help="記事履歴ファイル")
+    parser.add_argument("--state", default="data/link_health.json", help="確認結果の保存先")
+    parser.add_argument("--base-url", default=None, help="確認先（スタブサーバーのURLなど）")
+    parser.add_argument("--force", action="store_true", help="有効期限内の結果も確認し直す")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.catalog, 'r', encoding='utf-8') as f:
+        records = json.load(f).get("products", [])
+    articles = []
+    if os.path.exists(args.history):
+        with open(args.history, 'r', encoding='utf-8') as f:
+            articles = json.load(f).get("articles", [])
+
+    checker = LinkHealthChecker(args.state, base_url=args.base_url)
+    checker.check_sync(LinkHealthChecker.collect_urls(records, articles), force=args.force)
+    print(json.dumps({"checked": len(checker.results), "broken": checker.get_broken_urls()}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
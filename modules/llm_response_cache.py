@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+LLMレスポンスキャッシュモジュール
+モデル・メッセージ・パラメータのハッシュをキーに、OpenAIの応答をディスクへ保存・再利用する
+ヒット時の参照日時はまとめてインデックスに書き戻し、再起動後もLRUの順序を保つ
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ヒットによる参照日時の更新を、この件数・秒数ごとにまとめてインデックスへ書き戻す
+ACCESS_FLUSH_HITS = 20
+ACCESS_FLUSH_SECONDS = 60
+
+# 呼び出し種別ごとのデフォルトTTL（秒）。0 はキャッシュしないことを表す
+DEFAULT_TTL_SECONDS = {
+    "title": 7 * 24 * 60 * 60,
+    "article": 0,
+    "default": 24 * 60 * 60
+}
+
+
+class LLMResponseCache:
+    def __init__(self, cache_dir: str = "data/llm_cache", max_entries: int = 1000,
+                 max_bytes: int = 50 * 1024 * 1024, ttl_seconds: Optional[Dict[str, int]] = None,
+                 replay_mode: bool = False, access_flush_hits: int = ACCESS_FLUSH_HITS):
+        """
+        レスポンスキャッシュを初期化
+
+        Args:
+            cache_dir: キャッシュファイルの保存先ディレクトリ
+            max_entries: 保持する最大エントリ数（超過時はLRUで削除）
+            max_bytes: キャッシュ全体の最大サイズ（バイト）
+            ttl_seconds: 呼び出し種別ごとのTTL（秒）。"default" は未定義の種別に適用
+            replay_mode: Trueの場合TTLを無視して保存済みの応答を再生する（オフライン計測用）
+            access_flush_hits: ヒットによる参照日時の更新をこの件数ごとにインデックスへ書き戻す
+        """
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = dict(DEFAULT_TTL_SECONDS)
+        self.ttl_seconds.update(ttl_seconds or {})
+        self.replay_mode = replay_mode
+
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # キー → メタデータ。並び順がLRU順（先頭が最も古い）
+        self.index: "OrderedDict[str, Dict]" = self.load_index()
+        self.total_bytes = sum(entry.get("size", 0) for entry in self.index.values())
+        # 書き戻していない参照日時の更新（ヒット数）と最後に書き戻した時刻
+        self.access_flush_hits = max(1, access_flush_hits)
+        self._unsaved_hits = 0
+        self._saved_at = time.time()
+        # 終了時に残りの参照日時を書き戻す
+        atexit.register(self.flush)
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], params: Dict) -> str:
+        """モデル・メッセージ・パラメータからキャッシュキーを生成"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load_index(self) -> "OrderedDict[str, Dict]":
+        """インデックスファイルを読み込み"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+                ordered = sorted(entries.items(), key=lambda item: item[1].get("last_access", 0))
+                return OrderedDict(ordered)
+        except Exception as e:
+            logger.warning(f"キャッシュインデックスの読み込みに失敗: {e}")
+        return OrderedDict()
+
+    def save_index(self):
+        """インデックスファイルを保存"""
+        self._unsaved_hits = 0
+        self._saved_at = time.time()
+        try:
+            tmp_file = self.index_file + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self.index, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            logger.warning(f"キャッシュインデックスの保存に失敗: {e}")
+
+    def get_ttl(self, call_type: str) -> int:
+        """呼び出し種別のTTLを取得"""
+        return self.ttl_seconds.get(call_type, self.ttl_seconds.get("default", 0))
+
+    def is_cacheable(self, call_type: str) -> bool:
+        """呼び出し種別がキャッシュ対象かを判定"""
+        return self.replay_mode or self.get_ttl(call_type) > 0
+
+    def get(self, key: str, call_type: str) -> Optional[Dict]:
+        """キャッシュから応答を取得（存在しない・期限切れの場合はNone）"""
+        if not self.is_cacheable(call_type):
+            return None
+
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+
+            now = time.time()
+            if not self.replay_mode and now - entry["created_at"] > self.get_ttl(call_type):
+                self.stats["expired"] += 1
+                self._remove(key)
+                self.save_index()
+                return None
+
+            try:
+                with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except Exception as e:
+                logger.warning(f"キャッシュエントリの読み込みに失敗: {e}")
+                self.stats["misses"] += 1
+                self._remove(key)
+                return None
+
+            entry["last_access"] = now
+            self.index.move_to_end(key)
+            self.stats["hits"] += 1
+            self._unsaved_hits += 1
+            if self._unsaved_hits >= self.access_flush_hits or now - self._saved_at >= ACCESS_FLUSH_SECONDS:
+                self.save_index()
+            return value
+
+    def flush(self):
+        """書き戻していない参照日時があればインデックスを保存"""
+        with self._lock:
+            if self._unsaved_hits:
+                self.save_index()
+
+    def put(self, key: str, call_type: str, value: Dict):
+        """応答をキャッシュに保存"""
+        if not self.is_cacheable(call_type):
+            return
+
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            try:
+                with open(self._entry_path(key), "w", encoding="utf-8") as f:
+                    f.write(data)
+            except Exception as e:
+                logger.warning(f"キャッシュエントリの保存に失敗: {e}")
+                return
+
+            if key in self.index:
+                self.total_bytes -= self.index[key].get("size", 0)
+
+            now = time.time()
+            self.index[key] = {
+                "call_type": call_type,
+                "size": size,
+                "created_at": now,
+                "last_access": now
+            }
+            self.index.move_to_end(key)
+            self.total_bytes += size
+            self.stats["writes"] += 1
+
+            self._evict()
+            self.save_index()
+
+    def clear(self):
+        """キャッシュを全て削除"""
+        with self._lock:
+            for key in list(self.index.keys()):
+                self._remove(key)
+            self.save_index()
+
+    def get_stats(self) -> Dict:
+        """キャッシュ統計情報を取得"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["expired"]
+            return {
+                **self.stats,
+                "entries": len(self.index),
+                "total_bytes": self.total_bytes,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+            }
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _evict(self):
+        """上限を超えた分を古い順に削除"""
+        while self.index and (len(self.index) > self.max_entries or self.total_bytes > self.max_bytes):
+            oldest_key = next(iter(self.index))
+            self._remove(oldest_key)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        entry = self.index.pop(key, None)
+        if entry:
+            self.total_bytes -= entry.get("size", 0)
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"キャッシュエントリの削除に失敗: {e}")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+記事ドキュメントモデル
+Markdown本文を見出し・段落・リンクカードのブロック列として一度だけ解析し、
+記事生成・リンク挿入・類似度分析・note投稿で共有する
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s*(.+)$')
+URL_LINE_PATTERN = re.compile(r'^https?://\S+$')
+
+AFFILIATE_DISCLAIMER = "※本記事にはアフィリエイトリンクを含みます"
+
+HEADING = "heading"
+PARAGRAPH = "paragraph"
+LINK_CARD = "link_card"
+
+
+class Block:
+    __slots__ = ("kind", "text", "level", "heading", "joined")
+
+    def __init__(self, kind: str, text: str, level: int = 0, heading: str = "", joined: bool = False):
+        """
+        Args:
+            kind: "heading", "paragraph", "link_card" のいずれか
+            text: ブロックのMarkdown文字列（見出しブロックは見出し直後の本文行を含むことがある）
+            level: 見出しレベル（見出しブロックのみ）
+            heading: 見出しテキスト（見出しブロックのみ）
+            joined: 直前のブロックと空行を挟まずに続いていたか（Markdownに戻すときの区切りに使う）
+        """
+        self.kind = kind
+        self.text = text
+        self.level = level
+        self.heading = heading
+        self.joined = joined
+
+    @classmethod
+    def parse(cls, text: str, joined: bool = False) -> "Block":
+        first_line = text.split('\n', 1)[0].strip()
+        match = HEADING_PATTERN.match(first_line)
+        if match:
+            return cls(HEADING, text, level=len(match.group(1)), heading=match.group(2).strip(), joined=joined)
+        if URL_LINE_PATTERN.match(text):
+            return cls(LINK_CARD, text, joined=joined)
+        return cls(PARAGRAPH, text, joined=joined)
+
+    @classmethod
+    def parse_chunk(cls, chunk: str) -> List["Block"]:
+        """
+        空行区切りの1かたまりをブロックに分割
+
+        空行を挟まない見出し行はそれぞれ新しい見出しブロックを始め、URLだけの行はリンクカードにする。
+        """
+        blocks = []
+        lines: List[str] = []
+
+        def flush():
+            if lines:
+                blocks.append(cls.parse('\n'.join(lines), joined=bool(blocks)))
+                lines.clear()
+
+        for line in chunk.split('\n'):
+            stripped = line.strip()
+            if URL_LINE_PATTERN.match(stripped):
+                flush()
+                lines.append(stripped)
+                flush()
+                continue
+            if HEADING_PATTERN.match(stripped):
+                flush()
+            lines.append(line)
+        flush()
+        return blocks
+
+    @classmethod
+    def link_card(cls, url: str) -> "Block":
+        """OGPリンクカードになるURL単独行のブロック"""
+        return cls(LINK_CARD, url.strip())
+
+    def __repr__(self):
+        return f"Block({self.kind}, {self.text[:20]!r})"
+
+
+class ArticleDocument:
+    def __init__(self, blocks: Optional[List[Block]] = None):
+        self.blocks: List[Block] = blocks or []
+        self._structure: Optional[Dict] = None
+
+    @classmethod
+    def parse(cls, content: str) -> "ArticleDocument":
+        """空行区切りのかたまりごとに、見出し行・URL行でブロックに分割して解析"""
+        chunks = (chunk.strip() for chunk in re.split(r'\n\s*\n', content))
+        return cls([block for chunk in chunks if chunk for block in Block.parse_chunk(chunk)])
+
+    def to_markdown(self) -> str:
+        parts = []
+        for i, block in enumerate(self.blocks):
+            if i:
+                parts.append('\n' if block.joined else '\n\n')
+            parts.append(block.text)
+        return ''.join(parts)
+
+    def __str__(self):
+        return self.to_markdown()
+
+    def __len__(self):
+        return len(self.blocks)
+
+    @property
+    def headings(self) -> List[str]:
+        return [block.heading for block in self.blocks if block.kind == HEADING]
+
+    @property
+    def link_urls(self) -> List[str]:
+        return [block.text for block in self.blocks if block.kind == LINK_CARD]
+
+    def get_structure(self) -> Dict:
+        """類似度分析用の構造シグネチャ（見出し・段落数）"""
+        if self._structure is None:
+            self._structure = {
+                'headings': [heading.lower() for heading in self.headings],
+                # 段落数は空行区切りのかたまりの数（空行を挟まない見出し・URL行は数えない）
+                'paragraph_count': sum(1 for block in self.blocks if not block.joined)
+            }
+        return self._structure
+
+    def section_ranges(self) -> List[Tuple[str, int, int]]:
+        """
+        見出しごとのセクション範囲
+
+        Returns:
+            List[Tuple[str, int, int]]: (見出し, 開始ブロック位置, 終了ブロック位置（含まない）)
+        """
+        starts = [(i, block.heading) for i, block in enumerate(self.blocks) if block.kind == HEADING]
+        ranges = []
+        for n, (start, heading) in enumerate(starts):
+            end = starts[n + 1][0] if n + 1 < len(starts) else len(self.blocks)
+            ranges.append((heading, start, end))
+        return ranges
+
+    def find_section(self, name: str, exclude: str = None) -> Optional[Tuple[str, int, int]]:
+        """見出しに name を含む最初のセクション（exclude を含む見出しは除く）"""
+        for heading, start, end in self.section_ranges():
+            if name in heading and not (exclude and exclude in heading):
+                return heading, start, end
+        return None
+
+    def with_insertions(self, insertions: Dict[int, List[Block]], prefix: Optional[List[Block]] = None) -> "ArticleDocument":
+        """
+        指定位置の直前にブロックを挿入した新しいドキュメントを作成（1回の走査で組み立てる）
+
+        Args:
+            insertions: ブロック位置 → その直前に置くブロック列（len(blocks) は末尾）
+            prefix: 先頭に置くブロック列
+        """
+        blocks = list(prefix or [])
+        for i, block in enumerate(self.blocks):
+            inserted = insertions.get(i, ())
+            blocks.extend(inserted)
+            if block.joined and inserted:
+                # 挿入したブロックの後ろは空行で区切る
+                block = Block(block.kind, block.text, block.level, block.heading)
+            blocks.append(block)
+        blocks.extend(insertions.get(len(self.blocks), ()))
+        return ArticleDocument(blocks)
+
+    def input_blocks(self) -> List[Tuple[str, str]]:
+        """
+        エディタへの入力単位
+
+        Returns:
+            List[Tuple[str, str]]: ("text" または "link_card", 入力する文字列)
+        """
+        return [("link_card" if block.kind == LINK_CARD else "text", block.text) for block in self.blocks]
+
+
+def ensure_document(content) -> ArticleDocument:
+    """文字列でもドキュメントでも受け取れるようにする"""
+    if isinstance(content, ArticleDocument):
+        return content
+    return ArticleDocument.parse(content or "")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+モデルルーターモジュール
+呼び出し種別ごとに主モデルとフォールバックチェーンを選び、
+直近のレイテンシとエラー率がSLOを外れたモデルを一定時間降格させる
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from .request_resilience import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# タイトルは短いので軽量モデルを主に使い、記事本文は品質を保つため従来のモデルを使う
+DEFAULT_ROUTES = {
+    "title": {"models": ["gpt-4.1-nano", "gpt-4.1-mini"], "latency_slo_seconds": 5.0},
+    "title_batch": {"models": ["gpt-4.1-nano", "gpt-4.1-mini"], "latency_slo_seconds": 10.0},
+    "article": {"models": ["gpt-4.1-mini", "gpt-4o-mini"], "latency_slo_seconds": 60.0},
+    "default": {"models": ["gpt-4.1-mini"], "latency_slo_seconds": 30.0}
+}
+
+
+class ModelHealth:
+    def __init__(self, window_size: int):
+        """1モデル×呼び出し種別の直近のレイテンシと成否"""
+        self.latencies = LatencyTracker(window_size)
+        self.outcomes = deque(maxlen=window_size)
+        self.demoted_until = 0.0
+        self.demotions = 0
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def reset(self):
+        self.latencies = LatencyTracker(self.outcomes.maxlen)
+        self.outcomes.clear()
+
+
+class ModelRouter:
+    def __init__(self, routes: Optional[Dict[str, Dict]] = None, window_size: int = 50, min_samples: int = 10,
+                 slo_percentile: float = 0.95, max_error_rate: float = 0.3, demote_seconds: float = 300.0):
+        """
+        モデルルーターを初期化
+
+        Args:
+            routes: 呼び出し種別 → {"models": [主モデル, フォールバック...], "latency_slo_seconds": SLO}
+                    （"default" は未定義の呼び出し種別に使う）
+            window_size: レイテンシ・エラー率の計算に使う直近の呼び出し数
+            min_samples: SLO判定を始めるまでに必要なサンプル数
+            slo_percentile: SLOと比較するレイテンシのパーセンタイル
+            max_error_rate: これを超えるエラー率のモデルを降格する
+            demote_seconds: 降格を続ける時間（経過後は統計をリセットして再び主モデルとして試す）
+        """
+        self.routes = {**DEFAULT_ROUTES, **(routes or {})}
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.slo_percentile = slo_percentile
+        self.max_error_rate = max_error_rate
+        self.demote_seconds = demote_seconds
+        self._health: Dict[tuple, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def get_route(self, call_type: str) -> Dict:
+        return self.routes.get(call_type) or self.routes["default"]
+
+    def primary_model(self, call_type: str) -> str:
+        """設定上の主モデル（キャッシュキーなど、降格に左右されない識別に使う）"""
+        return self.get_route(call_type)["models"][0]
+
+    def select_models(self, call_type: str) -> List[str]:
+        """
+        試行するモデルの順序を返す
+
+        降格中のモデルはチェーンの末尾に回し、他が全て失敗した場合の最終手段として残す。
+        """
+        models = self.get_route(call_type)["models"]
+        now = time.monotonic()
+        healthy = []
+        demoted = []
+        with self._lock:
+            for model in models:
+                health = self._health.get((call_type, model))
+                if health and health.demoted_until:
+                    if now < health.demoted_until:
+                        demoted.append(model)
+                        continue
+                    # 降格期間が過ぎたら統計をリセットして復帰させる
+                    health.demoted_until = 0.0
+                    health.reset()
+                    logger.info(f"モデルの降格を解除: {model} ({call_type})")
+                healthy.append(model)
+        return healthy + demoted
+
+    def record(self, call_type: str, model: str, latency: float, success: bool):
+        """呼び出し結果を記録し、SLOを外れたモデルを降格する"""
+        slo = self.get_route(call_type).get("latency_slo_seconds")
+        with self._lock:
+            health = self._health.get((call_type, model))
+            if health is None:
+                health = ModelHealth(self.window_size)
+                self._health[(call_type, model)] = health
+            if success:
+                health.latencies.record(latency)
+            health.outcomes.append(success)
+
+            if health.demoted_until or len(health.outcomes) < self.min_samples:
+                return
+
+            reason = None
+            latency_p = health.latencies.percentile(self.slo_percentile)
+            if slo and latency_p is not None and latency_p > slo:
+                reason = f"p{int(self.slo_percentile * 100)}レイテンシ {latency_p:.1f}秒 > SLO {slo:.1f}秒"
+            elif health.error_rate() > self.max_error_rate:
+                reason = f"エラー率 {health.error_rate():.0%} > {self.max_error_rate:.0%}"
+
+            # チェーンに1モデルしかない場合は降格しても意味が無い
+            if reason and len(self.get_route(call_type)["models"]) > 1:
+                health.demoted_until = time.monotonic() + self.demote_seconds
+                health.demotions += 1
+                logger.warning(f"モデルを降格: {model} ({call_type}) - {reason}")
+
+    def get_metrics(self) -> Dict:
+        """呼び出し種別・モデルごとのレイテンシ・エラー率・降格状態"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{call_type}:{model}": {
+                    "calls": len(health.outcomes),
+                    "latency_p50": health.latencies.percentile(0.5),
+                    "latency_p95": health.latencies.percentile(0.95),
+                    "error_rate": health.error_rate(),
+                    "demoted": now < health.demoted_until,
+                    "demotions": health.demotions
+                }
+                for (call_type, model), health in self._health.items()
+            }
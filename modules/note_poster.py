@@ -6,24 +6,61 @@ Playwrightを使用してnoteへの自動ログイン・投稿・タグ付与を
 import asyncio
 import logging
 from typing import Dict, List, Optional
-from playwright.async_api import async_playwright, Page, Browser
+from playwright.async_api import async_playwright, Page, Browser, TimeoutError as PlaywrightTimeoutError
 import json
 import os
+import re
 from datetime import datetime
 from .photo_gallery_manager import PhotoGalleryManager
+from .markdown_document import ensure_document
+from .browser_pool import BrowserPool, LAUNCH_ARGS
 
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ログイン中のユーザー情報を返すAPI（未ログインなら401）。ページを開かずにセッションの有効性を確認する
+CURRENT_USER_API = 'https://note.com/api/v2/current_user'
+
+EDITOR_SELECTOR = 'div[contenteditable="true"]'
+# 行頭で入力すると見出し・リスト・引用に変わる記法（この部分だけキー入力して変換させる）
+LINE_SHORTCUT_PATTERN = re.compile(r'^(#{1,6} |[-*+] |\d+\. |> )')
+# URLの段落がリンクカード（埋め込み）に置き換わるまでの待機上限
+LINK_CARD_TIMEOUT_MS = 5000
+# エディタ内のリンクカード・URLだけの段落を数える
+_LINK_CARD_STATE_JS = """
+([selector, url]) => {
+    const root = document.querySelector(selector);
+    if (!root) return null;
+    const cards = root.querySelectorAll('figure, iframe, [embedded-service], [data-embed-service]').length;
+    const urlParagraphs = [...root.querySelectorAll('p')].filter(p => p.textContent.trim() === url).length;
+    return {cards, urlParagraphs};
+}
+"""
+_LINK_CARD_RENDERED_JS = """
+([selector, url, cardsBefore]) => {
+    const root = document.querySelector(selector);
+    if (!root) return false;
+    if (root.querySelectorAll('figure, iframe, [embedded-service], [data-embed-service]').length > cardsBefore) return true;
+    return ![...root.querySelectorAll('p')].some(p => p.textContent.trim() === url);
+}
+"""
+
 class NotePoster:
-    def __init__(self, username: str, password: str, headless: bool = True, enable_photo_gallery: bool = True):
+    def __init__(self, username: str, password: str, headless: bool = True, enable_photo_gallery: bool = True,
+                 session_file: Optional[str] = "data/note_session.json", browser_pool: Optional[BrowserPool] = None):
         self.username = username
         self.password = password
         self.headless = headless
         self.browser = None
+        self.context = None
         self.page = None
         self.is_logged_in = False
+        # ログイン済みのCookie等（Playwright の storage_state）の保存先。Noneなら毎回ログインする
+        self.session_file = session_file
+        self.session_restored = False
+        # 指定された場合はブラウザを起動せず、プールのブラウザから投稿ごとにコンテキストを借りる
+        self.browser_pool = browser_pool
         
         # 画像ギャラリー機能を初期化
         self.enable_photo_gallery = enable_photo_gallery
@@ -35,23 +72,97 @@ class NotePoster:
             logger.info("みんなのフォトギャラリー機能は無効です")
     
     async def start_browser(self):
-        """ブラウザを起動"""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=self.headless,
-            args=['--no-sandbox', '--disable-dev-shm-usage']
-        )
-        self.context = await self.browser.new_context(
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        )
+        """ブラウザを起動（プールを使う場合は新しいコンテキストだけを作る）"""
+        if self.browser_pool is None:
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(
+                headless=self.headless,
+                args=LAUNCH_ARGS
+            )
+        user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        self.session_restored = False
+        self.is_logged_in = False
+        self.context = None
+        if self.session_file and os.path.exists(self.session_file):
+            # 保存済みのセッションを復元（壊れていれば新しいコンテキストで始める）
+            try:
+                self.context = await self._new_context(user_agent=user_agent, storage_state=self.session_file)
+                self.session_restored = True
+            except Exception as e:
+                logger.warning(f"保存済みセッションを読み込めません: {e}")
+        if self.context is None:
+            self.context = await self._new_context(user_agent=user_agent)
         self.page = await self.context.new_page()
     
+    async def _new_context(self, **options):
+        if self.browser_pool is not None:
+            return await self.browser_pool.new_context(**options)
+        return await self.browser.new_context(**options)
+    
     async def close_browser(self):
-        """ブラウザを終了"""
-        if self.browser:
-            await self.browser.close()
-        if hasattr(self, 'playwright'):
-            await self.playwright.stop()
+        """ブラウザを終了（ログイン中なら更新されたCookieを保存してから閉じる。2回呼んでもよい）"""
+        if self.is_logged_in:
+            await self.save_session()
+            self.is_logged_in = False
+        if self.browser_pool is not None:
+            # ブラウザは次の投稿でも使うため、このコンテキストだけを返す
+            if self.context:
+                await self.browser_pool.release(self.context)
+            self.context = None
+            self.page = None
+            return
+        browser, self.browser = self.browser, None
+        playwright, self.playwright = getattr(self, 'playwright', None), None
+        self.context = None
+        self.page = None
+        if browser:
+            await browser.close()
+        if playwright:
+            await playwright.stop()
+    
+    async def save_session(self):
+        """ログイン状態（Cookie・localStorage）を保存"""
+        if not self.session_file or not self.context:
+            return
+        try:
+            directory = os.path.dirname(self.session_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_file = self.session_file + '.tmp'
+            await self.context.storage_state(path=tmp_file)
+            # 認証情報を含むため所有者だけが読めるようにする
+            os.chmod(tmp_file, 0o600)
+            os.replace(tmp_file, self.session_file)
+            logger.info(f"ログインセッションを保存しました: {self.session_file}")
+        except Exception as e:
+            logger.warning(f"ログインセッションの保存に失敗: {e}")
+    
+    async def is_session_valid(self) -> bool:
+        """復元したセッションが有効か、ユーザー情報APIで確認（ページの読み込みや待機は行わない）"""
+        try:
+            response = await self.context.request.get(CURRENT_USER_API, timeout=10000)
+            if not response.ok:
+                return False
+            data = await response.json()
+            return bool((data or {}).get('data'))
+        except Exception as e:
+            logger.warning(f"セッションの確認に失敗: {e}")
+            return False
+    
+    async def ensure_logged_in(self) -> bool:
+        """保存済みのセッションが有効ならそのまま使い、期限切れの場合だけログインする"""
+        if self.is_logged_in:
+            return True
+        if self.session_restored and await self.is_session_valid():
+            logger.info("保存済みのログインセッションを使用します")
+            self.is_logged_in = True
+            return True
+        if self.session_restored:
+            logger.info("保存済みのログインセッションが期限切れのため、ログインし直します")
+        if await self.login():
+            await self.save_session()
+            return True
+        return False
     
     async def login(self) -> bool:
         """noteにログイン"""
@@ -139,8 +250,11 @@ class NotePoster:
             logger.error(f"ログインエラー: {e}")
             return False
     
-    async def post_article(self, title, content, tags, thumbnail_path=None, products=None, article_category=None):
-        """記事を投稿する（OGPリンクカード対応版 + 画像自動追加）"""
+    async def post_article(self, title, content, tags, thumbnail_path=None, products=None, article_category=None, document=None):
+        """記事を投稿する（OGPリンクカード対応版 + 画像自動追加）
+
+        document に解析済みの ArticleDocument を渡すと本文の再解析を省略する
+        """
         try:
             logger.info("記事投稿を開始")
             
@@ -184,43 +298,41 @@ class NotePoster:
             
             # 本文入力（OGPリンクカード対応版）
             logger.info("本文を入力中...")
+            started = datetime.now()
             try:
                 # 本文エリアを取得してフォーカス
-                await self.page.wait_for_selector('div[contenteditable="true"]', timeout=10000)
-                content_area = await self.page.query_selector('div[contenteditable="true"]')
+                await self.page.wait_for_selector(EDITOR_SELECTOR, timeout=10000)
+                content_area = await self.page.query_selector(EDITOR_SELECTOR)
                 await content_area.click()
                 
-                # 本文を行ごとに処理してカードリンクを生成
-                lines = content.split('\n')
+                # 本文をブロックごとに処理してカードリンクを生成
+                input_blocks = ensure_document(document or content).input_blocks()
+                pending_cards = 0
                 
-                for i, line in enumerate(lines):
-                    if line.strip():  # 空行でない場合
-                        # 行を入力
-                        await self.page.keyboard.type(line)
-                        
-                        # URLが含まれている場合は、Enterを押してカードリンクを生成
-                        if 'amazon.co.jp' in line or 'http' in line:
-                            logger.info(f"URL検出: {line[:50]}...")
-                            await self.page.keyboard.press('Enter')
-                            # カードリンク生成を待機
-                            await asyncio.sleep(2)
-                            logger.info("カードリンク生成待機完了")
-                        else:
-                            # 通常の行の場合は改行のみ
-                            await self.page.keyboard.press('Enter')
+                for i, (kind, text) in enumerate(input_blocks):
+                    if kind == "link_card":
+                        # URL単独のブロックはEnterでカードリンクに変わるのを確認してから次へ進む
+                        logger.info(f"URL検出: {text[:50]}...")
+                        if not await self.insert_link_card(text):
+                            pending_cards += 1
                     else:
-                        # 空行の場合は改行のみ
+                        await self.insert_text_block(text)
+                    
+                    # ブロック間の空行
+                    if i < len(input_blocks) - 1:
                         await self.page.keyboard.press('Enter')
                 
-                logger.info("本文入力成功（カードリンク対応版）")
+                elapsed = (datetime.now() - started).total_seconds()
+                logger.info(f"本文入力成功（カードリンク対応版、{elapsed:.1f}秒）")
                     
             except Exception as e:
                 logger.error(f"本文入力に失敗: {e}")
                 return False
             
-            # OGPリンクカードの最終生成を待機
-            logger.info("全てのOGPリンクカードの生成を待機中...")
-            await self.page.wait_for_timeout(5000)
+            # 生成を確認できなかったOGPリンクカードだけ追加で待機
+            if pending_cards:
+                logger.info(f"未生成のOGPリンクカード {pending_cards}件の生成を待機中...")
+                await self.page.wait_for_timeout(5000)
             
             # 少し待機してから公開に進む
             await self.page.wait_for_timeout(2000)
@@ -267,6 +379,43 @@ class NotePoster:
             logger.error(f"記事投稿中にエラーが発生: {e}")
             return False
     
+    async def insert_text_block(self, text: str):
+        """
+        見出し・段落のブロックを入力
+        
+        1文字ずつキー入力せず、行ごとに insert_text でまとめて挿入する。
+        行頭の見出し・リスト記法だけはキー入力してエディタの変換を効かせる。
+        """
+        for line in text.split('\n'):
+            match = LINE_SHORTCUT_PATTERN.match(line)
+            rest = line
+            if match:
+                await self.page.keyboard.type(match.group(1))
+                rest = line[match.end():]
+            if rest:
+                await self.page.keyboard.insert_text(rest)
+            await self.page.keyboard.press('Enter')
+    
+    async def insert_link_card(self, url: str) -> bool:
+        """
+        URLを単独の段落として入力し、リンクカードに置き換わるまで待つ
+        
+        Returns:
+            bool: 待機上限までにカードの生成を確認できたか
+        """
+        before = await self.page.evaluate(_LINK_CARD_STATE_JS, [EDITOR_SELECTOR, url])
+        cards_before = (before or {}).get('cards', 0)
+        await self.page.keyboard.insert_text(url)
+        await self.page.keyboard.press('Enter')
+        try:
+            await self.page.wait_for_function(_LINK_CARD_RENDERED_JS, arg=[EDITOR_SELECTOR, url, cards_before],
+                                              timeout=LINK_CARD_TIMEOUT_MS)
+            logger.info("カードリンク生成を確認")
+            return True
+        except PlaywrightTimeoutError:
+            logger.warning(f"カードリンクの生成を確認できませんでした（{LINK_CARD_TIMEOUT_MS}ms）: {url[:50]}")
+            return False
+    
     # async def convert_affiliate_placeholders(self, products: List[Dict]) -> bool:
     #     """
     #     アフィリエイトリンクプレースホルダーを実際のリンクに変換
@@ -687,7 +836,7 @@ async def main():
     try:
         await poster.start_browser()
         
-        if await poster.login():
+        if await poster.ensure_logged_in():
             article_data = {
                 "title": "テスト記事タイトル",
                 "content": "これはテスト記事の本文です。",
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+商品カタログモジュール
+商品データをバージョン付きのJSONファイル（data/product_catalog.json）から遅延読み込みし、
+商品名 → アフィリエイトリンクの対応表を読み込み時に一度だけ構築する
+商品は変更不可の ProductRecord として保持し、コピーせずに共有する
+ファイルの更新時刻が変わると自動で読み込み直す
+読み込みのたびに関連商品の近傍テーブル（data/product_neighbors.json）を差分更新する
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .catalog_columns import CatalogColumns
+from .product_index import ProductSearchIndex
+from .product_neighbors import ProductNeighborTable
+from .product_record import ProductRecord
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("id", "genre", "name", "keywords", "price_range", "description")
+
+
+class ProductCatalog:
+    def __init__(self, catalog_file: str = "data/product_catalog.json",
+                 link_builder: Optional[Callable[[str], str]] = None,
+                 check_interval: float = 1.0,
+                 neighbor_file: Optional[str] = "data/product_neighbors.json", neighbor_k: int = 10):
+        """
+        商品カタログを初期化（ファイルは最初に参照されたときに読み込む）
+
+        Args:
+            catalog_file: カタログファイル
+            link_builder: カタログの "link"（URLまたは "SEARCH:<クエリ>"）をアフィリエイトリンクに変換する関数
+            check_interval: ファイルの更新時刻を確認する間隔（秒）
+            neighbor_file: 近傍テーブルの保存先（Noneなら近傍テーブルを使わない）
+            neighbor_k: 商品ごとに保持する近傍の数
+        """
+        self.catalog_file = catalog_file
+        self.link_builder = link_builder
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._loaded_mtime: Optional[float] = None
+        self._last_check = 0.0
+
+        self.version = None
+        self.genres: Dict[str, Dict] = {}
+        self.categories: Dict[str, List[ProductRecord]] = {}
+        self.products_by_id: Dict[str, ProductRecord] = {}
+        self.link_table: Dict[str, str] = {}
+        self.search_index: Optional[ProductSearchIndex] = None
+        self.columns: Optional[CatalogColumns] = None
+        self.neighbor_table = ProductNeighborTable(neighbor_file, k=neighbor_k) if neighbor_file else None
+
+    def _ensure_loaded(self):
+        """未読み込み、またはファイルが更新されていれば読み込む"""
+        now = time.monotonic()
+        if self._loaded_mtime is not None and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            try:
+                mtime = os.path.getmtime(self.catalog_file)
+            except OSError as e:
+                if self._loaded_mtime is None:
+                    raise FileNotFoundError(f"商品カタログが見つかりません: {self.catalog_file}") from e
+                # 読み込み済みのデータがあればそのまま使い続ける
+                return
+            if mtime != self._loaded_mtime:
+                self._load(mtime)
+
+    def _load(self, mtime: float):
+        with open(self.catalog_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        genres = data.get("genres", {})
+        categories: Dict[str, List[ProductRecord]] = {genre: [] for genre in genres}
+        products_by_id: Dict[str, ProductRecord] = {}
+        link_table: Dict[str, str] = {}
+
+        for record in data.get("products", []):
+            missing = [field for field in REQUIRED_FIELDS if field not in record]
+            if missing:
+                logger.warning(f"必須項目が無い商品をスキップ: {record.get('id', record.get('name'))}（{', '.join(missing)}）")
+                continue
+            if record["id"] in products_by_id:
+                logger.warning(f"IDが重複する商品をスキップ: {record['id']}")
+                continue
+
+            product = ProductRecord.from_dict(record)
+            products_by_id[product.id] = product
+            categories.setdefault(product.genre, []).append(product)
+            # ASIN・検索クエリの対応は読み込み時にリンクへ変換しておく
+            if product.link:
+                link_table[product.name] = self.link_builder(product.link) if self.link_builder else product.link
+
+        # キーワード・商品名の転置インデックス
+        search_index = ProductSearchIndex(products_by_id.values())
+        # 価格・ジャンル・キーワードの列指向ビュー
+        columns = CatalogColumns(products_by_id.values())
+        # 関連商品の近傍テーブルは、変更のあった商品の周辺だけを計算し直す
+        if self.neighbor_table:
+            self._refresh_neighbors(products_by_id.values())
+
+        # 読み込みが完了してから差し替える（参照中のスレッドは古いデータをそのまま使える）
+        self.version = data.get("version")
+        self.genres = genres
+        self.categories = categories
+        self.products_by_id = products_by_id
+        self.link_table = link_table
+        self.search_index = search_index
+        self.columns = columns
+        self._loaded_mtime = mtime
+
+        logger.info(f"商品カタログを読み込みました: バージョン {self.version}、{len(products_by_id)}件")
+
+    def _refresh_neighbors(self, products: Iterable[Dict]):
+        try:
+            if self.neighbor_table.refresh(products):
+                self.neighbor_table.save()
+        except Exception as e:
+            logger.warning(f"近傍テーブルの更新に失敗: {e}")
+
+    def get_categories(self) -> Dict[str, List[ProductRecord]]:
+        """ジャンル → 商品リスト"""
+        self._ensure_loaded()
+        return self.categories
+
+    def get_product(self, product_id: str) -> Optional[ProductRecord]:
+        self._ensure_loaded()
+        return self.products_by_id.get(product_id)
+
+    def get_records(self) -> List[ProductRecord]:
+        """カタログの全商品レコード（ジャンル・リンクを含む）"""
+        self._ensure_loaded()
+        return list(self.products_by_id.values())
+
+    def get_link(self, product_name: str) -> Optional[str]:
+        """商品名に対応する構築済みのアフィリエイトリンク（対応が無ければNone）"""
+        self._ensure_loaded()
+        return self.link_table.get(product_name)
+
+    def search(self, query: str, max_results: int = 5, genres: Optional[Iterable[str]] = None) -> List[ProductRecord]:
+        """転置インデックスでスコア順に商品レコードを検索"""
+        self._ensure_loaded()
+        products_by_id = self.products_by_id
+        return [products_by_id[product_id] for product_id, _ in self.search_index.search(query, max_results, genres)]
+
+    def get_columns(self) -> CatalogColumns:
+        """数値の価格帯・ジャンルコード・キーワードのビット集合による列指向ビュー"""
+        self._ensure_loaded()
+        return self.columns
+
+    def get_neighbors(self, product_id: str, limit: Optional[int] = None) -> List[str]:
+        """近傍テーブルから関連度の高い順に商品IDを返す（テーブルが無ければ空）"""
+        self._ensure_loaded()
+        if not self.neighbor_table:
+            return []
+        return self.neighbor_table.get(product_id, limit)
+
+    def get_image_category_mapping(self) -> Dict[str, str]:
+        self._ensure_loaded()
+        return {genre: info.get("image_category", "モノ") for genre, info in self.genres.items()}
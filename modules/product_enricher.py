@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+商品情報の更新モジュール
+カタログのASINリンクの商品ページを aiohttp で非同期にまとめて取得し、現在の価格（取得日時つき）と在庫状況を更新する
+手書きの価格帯（price_range）は変えず、空の場合だけ取得した価格で埋める
+接続はホストごとの同時接続数を制限したプールで使い回し、前回の ETag / Last-Modified による条件付きリクエストで
+変更の無いページは304だけで済ませる（応答の解析結果はディスクにキャッシュする）
+
+使い方:
+    python -m modules.product_enricher --catalog data/product_catalog.json
+    python -m modules.product_enricher --base-url http://127.0.0.1:8090   # スタブサーバーに対して実行
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import aiohttp
+except ImportError:  # requirements.txt に含まれるが、商品情報の更新を使わない環境では不要
+    aiohttp = None
+
+from .catalog_ingest import parse_page, write_json_atomic
+from .rate_limiter import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+PRODUCT_ORIGIN = "https://www.amazon.co.jp"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Retry-After がこれより長い場合は待たずに諦める（次回の更新で取り直す）
+MAX_RETRY_AFTER_SECONDS = 60
+
+_DP_PATTERN = re.compile(r'/(?:dp|gp/product)/([A-Z0-9]{10})')
+
+
+class ProductEnricher:
+    def __init__(self, cache_file: str = "data/product_enrich_cache.json", max_connections: int = 64,
+                 per_host_limit: int = 8, timeout: float = 15.0, max_retries: int = 2,
+                 base_url: Optional[str] = None, user_agent: str = DEFAULT_USER_AGENT):
+        """
+        更新クライアントを初期化
+
+        Args:
+            cache_file: URLごとの ETag / Last-Modified と解析結果を保存するファイル
+            max_connections: 接続プール全体の同時接続数
+            per_host_limit: ホストごとの同時接続数
+            timeout: 1リクエストのタイムアウト（秒）
+            max_retries: 429・5xx・通信エラー時の再試行回数
+            base_url: 商品ページの取得先（スタブサーバーで試す場合に指定。省略時はAmazon）
+            user_agent: User-Agent ヘッダー
+        """
+        self.cache_file = cache_file
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.origin = (base_url or PRODUCT_ORIGIN).rstrip("/")
+        self.user_agent = user_agent
+        self.cache: Dict[str, Dict] = self._load_cache()
+        self.stats = {"requests": 0, "ok": 0, "not_modified": 0, "errors": 0, "checked": 0}
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"商品ページキャッシュの読み込みに失敗: {e}")
+            return {}
+
+    def save_cache(self):
+        write_json_atomic(self.cache_file, self.cache)
+
+    def product_url(self, record: Dict) -> Optional[str]:
+        """カタログのASINリンクから取得先のURLを作る（検索リンクの商品は対象外）"""
+        match = _DP_PATTERN.search(record.get("link", ""))
+        return f"{self.origin}/dp/{match.group(1)}" if match else None
+
+    async def _fetch(self, session, url: str) -> Optional[Dict]:
+        """条件付きリクエストで1ページ取得し、解析結果を返す（変更が無ければキャッシュの結果）"""
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.stats["requests"] += 1
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached:
+                        self.stats["not_modified"] += 1
+                        cached["checked_at"] = time.time()
+                        return dict(cached["item"], checked_at=cached["checked_at"])
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        # Retry-After があればその時間だけ待つ（指数バックオフより短くはしない）
+                        retry_after = parse_retry_after(response.headers)
+                        if retry_after is None or retry_after <= MAX_RETRY_AFTER_SECONDS:
+                            await asyncio.sleep(max(2 ** attempt, retry_after or 0))
+                            continue
+                        logger.warning(f"Retry-After が長すぎるため再試行しません: {url} ({retry_after:.0f}秒)")
+                    if response.status != 200:
+                        logger.warning(f"商品ページの取得に失敗: {url} ({response.status})")
+                        self.stats["errors"] += 1
+                        return None
+                    content = await response.read()
+                    items = parse_page(content)
+                    if not items:
+                        logger.warning(f"商品ページを解析できません: {url}")
+                        self.stats["errors"] += 1
+                        return None
+                    self.stats["ok"] += 1
+                    self.cache[url] = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "checked_at": time.time(),
+                        "item": {"price": items[0]["price"], "availability": items[0].get("availability", "")}
+                    }
+                    return dict(self.cache[url]["item"], checked_at=self.cache[url]["checked_at"])
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+                    continue
+                logger.warning(f"商品ページの取得エラー: {url}: {e}")
+                self.stats["errors"] += 1
+                return None
+        return None
+
+    async def fetch_all(self, urls: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """URLをまとめて並行に取得（同時接続数は接続プールで制限）"""
+        if aiohttp is None:
+            raise RuntimeError("商品情報の更新には aiohttp が必要です（pip install aiohttp）")
+        urls = list(dict.fromkeys(urls))
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host_limit)
+        # total だと接続プールの空き待ちも含まれるため、接続と読み込みごとに制限する
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": self.user_agent,
+                                                  "Accept-Language": "ja-JP,ja;q=0.9"}) as session:
+            results = await asyncio.gather(*(self._fetch(session, url) for url in urls))
+        return dict(zip(urls, results))
+
+    def enrich(self, records: List[Dict]) -> int:
+        """
+        カタログの商品レコードの現在の価格・在庫状況をその場で更新
+
+        取得した価格は price、取得日時は price_checked_at に保存し、手書きの価格帯（price_range）は
+        空の場合だけ埋める（一時的な値上がりで価格帯を広げたり、値下がりを見落としたりしない）。
+
+        Returns:
+            int: 価格・在庫状況に変更のあった商品数（取得日時だけの更新は数えない）
+        """
+        targets = [(record, self.product_url(record)) for record in records]
+        targets = [(record, url) for record, url in targets if url]
+        results = asyncio.run(self.fetch_all(url for _, url in targets))
+
+        changed = 0
+        for record, url in targets:
+            item = results.get(url)
+            if not item:
+                continue
+            updates = {}
+            if item.get("price"):
+                if record.get("price") != item["price"]:
+                    updates["price"] = item["price"]
+                if not record.get("price_range"):
+                    updates["price_range"] = str(item["price"])
+                record["price_checked_at"] = datetime.fromtimestamp(item["checked_at"]).isoformat(timespec="seconds")
+                self.stats["checked"] += 1
+            if item.get("availability") and record.get("availability") != item["availability"]:
+                updates["availability"] = item["availability"]
+            if updates:
+                record.update(updates)
+                changed += 1
+        self.save_cache()
+        return changed
+
+    def enrich_catalog(self, catalog_file: str = "data/product_catalog.json") -> Dict:
+        """カタログファイルの商品をまとめて更新し、変更があれば version を上げて書き戻す"""
+        with open(catalog_file, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+
+        started = time.monotonic()
+        changed = self.enrich(catalog.get("products", []))
+        if changed:
+            catalog["version"] = catalog.get("version", 0) + 1
+            catalog["updated_at"] = date.today().isoformat()
+        if changed or self.stats["checked"]:
+            # 価格の取得日時だけが変わった場合は version を上げずに書き戻す
+            write_json_atomic(catalog_file, catalog, indent=2)
+
+        result = dict(self.stats, changed=changed, elapsed=round(time.monotonic() - started, 2),
+                      version=catalog.get("version"))
+        logger.info(f"商品情報の更新完了: {result}")
+        return result
+
+
+def main(argv=None):
+    """カタログの価格・在庫状況を更新するCLI"""
+    parser = argparse.ArgumentParser(description="カタログの商品ページを取得して価格・在庫状況を更新")
+    parser.add_argument("--catalog", default="data/product_catalog.json", help="カタログファイル")
+    parser.add_argument("--cache", default="data/product_enrich_cache.json", help="商品ページキャッシュ")
+    parser.add_argument("--base-url", default=None, help="商品ページの取得先（スタブサーバーのURLなど）")
+    parser.add_argument("--connections", type=int, default=64, help="同時接続数の上限")
+    parser.add_argument("--per-host", type=int, default=8, help="ホストごとの同時接続数の上限")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    enricher = ProductEnricher(args.cache, max_connections=args.connections, per_host_limit=args.per_host,
+                               base_url=args.base_url)
+    print(json.dumps(enricher.enrich_catalog(args.catalog), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
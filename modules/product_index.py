@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+商品検索インデックスモジュール
+カタログ読み込み時に、正規化したキーワードと商品名の文字bigramから商品IDへの転置インデックスを構築し、
+複数語のスコア付き検索とジャンル絞り込みを行う
+"""
+
+import heapq
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+KEYWORD_WEIGHT = 3.0
+NAME_TOKEN_WEIGHT = 2.0
+NAME_BIGRAM_WEIGHT = 0.5
+# 商品名のbigramだけで一致とみなすのに必要な、検索語のbigramの被覆率
+MIN_BIGRAM_COVERAGE = 0.6
+# これより多くの商品に現れるbigramは絞り込みに役立たないため、bigram検索では使わない
+COMMON_BIGRAM_RATIO = 0.05
+
+_SEPARATORS = re.compile(r'[\s、。・,./／|｜()（）「」【】\[\]～~…:：!！?？]+')
+
+
+def normalize_text(text: str) -> str:
+    """全角・半角と大文字・小文字の揺れを吸収"""
+    return unicodedata.normalize('NFKC', text).lower().strip()
+
+
+def split_terms(text: str) -> List[str]:
+    return [term for term in _SEPARATORS.split(normalize_text(text)) if term]
+
+
+def char_bigrams(text: str) -> Set[str]:
+    chars = [ch for ch in normalize_text(text) if ch.isalnum()]
+    return {chars[i] + chars[i + 1] for i in range(len(chars) - 1)}
+
+
+class ProductSearchIndex:
+    def __init__(self, products: Iterable[Dict]):
+        """
+        転置インデックスを構築
+
+        Args:
+            products: "id", "genre", "name", "keywords" を持つ商品レコード（カタログ順）
+        """
+        self.order: Dict[str, int] = {}
+        self.genres: Dict[str, str] = {}
+        self.keyword_postings: Dict[str, Set[str]] = {}
+        self.token_postings: Dict[str, Set[str]] = {}
+        self.bigram_postings: Dict[str, Set[str]] = {}
+        self.max_term_length = 1
+
+        for position, product in enumerate(products):
+            product_id = product["id"]
+            self.order[product_id] = position
+            self.genres[product_id] = product.get("genre", "")
+
+            for keyword in product.get("keywords", []):
+                self._add(self.keyword_postings, normalize_text(keyword), product_id)
+            for token in split_terms(product["name"]):
+                self._add(self.token_postings, token, product_id)
+            for gram in char_bigrams(product["name"]):
+                self.bigram_postings.setdefault(gram, set()).add(product_id)
+
+        self.common_bigram_limit = max(50, int(len(self.order) * COMMON_BIGRAM_RATIO))
+
+    def _add(self, postings: Dict[str, Set[str]], term: str, product_id: str):
+        if not term:
+            return
+        postings.setdefault(term, set()).add(product_id)
+        self.max_term_length = max(self.max_term_length, len(term))
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _contained_terms(self, text: str) -> Iterable[str]:
+        """text に部分文字列として含まれるインデックス語（キーワードが検索文に含まれるかの判定用）"""
+        seen = set()
+        for start in range(len(text)):
+            for end in range(start + 1, min(len(text), start + self.max_term_length) + 1):
+                term = text[start:end]
+                if term not in seen:
+                    seen.add(term)
+                    yield term
+
+    def search(self, query: str, max_results: int = 5, genres: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        スコア順に商品IDを返す
+
+        スコアは、検索文に含まれるキーワード・商品名の語の一致（長い語ほど高い）と、検索語ごとの商品名bigramの一致の合計。
+        キーワードか商品名の語が一致するか、いずれかの検索語のbigramの大部分が商品名に含まれる商品を対象とする。
+        bigramの照合は、キーワード・商品名の語と完全に一致しなかった検索語についてのみ行う。
+
+        Args:
+            query: 検索文（空白区切りで複数語）
+            max_results: 最大件数
+            genres: 指定した場合はこれらのジャンルの商品に絞り込む
+
+        Returns:
+            List[Tuple[str, float]]: (商品ID, スコア)
+        """
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+        genre_filter = set(genres) if genres else None
+        scores: Dict[str, float] = {}
+        matched: Set[str] = set()
+
+        for term in self._contained_terms(normalized):
+            # 長い語の一致ほど具体的なので重みを上げる
+            length_factor = len(term) ** 0.5
+            for product_id in self.keyword_postings.get(term, ()):
+                scores[product_id] = scores.get(product_id, 0.0) + KEYWORD_WEIGHT * length_factor
+                matched.add(product_id)
+            for product_id in self.token_postings.get(term, ()):
+                scores[product_id] = scores.get(product_id, 0.0) + NAME_TOKEN_WEIGHT * length_factor
+                matched.add(product_id)
+
+        # キーワード・商品名の語と完全に一致しない検索語だけ、商品名のbigramで部分一致を探す
+        for term in split_terms(query):
+            if term in self.keyword_postings or term in self.token_postings:
+                continue
+            grams = [
+                gram for gram in char_bigrams(term)
+                if len(self.bigram_postings.get(gram, ())) <= self.common_bigram_limit
+            ]
+            if not grams:
+                continue
+            hits: Dict[str, int] = {}
+            for gram in grams:
+                for product_id in self.bigram_postings.get(gram, ()):
+                    hits[product_id] = hits.get(product_id, 0) + 1
+            for product_id, count in hits.items():
+                scores[product_id] = scores.get(product_id, 0.0) + NAME_BIGRAM_WEIGHT * count
+                if count / len(grams) >= MIN_BIGRAM_COVERAGE:
+                    matched.add(product_id)
+
+        candidates = (
+            product_id for product_id in matched
+            if genre_filter is None or self.genres.get(product_id) in genre_filter
+        )
+        top = heapq.nsmallest(max_results, candidates, key=lambda pid: (-scores[pid], self.order[pid]))
+        return [(product_id, scores[product_id]) for product_id in top]
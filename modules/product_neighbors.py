@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+関連商品の近傍テーブルモジュール
+カタログの商品ごとに、同じジャンル内でキーワードのJaccard係数・商品カテゴリ・価格帯の近さから
+関連度の高い上位k件をあらかじめ計算してJSONに保存し、商品紹介記事の商品選びをO(k)の参照にする
+カタログが変わった場合は、影響を受ける商品だけを計算し直す
+
+使い方:
+    python -m modules.product_neighbors --catalog data/product_catalog.json
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .catalog_columns import parse_price_range
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_WEIGHT = 0.6
+CATEGORY_WEIGHT = 0.25
+PRICE_WEIGHT = 0.15
+
+
+def product_fingerprint(product: Dict) -> str:
+    """近傍の計算に使う項目だけのハッシュ（名前や説明の変更では再計算しない）"""
+    payload = json.dumps(
+        [product.get("genre"), product.get("category"), sorted(k.lower() for k in product.get("keywords", [])),
+         product.get("price_range")],
+        ensure_ascii=False
+    )
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+class _Features:
+    __slots__ = ("genre", "category", "keywords", "center")
+
+    def __init__(self, product: Dict):
+        self.genre = product.get("genre", "")
+        self.category = product.get("category", "")
+        self.keywords = frozenset(keyword.lower() for keyword in product.get("keywords", []))
+        low, high = parse_price_range(product.get("price_range", ""))
+        self.center = (low + high) / 2 if low == low else None  # nan は None に
+
+
+def similarity(a: _Features, b: _Features) -> float:
+    """キーワードのJaccard係数・カテゴリ一致・価格の近さの重み付き和（0.0-1.0）"""
+    union = len(a.keywords | b.keywords)
+    jaccard = len(a.keywords & b.keywords) / union if union else 0.0
+    category = 1.0 if a.category and a.category == b.category else 0.0
+    price = 0.0
+    if a.center and b.center:
+        price = min(a.center, b.center) / max(a.center, b.center)
+    return KEYWORD_WEIGHT * jaccard + CATEGORY_WEIGHT * category + PRICE_WEIGHT * price
+
+
+class ProductNeighborTable:
+    def __init__(self, table_file: str = "data/product_neighbors.json", k: int = 10):
+        """
+        近傍テーブルを初期化（保存済みのテーブルがあれば読み込む）
+
+        Args:
+            table_file: 保存先のJSONファイル
+            k: 商品ごとに保持する近傍の数
+        """
+        self.table_file = table_file
+        self.k = k
+        self.fingerprints: Dict[str, str] = {}
+        self.neighbors: Dict[str, List[Tuple[str, float]]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.table_file):
+            return
+        try:
+            with open(self.table_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"近傍テーブルの読み込みに失敗: {e}")
+            return
+        if data.get("k") != self.k:
+            # 近傍の数が変わった場合は全件計算し直す
+            return
+        self.fingerprints = data.get("fingerprints", {})
+        self.neighbors = {product_id: [tuple(item) for item in items] for product_id, items in data.get("neighbors", {}).items()}
+
+    def save(self):
+        """一時ファイルに書いてから置き換える"""
+        directory = os.path.dirname(self.table_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "k": self.k,
+            "fingerprints": self.fingerprints,
+            "neighbors": {product_id: [[neighbor_id, round(score, 4)] for neighbor_id, score in items]
+                          for product_id, items in self.neighbors.items()}
+        }
+        tmp_file = self.table_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.table_file)
+
+    def get(self, product_id: str, limit: Optional[int] = None) -> List[str]:
+        """関連度の高い順に近傍の商品IDを返す"""
+        items = self.neighbors.get(product_id, [])
+        return [neighbor_id for neighbor_id, _ in items[:limit]]
+
+    def refresh(self, products: Iterable[Dict]) -> int:
+        """
+        カタログとの差分を反映
+
+        追加・変更・削除された商品と、それらと近傍関係になりうる商品（同じジャンルでキーワードかカテゴリを共有する商品、
+        近傍に変更された商品を含む商品）だけを計算し直す。
+
+        Args:
+            products: "id" を持つ商品レコード
+
+        Returns:
+            int: 計算し直した商品数
+        """
+        products = {product["id"]: product for product in products}
+        fingerprints = {product_id: product_fingerprint(product) for product_id, product in products.items()}
+        changed = {product_id for product_id, fingerprint in fingerprints.items()
+                   if self.fingerprints.get(product_id) != fingerprint}
+        removed = set(self.fingerprints) - set(fingerprints)
+        if not changed and not removed:
+            return 0
+
+        features = {product_id: _Features(product) for product_id, product in products.items()}
+
+        # ジャンル内の転置インデックスと価格順の並び
+        postings: Dict[Tuple[str, str], Set[str]] = {}
+        by_price: Dict[str, List[Tuple[float, str]]] = {}
+        for product_id, feature in features.items():
+            for keyword in feature.keywords:
+                postings.setdefault((feature.genre, "kw:" + keyword), set()).add(product_id)
+            if feature.category:
+                postings.setdefault((feature.genre, "cat:" + feature.category), set()).add(product_id)
+            by_price.setdefault(feature.genre, []).append((feature.center or 0.0, product_id))
+        for items in by_price.values():
+            items.sort()
+
+        def candidates(product_id: str) -> Set[str]:
+            feature = features[product_id]
+            found: Set[str] = set()
+            for keyword in feature.keywords:
+                found |= postings.get((feature.genre, "kw:" + keyword), set())
+            if feature.category:
+                found |= postings.get((feature.genre, "cat:" + feature.category), set())
+            found.discard(product_id)
+            if len(found) < self.k:
+                # 共通点のある商品が足りない場合は、価格の近い同ジャンルの商品で補う
+                items = by_price.get(feature.genre, [])
+                center = feature.center or 0.0
+                position = bisect.bisect_left(items, (center, ""))
+                low, high = position - 1, position
+                while len(found) < self.k and (low >= 0 or high < len(items)):
+                    if high < len(items) and (low < 0 or items[high][0] - center <= center - items[low][0]):
+                        found.add(items[high][1])
+                        high += 1
+                    else:
+                        found.add(items[low][1])
+                        low -= 1
+                    found.discard(product_id)
+            return found
+
+        # 再計算の対象: 変更された商品、それと近傍になりうる商品、近傍に変更・削除された商品を含む商品
+        stale = changed | removed
+        targets = set(changed)
+        for product_id in changed:
+            targets |= candidates(product_id)
+        for product_id, items in self.neighbors.items():
+            if product_id in products and any(neighbor_id in stale for neighbor_id, _ in items):
+                targets.add(product_id)
+
+        for product_id in removed:
+            self.neighbors.pop(product_id, None)
+        for product_id in targets:
+            feature = features[product_id]
+            scored = [(other_id, similarity(feature, features[other_id])) for other_id in candidates(product_id)]
+            scored.sort(key=lambda item: (-item[1], item[0]))
+            self.neighbors[product_id] = scored[:self.k]
+
+        self.fingerprints = fingerprints
+        logger.info(f"近傍テーブルを更新しました: {len(targets)}件を再計算（追加・変更 {len(changed)}件、削除 {len(removed)}件）")
+        return len(targets)
+
+
+def main(argv=None):
+    """カタログから近傍テーブルを作成・更新するCLI"""
+    parser = argparse.ArgumentParser(description="関連商品の近傍テーブルを作成・更新")
+    parser.add_argument("--catalog", default="data/product_catalog.json", help="カタログファイル")
+    parser.add_argument("--output", default="data/product_neighbors.json", help="近傍テーブルの保存先")
+    parser.add_argument("-k", type=int, default=10, help="商品ごとの近傍の数")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.catalog, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+
+    table = ProductNeighborTable(args.output, k=args.k)
+    recomputed = table.refresh(catalog.get("products", []))
+    if recomputed:
+        table.save()
+    print(f"再計算: {recomputed}件 / 全{len(table.neighbors)}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+商品レコードモジュール
+カタログの商品を変更不可のスロット付きレコード（ProductRecord）として一度だけ作り、全スレッド・プロセスで共有する
+記事ごとの選択情報（ジャンル・アフィリエイトリンク）は、レコードを参照する軽量なラッパー（SelectedProduct）に持たせ、
+商品データのコピーを作らない
+どちらも読み取り専用の Mapping として product["name"] や product.get("price_range") で参照でき、
+JSONへ保存するときだけ as_dicts() で辞書に変換する
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 値が空なら Mapping のキーに含めない項目（カタログJSONで省略できる項目）
+OPTIONAL_FIELDS = ("category", "link", "availability", "price", "price_checked_at")
+# 記事の商品情報には含めないカタログ内部の項目
+INTERNAL_FIELDS = ("genre", "link", "price_checked_at")
+
+_RECORD_FIELDS = ("id", "genre", "name", "category", "keywords", "price_range", "description", "link", "availability",
+                  "price", "price_checked_at")
+
+
+@dataclass(frozen=True, slots=True, kw_only=True)
+class ProductRecord(Mapping):
+    id: str
+    genre: str
+    name: str
+    category: str = ""
+    keywords: Tuple[str, ...] = ()
+    price_range: str = ""
+    description: str = ""
+    link: str = ""
+    availability: str = ""
+    # 商品ページから最後に取得した価格と取得日時（手書きの price_range とは別に持つ）
+    price: int = 0
+    price_checked_at: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ProductRecord":
+        """カタログJSONの商品から作成（未知の項目は無視する）"""
+        return cls(
+            id=data["id"],
+            genre=data["genre"],
+            name=data["name"],
+            category=data.get("category", ""),
+            keywords=tuple(data.get("keywords", ())),
+            price_range=data.get("price_range", ""),
+            description=data.get("description", ""),
+            link=data.get("link", ""),
+            availability=data.get("availability", ""),
+            price=data.get("price", 0),
+            price_checked_at=data.get("price_checked_at", "")
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _RECORD_FIELDS or (key in OPTIONAL_FIELDS and not getattr(self, key)):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key in _RECORD_FIELDS if key not in OPTIONAL_FIELDS or getattr(self, key))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict:
+        """カタログJSONと同じ形の辞書"""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in self.items()}
+
+
+class SelectedProduct(Mapping):
+    """記事用に選んだ商品（共有の ProductRecord に選択時のジャンルとリンクを添える）"""
+
+    __slots__ = ("record", "selected_category", "amazon_link")
+
+    def __init__(self, record: ProductRecord, selected_category: str, amazon_link: Optional[str] = None):
+        self.record = record
+        self.selected_category = selected_category
+        self.amazon_link = amazon_link
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "selected_category":
+            return self.selected_category
+        if key == "amazon_link" and self.amazon_link is not None:
+            return self.amazon_link
+        if key in INTERNAL_FIELDS:
+            raise KeyError(key)
+        return self.record[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.record:
+            if key not in INTERNAL_FIELDS:
+                yield key
+        yield "selected_category"
+        if self.amazon_link is not None:
+            yield "amazon_link"
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"SelectedProduct({self.record.id!r}, {self.selected_category!r})"
+
+    def to_dict(self) -> Dict:
+        """記事データとして保存する辞書"""
+        return {key: list(value) if isinstance(value, tuple) else value for key, value in self.items()}
+
+    def copy(self) -> Dict:
+        return self.to_dict()
+
+
+def as_dicts(products: Iterable[Any]) -> List[Dict]:
+    """JSONへ保存する前に商品リストを辞書のリストに変換（辞書はそのまま）"""
+    return [product.to_dict() if hasattr(product, "to_dict") else product for product in products]
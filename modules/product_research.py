@@ -8,373 +8,34 @@ import random
 import json
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import quote, urlparse, parse_qs, urlencode, urlunparse
+from urllib.parse import quote
 import time
 from typing import List, Dict, Optional
+from .affiliate_links import normalize_affiliate_link
+from .product_catalog import ProductCatalog
+from .product_record import ProductRecord, SelectedProduct
 
 
 class ProductResearcher:
-    def __init__(self, amazon_associate_id: str = "ninomono3-22"):
+    def __init__(self, amazon_associate_id: str = "ninomono3-22", catalog_file: str = "data/product_catalog.json",
+                 rotation_planner=None, link_health=None):
         self.amazon_associate_id = amazon_associate_id
-        self.categories = {
-            "占い": [
-                {
-                    "name": "ゲッターズ飯田の五星三心占い2024完全版",
-                    "category": "書籍",
-                    "keywords": ["占い", "五星三心", "ゲッターズ飯田"],
-                    "price_range": "1000-2000",
-                    "description": "人気占い師ゲッターズ飯田による2024年の運勢占い本"
-                },
-                {
-                    "name": "タロットカード 初心者向けセット",
-                    "category": "占いグッズ",
-                    "keywords": ["タロット", "初心者", "占い"],
-                    "price_range": "2000-5000",
-                    "description": "初心者でも使いやすいタロットカードセット"
-                },
-                {
-                    "name": "78枚のカードで占う、いちばんていねいなタロット",
-                    "category": "書籍",
-                    "keywords": ["タロット", "占い", "入門書"],
-                    "price_range": "1500-2500",
-                    "description": "タロット占いの基本を学べる入門書"
-                },
-                {
-                    "name": "パワーストーン ブレスレット",
-                    "category": "アクセサリー",
-                    "keywords": ["パワーストーン", "開運", "ブレスレット"],
-                    "price_range": "3000-8000",
-                    "description": "運気アップに効果があるとされるパワーストーンブレスレット"
-                },
-                {
-                    "name": "風水開運グッズセット",
-                    "category": "開運グッズ",
-                    "keywords": ["風水", "開運", "インテリア"],
-                    "price_range": "2000-6000",
-                    "description": "風水に基づいた開運効果のあるインテリアグッズ"
-                }
-            ],
-            "フィットネス": [
-                {
-                    "name": "STEADY フィットネスバイク エアロバイク",
-                    "category": "フィットネス機器",
-                    "keywords": ["エアロバイク", "家庭用", "静音"],
-                    "price_range": "20000-40000",
-                    "description": "家庭で使える静音設計のフィットネスバイク"
-                },
-                {
-                    "name": "可変式ダンベル セット",
-                    "category": "筋トレ器具",
-                    "keywords": ["ダンベル", "可変式", "筋トレ"],
-                    "price_range": "15000-30000",
-                    "description": "重量調整可能な家庭用ダンベルセット"
-                },
-                {
-                    "name": "腹筋ローラー",
-                    "category": "筋トレ器具",
-                    "keywords": ["腹筋", "ローラー", "コンパクト"],
-                    "price_range": "1000-3000",
-                    "description": "効果的な腹筋トレーニングができるローラー"
-                },
-                {
-                    "name": "レジスタンスバンド セット",
-                    "category": "筋トレ器具",
-                    "keywords": ["レジスタンスバンド", "筋トレ", "チューブ"],
-                    "price_range": "2000-5000",
-                    "description": "様々な筋トレに使えるレジスタンスバンドセット"
-                },
-                {
-                    "name": "ヨガマット",
-                    "category": "フィットネス用品",
-                    "keywords": ["ヨガ", "マット", "エクササイズ"],
-                    "price_range": "3000-8000",
-                    "description": "ヨガやストレッチに最適な高品質マット"
-                },
-                {
-                    "name": "プロテイン ホエイ",
-                    "category": "サプリメント",
-                    "keywords": ["プロテイン", "ホエイ", "筋肉"],
-                    "price_range": "3000-6000",
-                    "description": "筋肉づくりに効果的なホエイプロテイン"
-                }
-            ],
-            "書籍": [
-                {
-                    "name": "嫌われる勇気",
-                    "category": "自己啓発",
-                    "keywords": ["アドラー心理学", "自己啓発", "人間関係"],
-                    "price_range": "1500-2000",
-                    "description": "アドラー心理学を基にした人生を変える一冊"
-                },
-                {
-                    "name": "変な家2 ～11の間取り図～",
-                    "category": "エンターテイメント",
-                    "keywords": ["ホラー", "間取り", "ミステリー"],
-                    "price_range": "1200-1800",
-                    "description": "話題のホラー小説第2弾"
-                },
-                {
-                    "name": "ハーバード、スタンフォード、オックスフォード… 科学的に証明された すごい習慣大百科",
-                    "category": "ビジネス・自己啓発",
-                    "keywords": ["習慣", "科学", "自己改善"],
-                    "price_range": "1600-2200",
-                    "description": "科学的根拠に基づいた習慣改善の決定版"
-                },
-                {
-                    "name": "世界の一流は「雑談」で何を話しているのか",
-                    "category": "ビジネス",
-                    "keywords": ["コミュニケーション", "雑談", "ビジネス"],
-                    "price_range": "1400-1900",
-                    "description": "一流の人々の雑談術を学べるビジネス書"
-                },
-                {
-                    "name": "DIE WITH ZERO 人生が豊かになりすぎる究極のルール",
-                    "category": "自己啓発・お金",
-                    "keywords": ["お金", "人生設計", "資産運用"],
-                    "price_range": "1600-2100",
-                    "description": "お金と人生について考えさせられる話題の書"
-                },
-                {
-                    "name": "改訂版 本当の自由を手に入れる お金の大学",
-                    "category": "マネー・投資",
-                    "keywords": ["お金", "投資", "節約"],
-                    "price_range": "1500-2000",
-                    "description": "お金の基本知識から投資まで学べる実用書"
-                }
-            ],
-            "家電・ガジェット": [
-                {
-                    "name": "ワイヤレスイヤホン Bluetooth5.3",
-                    "category": "オーディオ機器",
-                    "keywords": ["ワイヤレスイヤホン", "Bluetooth", "ノイズキャンセリング"],
-                    "price_range": "5000-15000",
-                    "description": "高音質でノイズキャンセリング機能付きのワイヤレスイヤホン"
-                },
-                {
-                    "name": "スマートフォン 急速充電器 65W",
-                    "category": "充電器",
-                    "keywords": ["急速充電器", "USB-C", "PD対応"],
-                    "price_range": "2000-5000",
-                    "description": "USB-C PD対応の高速充電器でスマホを素早く充電"
-                },
-                {
-                    "name": "ロボット掃除機 自動充電",
-                    "category": "掃除機",
-                    "keywords": ["ロボット掃除機", "自動充電", "スマート"],
-                    "price_range": "20000-50000",
-                    "description": "自動充電機能付きで賢く掃除するロボット掃除機"
-                },
-                {
-                    "name": "空気清浄機 HEPA フィルター",
-                    "category": "空調家電",
-                    "keywords": ["空気清浄機", "HEPA", "花粉対策"],
-                    "price_range": "10000-30000",
-                    "description": "HEPAフィルター搭載で花粉やPM2.5を除去する空気清浄機"
-                },
-                {
-                    "name": "電気圧力鍋 4L 自動調理",
-                    "category": "調理家電",
-                    "keywords": ["電気圧力鍋", "自動調理", "時短"],
-                    "price_range": "8000-20000",
-                    "description": "ボタン一つで本格料理が作れる電気圧力鍋"
-                },
-                {
-                    "name": "Wi-Fi 6 ルーター 高速通信",
-                    "category": "ネットワーク機器",
-                    "keywords": ["Wi-Fi6", "ルーター", "高速通信"],
-                    "price_range": "8000-25000",
-                    "description": "最新Wi-Fi 6対応で高速インターネット通信を実現"
-                }
-            ],
-            "美容・パーソナルケア": [
-                {
-                    "name": "ドライヤー マイナスイオン 大風量",
-                    "category": "ヘアケア",
-                    "keywords": ["ドライヤー", "マイナスイオン", "大風量"],
-                    "price_range": "5000-15000",
-                    "description": "マイナスイオンで髪をサラサラに仕上げる大風量ドライヤー"
-                },
-                {
-                    "name": "電動歯ブラシ 音波振動",
-                    "category": "オーラルケア",
-                    "keywords": ["電動歯ブラシ", "音波振動", "歯垢除去"],
-                    "price_range": "3000-10000",
-                    "description": "音波振動で効果的に歯垢を除去する電動歯ブラシ"
-                },
-                {
-                    "name": "美顔器 RF温熱 EMS",
-                    "category": "美容機器",
-                    "keywords": ["美顔器", "RF", "EMS", "リフトアップ"],
-                    "price_range": "8000-25000",
-                    "description": "RF温熱とEMSでリフトアップ効果が期待できる美顔器"
-                },
-                {
-                    "name": "プロテイン ホエイ 美容成分配合",
-                    "category": "サプリメント",
-                    "keywords": ["プロテイン", "美容", "コラーゲン"],
-                    "price_range": "3000-8000",
-                    "description": "美容成分配合で内側からキレイをサポートするプロテイン"
-                },
-                {
-                    "name": "ヘアアイロン ストレート カール 2way",
-                    "category": "ヘアケア",
-                    "keywords": ["ヘアアイロン", "ストレート", "カール"],
-                    "price_range": "3000-12000",
-                    "description": "ストレートもカールも自在に作れる2wayヘアアイロン"
-                },
-                {
-                    "name": "スキンケア セット 保湿",
-                    "category": "スキンケア",
-                    "keywords": ["スキンケア", "保湿", "美容液"],
-                    "price_range": "3000-10000",
-                    "description": "保湿効果の高いスキンケアセットで美肌をキープ"
-                }
-            ],
-            "アウトドア・スポーツ": [
-                {
-                    "name": "テント 2人用 軽量 防水",
-                    "category": "キャンプ用品",
-                    "keywords": ["テント", "2人用", "軽量", "防水"],
-                    "price_range": "8000-20000",
-                    "description": "軽量で防水性に優れた2人用テント"
-                },
-                {
-                    "name": "ランニングシューズ クッション性",
-                    "category": "スポーツシューズ",
-                    "keywords": ["ランニングシューズ", "クッション", "軽量"],
-                    "price_range": "5000-15000",
-                    "description": "クッション性に優れた軽量ランニングシューズ"
-                },
-                {
-                    "name": "登山リュック 40L 軽量",
-                    "category": "登山用品",
-                    "keywords": ["登山リュック", "40L", "軽量", "防水"],
-                    "price_range": "8000-20000",
-                    "description": "軽量で機能性に優れた40L登山リュック"
-                },
-                {
-                    "name": "キャンプチェア 軽量 コンパクト",
-                    "category": "キャンプ用品",
-                    "keywords": ["キャンプチェア", "軽量", "コンパクト"],
-                    "price_range": "3000-8000",
-                    "description": "持ち運びやすい軽量コンパクトなキャンプチェア"
-                },
-                {
-                    "name": "スポーツウォッチ GPS機能",
-                    "category": "スポーツ用品",
-                    "keywords": ["スポーツウォッチ", "GPS", "ランニング"],
-                    "price_range": "10000-30000",
-                    "description": "GPS機能付きでランニングやトレーニングをサポート"
-                },
-                {
-                    "name": "クーラーボックス 大容量",
-                    "category": "キャンプ用品",
-                    "keywords": ["クーラーボックス", "大容量", "保冷"],
-                    "price_range": "5000-15000",
-                    "description": "大容量で長時間保冷できるクーラーボックス"
-                }
-            ],
-            "ヘルスケア・見守り": [
-                {
-                    "name": "体組成計 Bluetooth対応",
-                    "category": "健康機器",
-                    "keywords": ["体組成計", "Bluetooth", "スマホ連携"],
-                    "price_range": "3000-8000",
-                    "description": "Bluetooth対応でスマホと連携できる高機能体組成計"
-                },
-                {
-                    "name": "血圧計 上腕式 自動測定",
-                    "category": "健康機器",
-                    "keywords": ["血圧計", "上腕式", "自動測定"],
-                    "price_range": "5000-12000",
-                    "description": "正確な測定ができる上腕式自動血圧計"
-                },
-                {
-                    "name": "睡眠グッズ アイマスク 耳栓セット",
-                    "category": "睡眠用品",
-                    "keywords": ["睡眠", "アイマスク", "耳栓"],
-                    "price_range": "1000-3000",
-                    "description": "快適な睡眠をサポートするアイマスクと耳栓のセット"
-                },
-                {
-                    "name": "マッサージガン 筋膜リリース",
-                    "category": "マッサージ機器",
-                    "keywords": ["マッサージガン", "筋膜リリース", "疲労回復"],
-                    "price_range": "5000-15000",
-                    "description": "筋膜リリースで疲労回復をサポートするマッサージガン"
-                },
-                {
-                    "name": "パルスオキシメータ 血中酸素濃度",
-                    "category": "健康機器",
-                    "keywords": ["パルスオキシメータ", "血中酸素", "健康管理"],
-                    "price_range": "2000-5000",
-                    "description": "血中酸素濃度を簡単に測定できるパルスオキシメータ"
-                },
-                {
-                    "name": "体温計 非接触式 デジタル",
-                    "category": "健康機器",
-                    "keywords": ["体温計", "非接触", "デジタル"],
-                    "price_range": "2000-6000",
-                    "description": "非接触で素早く正確に体温を測定できるデジタル体温計"
-                }
-            ],
-            "キッチン・時短家事": [
-                {
-                    "name": "フライパン セット IH対応",
-                    "category": "調理器具",
-                    "keywords": ["フライパン", "セット", "IH対応"],
-                    "price_range": "3000-10000",
-                    "description": "IH対応で使いやすいフライパンセット"
-                },
-                {
-                    "name": "真空保存容器 セット",
-                    "category": "保存容器",
-                    "keywords": ["真空保存", "容器", "食材保存"],
-                    "price_range": "2000-6000",
-                    "description": "食材を新鮮に保つ真空保存容器セット"
-                },
-                {
-                    "name": "食洗機用洗剤 大容量",
-                    "category": "洗剤",
-                    "keywords": ["食洗機", "洗剤", "大容量"],
-                    "price_range": "1000-3000",
-                    "description": "食洗機専用の高性能洗剤大容量タイプ"
-                },
-                {
-                    "name": "コーヒーメーカー 全自動",
-                    "category": "調理家電",
-                    "keywords": ["コーヒーメーカー", "全自動", "ドリップ"],
-                    "price_range": "8000-25000",
-                    "description": "豆から挽いて淹れる全自動コーヒーメーカー"
-                },
-                {
-                    "name": "電気ケトル 温度調節機能",
-                    "category": "調理家電",
-                    "keywords": ["電気ケトル", "温度調節", "保温"],
-                    "price_range": "3000-8000",
-                    "description": "温度調節機能付きで様々な用途に使える電気ケトル"
-                },
-                {
-                    "name": "包丁セット ステンレス",
-                    "category": "調理器具",
-                    "keywords": ["包丁", "セット", "ステンレス"],
-                    "price_range": "5000-15000",
-                    "description": "切れ味抜群のステンレス製包丁セット"
-                }
-            ]
-        }
-
-        # ジャンル別の画像カテゴリマッピング
-        self.image_category_mapping = {
-            "占い": "モノ",
-            "フィットネス": "人物",
-            "書籍": "モノ",
-            "家電・ガジェット": "モノ",
-            "美容・パーソナルケア": "モノ",
-            "アウトドア・スポーツ": "風景",
-            "ヘルスケア・見守り": "モノ",
-            "キッチン・時短家事": "食べ物"
-        }
+        # 商品の選び方（RotationPlanner。Noneならランダム）
+        self.rotation_planner = rotation_planner
+        # リンク切れの確認結果（LinkHealthChecker。リンク切れの商品は検索リンクにする）
+        self.link_health = link_health
+        # 商品データはカタログファイルから遅延読み込みする（更新時刻が変われば自動で再読み込み）
+        self.catalog = ProductCatalog(catalog_file, link_builder=self._to_jp_affiliate_link)
+
+    @property
+    def categories(self) -> Dict[str, List[ProductRecord]]:
+        """ジャンル → 商品リスト"""
+        return self.catalog.get_categories()
+
+    @property
+    def image_category_mapping(self) -> Dict[str, str]:
+        """ジャンル別の画像カテゴリマッピング"""
+        return self.catalog.get_image_category_mapping()
 
     # =========================
     # 日本向けリンク正規化
@@ -383,40 +44,19 @@ class ProductResearcher:
         """
         任意の Amazon URL / 'SEARCH:<query>' を、
         日本リージョンで確実に開けるリンクに正規化し、tag を必ず付ける。
+        （同じリンクの正規化結果はキャッシュされる）
         """
-        if not base:
-            return ""
-
-        # 検索指定（SEARCH: クエリ）
-        if base.startswith("SEARCH:"):
-            q = base.split(":", 1)[1].strip()
-            return f"https://www.amazon.co.jp/s?k={quote(q)}&tag={self.amazon_associate_id}&language=ja_JP"
-
-        # URLでない場合は検索にフォールバック
-        if not base.startswith("http"):
-            q = base.strip()
-            return f"https://www.amazon.co.jp/s?k={quote(q)}&tag={self.amazon_associate_id}&language=ja_JP"
-
-        # URLを amazon.co.jp に正規化し、tag/language を追加
-        p = list(urlparse(base))
-        p[0] = "https"
-        p[1] = "www.amazon.co.jp"  # netloc を日本に固定
-        q = parse_qs(p[4])
-        q["tag"] = [self.amazon_associate_id]  # 既存があっても上書き
-        q.setdefault("language", ["ja_JP"])
-        p[4] = urlencode({k: v[0] if isinstance(v, list) else v for k, v in q.items()})
-        return urlunparse(p)
-
-    def get_random_product(self, category: str = None) -> Dict:
+        return normalize_affiliate_link(base, self.amazon_associate_id)
+
+    def get_random_product(self, category: str = None) -> SelectedProduct:
         """指定されたカテゴリまたはランダムなカテゴリから商品を選択"""
         if category and category in self.categories:
             selected_category = category
         else:
             selected_category = random.choice(list(self.categories.keys()))
 
-        product = random.choice(self.categories[selected_category])
-        product["selected_category"] = selected_category
-        return product
+        # 共有のレコードは変更せず、選択したジャンルをラッパーに持たせる
+        return SelectedProduct(random.choice(self.categories[selected_category]), selected_category)
 
     def get_image_category(self, genre: str) -> str:
         """ジャンルに対応する画像カテゴリを取得"""
@@ -433,93 +73,121 @@ class ProductResearcher:
         - 型番が流動/汎用品は 'SEARCH:' で日本検索リンクへ
         - どの場合も tag / language=ja_JP を必ず付与
         """
-        product_mappings = {
-            # --- 占い：版分岐が多いため検索に統一 ---
-            "ゲッターズ飯田の五星三心占い2024完全版": "SEARCH:ゲッターズ飯田 五星三心 2024",
-            "タロットカード 初心者向けセット": "SEARCH:タロットカード 初心者 セット",
-            "78枚のカードで占う、いちばんていねいなタロット": "SEARCH:78枚のカードで占う いちばんていねいなタロット 書籍",
-            "パワーストーン ブレスレット": "SEARCH:パワーストーン ブレスレット",
-            "風水開運グッズセット": "SEARCH:風水 開運 グッズ セット",
-
-            # --- フィットネス：ブランドや在庫変動が大きいので検索へ ---
-            "STEADY フィットネスバイク エアロバイク": "SEARCH:STEADY エアロバイク",
-            "可変式ダンベル セット": "SEARCH:可変式 ダンベル セット",
-            "腹筋ローラー": "SEARCH:腹筋ローラー",
-            "レジスタンスバンド セット": "SEARCH:レジスタンスバンド セット",
-            "ヨガマット": "SEARCH:ヨガマット 厚手",
-            "プロテイン ホエイ": "SEARCH:ホエイ プロテイン 1kg",
-
-            # --- 書籍：安定DPに更新（日本） ---
-            "嫌われる勇気": "https://www.amazon.co.jp/dp/4478025819",
-            "変な家2 ～11の間取り図～": "https://www.amazon.co.jp/dp/4864109826",
-            "ハーバード、スタンフォード、オックスフォード… 科学的に証明された すごい習慣大百科": "https://www.amazon.co.jp/dp/B0FFZ73L7F",
-            "世界の一流は「雑談」で何を話しているのか": "https://www.amazon.co.jp/dp/4295408107",
-            "DIE WITH ZERO 人生が豊かになりすぎる究極のルール": "https://www.amazon.co.jp/dp/4478109680",
-            "改訂版 本当の自由を手に入れる お金の大学": "https://www.amazon.co.jp/dp/4023323780",
-
-            # --- 家電・ガジェット：型番流動のため検索へ ---
-            "ワイヤレスイヤホン Bluetooth5.3": "SEARCH:ワイヤレスイヤホン Bluetooth5.3",
-            "スマートフォン 急速充電器 65W": "SEARCH:急速充電器 65W USB-C GaN",
-            "ロボット掃除機 自動充電": "SEARCH:ロボット掃除機 自動充電",
-            "空気清浄機 HEPA フィルター": "SEARCH:空気清浄機 HEPA フィルター",
-            "電気圧力鍋 4L 自動調理": "SEARCH:電気圧力鍋 4L",
-            "Wi-Fi 6 ルーター 高速通信": "SEARCH:Wi-Fi 6 ルーター"
-        }
-
-        base = product_mappings.get(product_name)
-
-        if base:
-            return self._to_jp_affiliate_link(base)
+        # カタログ読み込み時に構築した対応表を参照
+        link = self.catalog.get_link(product_name)
+        if link and not (self.link_health and self.link_health.is_broken(link)):
+            return link
 
         # マッピングが無い → キーワードまたは商品名で日本検索
         search_query = " ".join(keywords[:2]) if keywords else product_name
         return f"https://www.amazon.co.jp/s?k={quote(search_query)}&tag={self.amazon_associate_id}&language=ja_JP"
 
-    def search_amazon_products(self, query: str, max_results: int = 5) -> List[Dict]:
-        """Amazon検索結果から商品情報を取得（簡易版：カテゴリデータから擬似的に返す）"""
+    def search_amazon_products(self, query: str, max_results: int = 5, genres: Optional[List[str]] = None) -> List[SelectedProduct]:
+        """
+        カタログから商品を検索（簡易版：Amazonではなくカタログの転置インデックスを使う）
+
+        Args:
+            query: 検索文（空白区切りで複数語、キーワード・商品名の一致度でスコア順に並べる）
+            max_results: 最大件数
+            genres: 指定した場合はこれらのジャンルの商品に絞り込む
+        """
         results = []
-        for category_name, products in self.categories.items():
-            for product in products:
-                if any(keyword.lower() in query.lower() for keyword in product["keywords"]):
-                    product_info = product.copy()
-                    product_info["amazon_link"] = self.generate_amazon_link(
-                        product["name"],
-                        product["keywords"]
-                    )
-                    results.append(product_info)
-                    if len(results) >= max_results:
-                        break
-            if len(results) >= max_results:
-                break
+        for record in self.catalog.search(query, max_results, genres):
+            results.append(self._prepare_product(record, record.genre))
 
         return results
 
-    def get_products_for_article(self, genre: str, num_products: int = 3) -> List[Dict]:
+    def get_products_for_article(self, genre: Optional[str] = None, num_products: int = 3,
+                                 article_type: Optional[str] = None) -> List[SelectedProduct]:
         """記事用の商品リストを取得（日本リンク保証版）"""
         if genre not in self.categories:
-            # 指定されたジャンルがない場合はランダムに選択
-            genre = random.choice(list(self.categories.keys()))
+            # 指定されたジャンルがない場合は、最も長く使われていないジャンル（計画なしならランダム）を選択
+            genres = [name for name, products in self.categories.items() if products]
+            genre = self.rotation_planner.choose_genre(genres) if self.rotation_planner else random.choice(genres)
 
         products = self.categories[genre]
 
-        # 指定された数の商品をランダムに選択
-        if len(products) <= num_products:
+        # 指定された数の商品を選択（計画ありなら最も長く使われていない組み合わせ）
+        if self.rotation_planner:
+            selected_products_base = self.rotation_planner.select(genre, products, num_products)
+        elif len(products) <= num_products:
             selected_products_base = products.copy()
         else:
             selected_products_base = random.sample(products, num_products)
 
-        # 選択された各商品にジャンル情報とAmazonリンクを追加
-        selected_products = []
-        for product in selected_products_base:
-            product_copy = product.copy()  # 元のデータを変更しないようにコピーを作成
-            product_copy["selected_category"] = genre  # ★ジャンル情報を追加
-            product_copy["amazon_link"] = self.generate_amazon_link(
-                product_copy["name"],
-                product_copy["keywords"]
-            )
-            selected_products.append(product_copy)
-
-        return selected_products
+        selected_products = [self._prepare_product(product, genre) for product in selected_products_base]
+        return self.arrange_for_article(selected_products, article_type)
+
+    def arrange_for_article(self, products: List[SelectedProduct], article_type: Optional[str]) -> List[SelectedProduct]:
+        """商品紹介記事では、主要商品以外を主要商品と関連の強い商品に差し替える"""
+        if article_type != "商品紹介" or not products:
+            return products
+        related = self.find_related_products(products[0], len(products) - 1)
+        if len(related) < len(products) - 1:
+            # 関連商品が足りない分は元の商品で補う
+            names = {product["name"] for product in related}
+            related += [product for product in products[1:] if product["name"] not in names][:len(products) - 1 - len(related)]
+        return [products[0]] + related
+
+    def get_columns(self):
+        """カタログの列指向ビュー（CatalogColumns）"""
+        return self.catalog.get_columns()
+
+    def find_related_products(self, main_product: Dict, num_products: int, price_ratio: Optional[float] = 1.5) -> List[SelectedProduct]:
+        """
+        主要商品と同じジャンルで、キーワードを多く共有し価格帯の近い商品を選ぶ
+
+        事前計算した近傍テーブルを参照し、足りない分は列指向ビューの検索で補う。
+
+        Args:
+            main_product: 主要商品（カタログの "id" を持つもの）
+            num_products: 選ぶ商品数
+            price_ratio: 価格帯の上限が主要商品の上限×この倍率を超える商品は除く（足りなければ条件を外す）
+        """
+        product_id = main_product.get("id")
+        if not product_id or num_products <= 0:
+            return []
+
+        columns = self.get_columns()
+        neighbor_ids = self.catalog.get_neighbors(product_id)
+        related_ids = neighbor_ids
+        row = columns.row_of.get(product_id)
+        if price_ratio is not None and row is not None and columns.max_price[row] == columns.max_price[row]:
+            price_max = columns.max_price[row] * price_ratio
+            within = [neighbor_id for neighbor_id in neighbor_ids
+                      if neighbor_id in columns.row_of and columns.max_price[columns.row_of[neighbor_id]] <= price_max]
+            if len(within) >= num_products:
+                related_ids = within
+        related_ids = related_ids[:num_products]
+
+        if len(related_ids) < num_products:
+            # 近傍テーブルに無い商品（未更新など）は列指向ビューで探す
+            fallback = columns.related(product_id, num_products, price_ratio=price_ratio)
+            if len(fallback) < num_products and price_ratio is not None:
+                fallback = columns.related(product_id, num_products, price_ratio=None)
+            related_ids = related_ids + [related_id for related_id in fallback if related_id not in related_ids]
+            related_ids = related_ids[:num_products]
+
+        genre = main_product.get("selected_category")
+        related = []
+        for related_id in related_ids:
+            record = self.catalog.get_product(related_id)
+            if not record:
+                continue
+            related.append(self._prepare_product(record, genre or record.genre))
+        return related
+
+    def plan_day(self, count: int, num_products: int = 3) -> List[List[SelectedProduct]]:
+        """1日分の記事の商品セットをまとめて計画（ローテーション計画が無い場合は都度ランダムに選ぶ）"""
+        if not self.rotation_planner:
+            return [self.get_products_for_article(None, num_products) for _ in range(count)]
+        plan = self.rotation_planner.plan_day(self.categories, count, num_products)
+        return [[self._prepare_product(product, genre) for product in products] for genre, products in plan]
+
+    def _prepare_product(self, product, genre: str) -> SelectedProduct:
+        """選択した商品にジャンル情報とAmazonリンクを添える（商品データはコピーせずに共有する）"""
+        record = product.record if isinstance(product, SelectedProduct) else product
+        return SelectedProduct(record, genre, self.generate_amazon_link(record.name, record.keywords))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+プロンプトテンプレート管理モジュール
+記事タイプ×カテゴリごとにプロンプトを一度だけ組み立てて再利用し、静的な指示を先頭・商品情報を末尾に置く
+システムメッセージは数百トークン程度で、OpenAIのプロンプトキャッシュの最小長（1024トークン）に届かないため
+キャッシュは効かない（キャッシュ済みトークン数は使用量台帳に応答の値をそのまま記録する）
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_RULES = """あなたは日本語が母語の経験豊富なアフィリエイトライターです。以下の要件を厳守してください：
+
+1. 自然で読みやすい日本語で書く
+2. 文章の流れを重視し、段落間の繋がりを意識する
+3. 読者目線で有益な情報を提供する
+4. 商品の良い面だけでなく、客観的な視点も含める
+5. 過度な宣伝文句は避け、信頼できる内容にする
+6. 文字数は500-1000文字程度に収める
+7. 見出しは「##」を使用してMarkdown形式で記述する"""
+
+# 記事タイプごとの静的な指示。{category} のみカテゴリで置換する
+ARTICLE_TYPE_SPECS = {
+    "レビュー": {
+        "task": "最後に示す商品について、実際に使用したかのような詳細なレビュー記事を日本語で書いてください。",
+        "use_genre_guidance": True,
+        "structure": """記事の構成:
+## 概要
+商品の基本情報と第一印象を自然な文章で説明
+
+## メリット
+実際に使ってみて感じた良い点を3つ程度、具体的なエピソードを交えて説明
+
+## デメリット
+気になった点や注意すべき点を2つ程度、客観的に説明
+
+## まとめ
+総合評価と、どのような人におすすめかを明確に記述""",
+        "requirements": """要件:
+- 500-1000文字程度
+- 自然で読みやすい日本語
+- 実体験に基づいた具体的な表現
+- 読者にとって有益で信頼できる情報
+- 商品名は記事中に2-3回自然に登場
+- 過度な宣伝文句は避ける"""
+    },
+    "ハウツー": {
+        "task": "最後に示す商品を活用した{category}のハウツー記事を日本語で書いてください。",
+        "use_genre_guidance": False,
+        "structure": """記事の構成:
+## 概要
+なぜこの方法が効果的なのか、背景と目的を説明
+
+## メリット
+この方法を実践することで得られる具体的な利点
+
+## デメリット
+注意点や制限事項、失敗しやすいポイント
+
+## まとめ
+実践のコツと期待できる効果、継続のポイント""",
+        "requirements": """要件:
+- 500-1000文字程度
+- 初心者でも理解できる分かりやすい説明
+- 具体的な手順やコツを含める
+- 実践的で役立つ情報
+- 自然で読みやすい日本語
+- 商品名は文脈に合わせて自然に組み込む"""
+    },
+    "商品紹介": {
+        "task": "{category}分野のおすすめ商品について、比較検討に役立つ紹介記事を日本語で書いてください。対象商品は最後に示します。",
+        "use_genre_guidance": False,
+        "structure": """記事の構成:
+## 概要
+{category}商品選びの重要性と、良い商品の見分け方
+
+## メリット
+おすすめ商品に共通する優れた特徴と利点
+
+## デメリット
+選ぶ際の注意点や、避けるべきポイント
+
+## まとめ
+最終的な推奨と、読者への具体的なアドバイス""",
+        "requirements": """要件:
+- 500-1000文字程度
+- 比較の観点を含めた客観的な評価
+- 読者の選択に役立つ実用的な情報
+- 各商品の特徴を簡潔に説明
+- 自然で読みやすい日本語
+- 押し売り感のない信頼できる内容"""
+    }
+}
+
+
+# タイトルを生成できなかった場合の記事タイプ別のタイトル
+FALLBACK_TITLE_TEMPLATES = {
+    "レビュー": "{name}の詳細レビュー！実際に使ってみた感想",
+    "ハウツー": "{category}初心者必見！{name}の使い方ガイド",
+    "商品紹介": "{category}のおすすめ商品5選！選び方のポイントも解説"
+}
+
+
+def fallback_title(product_name: str, category: str, article_type: str) -> str:
+    """記事タイプに合った定型のタイトル（未知の記事タイプはレビューとして扱う）"""
+    template = FALLBACK_TITLE_TEMPLATES.get(article_type, FALLBACK_TITLE_TEMPLATES["レビュー"])
+    return template.format(name=product_name, category=category)
+
+
+class CompiledPromptTemplate:
+    def __init__(self, article_type: str, category: str, system_message: str):
+        """
+        コンパイル済みテンプレートを初期化
+
+        Args:
+            article_type: 記事タイプ
+            category: 商品カテゴリ
+            system_message: 静的な指示をまとめたシステムメッセージ
+        """
+        self.article_type = article_type
+        self.category = category
+        self.system_message = system_message
+
+    def build_messages(self, products: List[Dict]) -> List[Dict]:
+        """商品情報（可変部分）を末尾に置いたメッセージを生成"""
+        main_product = products[0]
+        if self.article_type == "商品紹介":
+            user_content = (
+                f"主要商品: {main_product['name']}\n"
+                f"その他の商品: {', '.join([p['name'] for p in products[1:]])}"
+            )
+        else:
+            user_content = (
+                f"商品名: {main_product['name']}\n"
+                f"カテゴリ: {self.category}\n"
+                f"説明: {main_product['description']}"
+            )
+            if self.article_type == "レビュー":
+                user_content += f"\n価格帯: {main_product['price_range']}円"
+                if main_product.get('price'):
+                    user_content += f"\n現在の価格: {main_product['price']}円"
+
+        return [
+            {"role": "system", "content": self.system_message},
+            {"role": "user", "content": user_content}
+        ]
+
+
+class PromptTemplateRegistry:
+    def __init__(self, genre_prompt_provider: Optional[Callable[[str], str]] = None):
+        """
+        テンプレートレジストリを初期化
+
+        Args:
+            genre_prompt_provider: カテゴリからジャンル別の指示文を返す関数
+        """
+        self.genre_prompt_provider = genre_prompt_provider
+        self._templates: Dict[Tuple[str, str], CompiledPromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def get(self, article_type: str, category: str) -> CompiledPromptTemplate:
+        """(記事タイプ, カテゴリ) のテンプレートを取得（初回のみ組み立てる）"""
+        key = (article_type, category)
+        template = self._templates.get(key)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(key)
+                if template is None:
+                    template = self.compile(article_type, category)
+                    self._templates[key] = template
+        return template
+
+    def compile(self, article_type: str, category: str) -> CompiledPromptTemplate:
+        """静的な指示を連結してシステムメッセージを組み立てる"""
+        spec = ARTICLE_TYPE_SPECS[article_type]
+
+        parts = [SYSTEM_RULES, spec["task"].format(category=category)]
+        if spec["use_genre_guidance"] and self.genre_prompt_provider:
+            parts.append(self.genre_prompt_provider(category).strip())
+        parts.append(spec["structure"].format(category=category))
+        parts.append(spec["requirements"])
+
+        logger.debug(f"プロンプトテンプレートをコンパイル: {article_type} / {category}")
+        return CompiledPromptTemplate(article_type, category, "\n\n".join(parts))
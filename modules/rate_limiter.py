@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+レート制限モジュール
+OpenAI APIのRPM（リクエスト数/分）・TPM（トークン数/分）の上限を守りながら、
+AIMD方式で同時実行数を調整する共有リミッターを提供
+"""
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# レート制限起因として同時実行数を減らす結果種別
+BACKOFF_OUTCOMES = {"rate_limited", "timeout"}
+
+
+def estimate_request_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """
+    リクエストの消費トークン数を見積もる
+
+    日本語は概ね1文字1トークン前後になるため、メッセージの文字数を入力トークン数の
+    上限寄りの見積もりとして扱い、出力側は max_tokens をそのまま加算する。
+    """
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return prompt_chars + max_tokens
+
+
+def parse_retry_after(headers: Optional[Mapping]) -> Optional[float]:
+    """
+    429応答の retry-after-ms / retry-after ヘッダーを秒数に変換（無い・読めない場合はNone）
+
+    retry-after は秒数とHTTP日付のどちらの形式も受け付ける。
+    """
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except (TypeError, ValueError):
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(retry_index: int, base: float = 1.0, max_delay: float = 30.0,
+                  retry_after: Optional[float] = None) -> float:
+    """
+    再試行までの待機秒数（指数バックオフ + フルジッター）
+
+    サーバーが retry-after を指定した場合は、それより早くは再試行しない。
+    """
+    delay = random.uniform(0, min(max_delay, base * (2 ** retry_index)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_delay))
+    return delay
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        トークンバケットを初期化
+
+        Args:
+            capacity: バケットの容量
+            refill_per_second: 1秒あたりの補充量
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        """経過時間に応じてトークンを補充"""
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+
+    def time_until_available(self, amount: float) -> float:
+        """指定量が使えるようになるまでの秒数（すぐ使える場合は0）"""
+        if self.tokens >= amount:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return float("inf")
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float):
+        """トークンを消費（実使用量の精算で負になることを許容する）"""
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        """トークンを払い戻し"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: int = 500, tokens_per_minute: int = 200000,
+                 max_concurrency: int = 8, min_concurrency: int = 1,
+                 initial_concurrency: Optional[float] = None, decrease_factor: float = 0.5):
+        """
+        レートリミッターを初期化
+
+        Args:
+            requests_per_minute: 1分あたりの最大リクエスト数
+            tokens_per_minute: 1分あたりの最大トークン数
+            max_concurrency: 同時実行数の上限
+            min_concurrency: 同時実行数の下限
+            initial_concurrency: 同時実行数の初期値（省略時は上限値）
+            decrease_factor: 429・タイムアウト時に同時実行数へ掛ける係数
+        """
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(initial_concurrency or max_concurrency)
+        self.decrease_factor = decrease_factor
+
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.metrics = {
+            "requests": 0,
+            "max_queue_depth": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "estimated_tokens": 0,
+            "actual_tokens": 0,
+            "extra_requests": 0,
+            "outcomes": {}
+        }
+
+    def acquire(self, estimated_tokens: int, timeout: Optional[float] = None) -> float:
+        """
+        リクエスト枠を確保するまで待機
+
+        Args:
+            estimated_tokens: 見積もりトークン数
+            timeout: 最大待機秒数（超過時はTimeoutError）
+
+        Returns:
+            float: 待機した秒数
+        """
+        # 容量を超える見積もりは永久に待たないよう容量で頭打ちにする
+        tokens = min(estimated_tokens, self.token_bucket.capacity)
+        started = time.monotonic()
+
+        with self._condition:
+            self.queue_depth += 1
+            self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], self.queue_depth)
+            try:
+                while True:
+                    self.request_bucket.refill()
+                    self.token_bucket.refill()
+
+                    if self.in_flight < int(self.concurrency_limit):
+                        wait = max(
+                            self.request_bucket.time_until_available(1),
+                            self.token_bucket.time_until_available(tokens)
+                        )
+                        if wait <= 0:
+                            break
+                    else:
+                        # 同時実行枠の空きは release() の notify で通知される
+                        wait = None
+
+                    if timeout is not None:
+                        remaining = timeout - (time.monotonic() - started)
+                        if remaining <= 0:
+                            raise TimeoutError("レート制限の待機がタイムアウトしました")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+
+                self.request_bucket.consume(1)
+                self.token_bucket.consume(tokens)
+                self.in_flight += 1
+            finally:
+                self.queue_depth -= 1
+
+            waited = time.monotonic() - started
+            self.metrics["requests"] += 1
+            self.metrics["total_wait_seconds"] += waited
+            self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], waited)
+            self.metrics["estimated_tokens"] += tokens
+            return waited
+
+    def charge(self, estimated_tokens: int):
+        """
+        確保済みの枠の中で追加送信したリクエスト（ヘッジ）の分を、待たずに計上する
+
+        追加分の実使用量は分からないため見積もりのまま精算しない。
+        """
+        tokens = min(estimated_tokens, self.token_bucket.capacity)
+        with self._condition:
+            self.request_bucket.refill()
+            self.token_bucket.refill()
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(tokens)
+            self.metrics["estimated_tokens"] += tokens
+            self.metrics["extra_requests"] += 1
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None, outcome: str = "success"):
+        """
+        リクエスト枠を解放し、実使用量と結果を反映
+
+        Args:
+            estimated_tokens: acquire() に渡した見積もりトークン数
+            actual_tokens: レスポンスの usage.total_tokens（不明な場合はNone）
+            outcome: "success", "rate_limited", "timeout", "error" のいずれか
+                     （success 以外で actual_tokens が無い場合は見積もり分を払い戻す）
+        """
+        tokens = min(estimated_tokens, self.token_bucket.capacity)
+
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if actual_tokens is not None:
+                self.metrics["actual_tokens"] += actual_tokens
+                # 見積もりとの差分を精算
+                if actual_tokens > tokens:
+                    self.token_bucket.consume(actual_tokens - tokens)
+                else:
+                    self.token_bucket.refund(tokens - actual_tokens)
+            elif outcome != "success":
+                # 失敗したリクエストは応答を生成していないため、見積もり分を払い戻す
+                self.token_bucket.refund(tokens)
+
+            outcomes = self.metrics["outcomes"]
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+            if outcome in BACKOFF_OUTCOMES:
+                # 乗算的減少
+                previous = self.concurrency_limit
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * self.decrease_factor)
+                logger.warning(f"レート制限を検知 ({outcome}): 同時実行数 {previous:.1f} → {self.concurrency_limit:.1f}")
+            elif outcome == "success":
+                # 加算的増加（同時実行数1つ分の成功で +1 になるよう按分）
+                self.concurrency_limit = min(
+                    self.max_concurrency,
+                    self.concurrency_limit + 1.0 / max(1.0, self.concurrency_limit)
+                )
+
+            self._condition.notify_all()
+
+    def get_metrics(self) -> Dict:
+        """メトリクスを取得"""
+        with self._condition:
+            requests = self.metrics["requests"]
+            return {
+                **self.metrics,
+                "outcomes": dict(self.metrics["outcomes"]),
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "concurrency_limit": self.concurrency_limit,
+                "average_wait_seconds": self.metrics["total_wait_seconds"] / requests if requests else 0.0
+            }
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+リクエスト耐障害モジュール
+LLM呼び出しのテールレイテンシ対策として、ヘッジリクエストとサーキットブレーカーを提供
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """サーキットブレーカーが開いているためリクエストを送らなかったことを表す例外"""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0, name: str = "llm"):
+        """
+        サーキットブレーカーを初期化
+
+        Args:
+            failure_threshold: 連続失敗がこの回数に達するとオープンにする
+            reset_timeout: オープンから試行（ハーフオープン）に移るまでの秒数
+            name: ログ出力用の名前
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.metrics = {"opened": 0, "rejected": 0, "successes": 0, "failures": 0}
+
+    def allow_request(self) -> bool:
+        """リクエストを送ってよいかを判定"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at >= self.reset_timeout:
+                    self.state = self.HALF_OPEN
+                    logger.info(f"サーキットブレーカー[{self.name}]をハーフオープンにします")
+                else:
+                    self.metrics["rejected"] += 1
+                    return False
+
+            if self.state == self.HALF_OPEN:
+                # ハーフオープン中は試行リクエストを1件だけ通す
+                if self._trial_in_flight:
+                    self.metrics["rejected"] += 1
+                    return False
+                self._trial_in_flight = True
+
+            return True
+
+    def record_success(self):
+        """成功を記録"""
+        with self._lock:
+            self.metrics["successes"] += 1
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.state != self.CLOSED:
+                logger.info(f"サーキットブレーカー[{self.name}]をクローズします")
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        """失敗を記録"""
+        with self._lock:
+            self.metrics["failures"] += 1
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.metrics["opened"] += 1
+                    logger.warning(
+                        f"サーキットブレーカー[{self.name}]をオープンにします"
+                        f"（連続失敗 {self.consecutive_failures} 回、{self.reset_timeout}秒後に再試行）"
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def get_metrics(self) -> Dict:
+        """メトリクスを取得"""
+        with self._lock:
+            return {**self.metrics, "state": self.state, "consecutive_failures": self.consecutive_failures}
+
+
+class LatencyTracker:
+    def __init__(self, window_size: int = 200):
+        """直近 window_size 件のレイテンシを保持する"""
+        self._samples = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """p（0.0-1.0）パーセンタイルを返す。サンプルが無い場合はNone"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class HedgedRequestExecutor:
+    def __init__(self, hedge_percentile: float = 0.95, min_samples: int = 20,
+                 default_hedge_delay: float = 15.0, min_hedge_delay: float = 1.0,
+                 max_workers: int = 8):
+        """
+        ヘッジリクエスト実行器を初期化
+
+        Args:
+            hedge_percentile: ヘッジを送るまでの待ち時間に使うレイテンシのパーセンタイル
+            min_samples: 学習値を使い始めるまでに必要なサンプル数
+            default_hedge_delay: サンプル不足時のヘッジ待ち時間（秒）
+            min_hedge_delay: ヘッジ待ち時間の下限（秒）
+            max_workers: リクエスト実行用スレッド数
+        """
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        # 呼び出し種別ごとにレイテンシを学習する（短いタイトル生成で本文生成の待ち時間が縮まないように）
+        self.latencies: Dict[str, LatencyTracker] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-request")
+        self._lock = threading.Lock()
+        self.metrics = {"requests": 0, "hedges_sent": 0, "hedge_wins": 0, "failures": 0}
+
+    def _tracker(self, key: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self.latencies.get(key)
+            if tracker is None:
+                tracker = self.latencies[key] = LatencyTracker()
+            return tracker
+
+    def get_hedge_delay(self, key: str = "default") -> float:
+        """ヘッジを送るまでの待ち時間（呼び出し種別ごとに学習したp95）"""
+        tracker = self._tracker(key)
+        if len(tracker) < self.min_samples:
+            return self.default_hedge_delay
+        learned = tracker.percentile(self.hedge_percentile)
+        return max(self.min_hedge_delay, learned)
+
+    def execute(self, fn: Callable, key: str = "default", on_hedge: Optional[Callable[[], None]] = None):
+        """
+        fn を実行し、待ち時間を超えたら同じ fn をもう一度投げて先に成功した結果を返す
+
+        Args:
+            fn: 引数なしで呼び出すリクエスト関数（HTTP呼び出しだけを渡し、待ち行列や再試行の時間を含めない）
+            key: レイテンシを学習する単位（呼び出し種別）
+            on_hedge: ヘッジを送る直前に呼ぶ関数（レートリミッターへの追加分の計上など）
+
+        Returns:
+            先に成功したリクエストの結果（両方失敗した場合は最後の例外を送出）
+        """
+        with self._lock:
+            self.metrics["requests"] += 1
+
+        tracker = self._tracker(key)
+        started = time.monotonic()
+        primary = self._executor.submit(self._timed_call, fn, tracker)
+        done, _ = wait({primary}, timeout=self.get_hedge_delay(key))
+
+        pending = {primary}
+        hedge = None
+        if not done:
+            if on_hedge:
+                on_hedge()
+            hedge = self._executor.submit(self._timed_call, fn, tracker)
+            pending.add(hedge)
+            with self._lock:
+                self.metrics["hedges_sent"] += 1
+            logger.info(f"応答が遅いためヘッジリクエストを送信しました（{key}、{time.monotonic() - started:.1f}秒経過）")
+
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self.metrics["hedge_wins"] += 1
+                # 残ったリクエストは結果を捨てる（実行中のHTTPリクエストは中断できない）
+                return result
+
+        with self._lock:
+            self.metrics["failures"] += 1
+        raise last_error
+
+    def _timed_call(self, fn: Callable, tracker: LatencyTracker):
+        started = time.monotonic()
+        result = fn()
+        tracker.record(time.monotonic() - started)
+        return result
+
+    def get_metrics(self) -> Dict:
+        """メトリクスを取得（レイテンシとヘッジ待ち時間は呼び出し種別ごと）"""
+        with self._lock:
+            metrics = dict(self.metrics)
+            keys = list(self.latencies)
+        metrics["by_key"] = {
+            key: {
+                "latency_p50": self.latencies[key].percentile(0.5),
+                "latency_p95": self.latencies[key].percentile(0.95),
+                "hedge_delay": self.get_hedge_delay(key)
+            }
+            for key in keys
+        }
+        return metrics
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+商品ローテーション計画モジュール
+記事履歴の投稿済みの記事から商品ごと・商品の組み合わせごとの最終使用日時を集計し、
+最も長く使われていない組み合わせを優先して選ぶことで、似た記事の生成と再生成を減らす
+選んだだけでまだ投稿していない商品は「予約」として選択順位にだけ反映し、使用実績には数えない
+"""
+
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from itertools import combinations
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 組み合わせを列挙する候補の上限（選ぶ数 + この数）
+CANDIDATE_MARGIN = 4
+# 投稿待ちの記事をこの期間だけ見張る（それより古い未投稿の記事は投稿に失敗したものとして見張りをやめる）
+PENDING_RETENTION = timedelta(days=2)
+
+
+class RotationPlanner:
+    def __init__(self, history_manager=None, product_cooldown_hours: float = 72,
+                 combination_cooldown_days: float = 30, seed: Optional[int] = None):
+        """
+        ローテーション計画を初期化
+
+        Args:
+            history_manager: 使用履歴を参照する ArticleHistoryManager
+            product_cooldown_hours: この時間内に使った商品は、他に候補があれば選ばない
+            combination_cooldown_days: この日数内に使った組み合わせは、他に候補があれば選ばない
+            seed: 同順位の候補から選ぶための乱数シード
+        """
+        self.history_manager = history_manager
+        self.product_cooldown = timedelta(hours=product_cooldown_hours)
+        self.combination_cooldown = timedelta(days=combination_cooldown_days)
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.product_last_used: Dict[str, datetime] = {}
+        self.product_use_count: Dict[str, int] = {}
+        self.combination_last_used: Dict[Tuple[str, ...], datetime] = {}
+        self.genre_last_used: Dict[str, datetime] = {}
+        # 選択済み・未投稿の商品と組み合わせ（選択順位の計算だけに使う）
+        self.reserved_products: Dict[str, datetime] = {}
+        self.reserved_combinations: Dict[Tuple[str, ...], datetime] = {}
+        self.reserved_genres: Dict[str, datetime] = {}
+        self._synced_article_ids: Set = set()
+        self._scan_from = 0
+        # 未投稿の記事（記事ID → 履歴内の位置）。投稿済みになったら取り込む
+        self._pending_articles: Dict = {}
+
+    @staticmethod
+    def combination_key(names: List[str]) -> Tuple[str, ...]:
+        return tuple(sorted(names))
+
+    def _mark_used(self, names: List[str], genre: Optional[str], used_at: datetime):
+        for name in names:
+            if used_at > self.product_last_used.get(name, datetime.min):
+                self.product_last_used[name] = used_at
+            self.product_use_count[name] = self.product_use_count.get(name, 0) + 1
+        if len(names) > 1:
+            key = self.combination_key(names)
+            if used_at > self.combination_last_used.get(key, datetime.min):
+                self.combination_last_used[key] = used_at
+        if genre and used_at > self.genre_last_used.get(genre, datetime.min):
+            self.genre_last_used[genre] = used_at
+
+    def _sync_history(self):
+        """
+        投稿済みになった記事の使用実績を1回だけ取り込む
+
+        投稿前の記事（posted が False）は投稿待ちとして別に見張り、履歴は前回の続きからだけ読む。
+        posted の無い以前の履歴は投稿済みとして扱う。
+        """
+        if not self.history_manager:
+            return
+        articles = self.history_manager.history_data.get("articles", [])
+        pending = list(self._pending_articles.items())
+        self._pending_articles.clear()
+        for article_id, index in pending:
+            if index < len(articles) and articles[index].get("id", index) == article_id:
+                self._sync_article(articles[index], article_id, index)
+        for index in range(self._scan_from, len(articles)):
+            self._sync_article(articles[index], articles[index].get("id", index), index)
+        self._scan_from = len(articles)
+
+    def _sync_article(self, article: Dict, article_id, index: int):
+        """1件の記事を取り込む（未投稿なら投稿待ちに入れる）"""
+        if article_id in self._synced_article_ids:
+            return
+        if article.get("posted") is False:
+            try:
+                created_at = datetime.fromisoformat(article.get("created_at", ""))
+            except ValueError:
+                created_at = datetime.now()
+            if datetime.now() - created_at < PENDING_RETENTION:
+                self._pending_articles[article_id] = index
+            return
+        self._synced_article_ids.add(article_id)
+        names = [product.get("name") for product in article.get("products", []) if product.get("name")]
+        if not names:
+            return
+        try:
+            used_at = datetime.fromisoformat(article.get("posted_at") or article.get("created_at", ""))
+        except ValueError:
+            return
+        genre = article.get("products", [{}])[0].get("selected_category") or article.get("category")
+        self._mark_used(names, genre, used_at)
+
+    def _last_used(self, name: str) -> datetime:
+        return max(self.product_last_used.get(name, datetime.min), self.reserved_products.get(name, datetime.min))
+
+    def _combination_last_used(self, key: Tuple[str, ...]) -> datetime:
+        return max(self.combination_last_used.get(key, datetime.min),
+                   self.reserved_combinations.get(key, datetime.min))
+
+    def clear_reservations(self):
+        """投稿されなかった選択を取り消す（新しい日の計画を立てる前に呼ぶ）"""
+        with self._lock:
+            self.reserved_products.clear()
+            self.reserved_combinations.clear()
+            self.reserved_genres.clear()
+
+    def choose_genre(self, genres: List[str]) -> str:
+        """最も長く使われていない（予約を含む）ジャンルを選ぶ（同順位はランダム）"""
+        with self._lock:
+            self._sync_history()
+            return min(genres, key=lambda genre: (
+                max(self.genre_last_used.get(genre, datetime.min), self.reserved_genres.get(genre, datetime.min)),
+                self.rng.random()
+            ))
+
+    def select(self, genre: str, products: List[Dict], num_products: int, now: Optional[datetime] = None) -> List[Dict]:
+        """
+        ジャンル内の商品から、最も長く使われていない組み合わせを選んで予約する
+
+        使用実績は投稿済みの記事を履歴から取り込むときに記録する（選んだだけでは数えない）。
+
+        Args:
+            genre: ジャンル
+            products: ジャンル内の商品リスト
+            num_products: 選ぶ商品数
+            now: 現在時刻
+
+        Returns:
+            List[Dict]: 選ばれた商品（先頭が最も長く使われていない主要商品）
+        """
+        now = now or datetime.now()
+        num_products = min(num_products, len(products))
+        if num_products <= 0:
+            return []
+
+        with self._lock:
+            self._sync_history()
+
+            def recency(product: Dict):
+                name = product["name"]
+                return (self._last_used(name),
+                        self.product_use_count.get(name, 0),
+                        self.rng.random())
+
+            ordered = sorted(products, key=recency)
+            # クールダウン中の商品は、他の候補で数が足りる場合は外す
+            rested = [product for product in ordered
+                      if now - self._last_used(product["name"]) >= self.product_cooldown]
+            pool = rested if len(rested) >= num_products else ordered
+            pool = pool[:num_products + CANDIDATE_MARGIN]
+
+            best = None
+            best_key = None
+            for combo in combinations(pool, num_products):
+                combo_last_used = self._combination_last_used(
+                    self.combination_key([product["name"] for product in combo])
+                )
+                in_cooldown = now - combo_last_used < self.combination_cooldown
+                key = (in_cooldown, combo_last_used, sum(pool.index(product) for product in combo))
+                if best_key is None or key < best_key:
+                    best = combo
+                    best_key = key
+
+            selected = sorted(best, key=recency)
+            names = [product["name"] for product in selected]
+            for name in names:
+                self.reserved_products[name] = now
+            if len(names) > 1:
+                self.reserved_combinations[self.combination_key(names)] = now
+            self.reserved_genres[genre] = now
+
+        if best_key[0]:
+            logger.info(f"クールダウン中の組み合わせしか無いため、最も古い組み合わせを使用: {[p['name'] for p in selected]}")
+        return selected
+
+    def plan_day(self, categories: Dict[str, List[Dict]], count: int, num_products: int = 3) -> List[Tuple[str, List[Dict]]]:
+        """
+        1日分の商品セットをまとめて計画（前回の計画で投稿されなかった予約は取り消す）
+
+        Args:
+            categories: ジャンル → 商品リスト
+            count: 記事数
+            num_products: 1記事あたりの商品数
+
+        Returns:
+            List[Tuple[str, List[Dict]]]: (ジャンル, 商品リスト) の一覧
+        """
+        self.clear_reservations()
+        genres = [genre for genre, products in categories.items() if products]
+        plan = []
+        for _ in range(count):
+            genre = self.choose_genre(genres)
+            plan.append((genre, self.select(genre, categories[genre], num_products)))
+        return plan
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            self._sync_history()
+            return {
+                "tracked_products": len(self.product_last_used),
+                "tracked_combinations": len(self.combination_last_used),
+                "reserved_products": len(self.reserved_products),
+                "genre_last_used": {genre: used_at.isoformat() for genre, used_at in self.genre_last_used.items()}
+            }
@@ -6,10 +6,11 @@
 
 import re
 import math
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Tuple, Set, Union
 from collections import Counter
 from difflib import SequenceMatcher
 import logging
+from .markdown_document import ArticleDocument, ensure_document
 
 logger = logging.getLogger(__name__)
 
@@ -41,18 +42,24 @@ class SimilarityAnalyzer:
             '特徴': 1.3
         }
     
-    def analyze_similarity(self, content1: str, content2: str) -> Dict[str, float]:
+    def analyze_similarity(self, content1: Union[str, ArticleDocument], content2: Union[str, ArticleDocument]) -> Dict[str, float]:
         """
         複数のアルゴリズムを使用して包括的な類似度分析を実行
         
         Args:
-            content1: 記事内容1
-            content2: 記事内容2
+            content1: 記事内容1（文字列または解析済みの ArticleDocument）
+            content2: 記事内容2（文字列または解析済みの ArticleDocument）
         
         Returns:
             Dict[str, float]: 各種類似度スコア
         """
         try:
+            # 構造の比較には解析済みのドキュメントを使い、本文の比較には文字列を使う
+            document1 = ensure_document(content1)
+            document2 = ensure_document(content2)
+            content1 = content1 if isinstance(content1, str) else document1.to_markdown()
+            content2 = content2 if isinstance(content2, str) else document2.to_markdown()
+            
             # 内容を正規化
             normalized1 = self.normalize_content(content1)
             normalized2 = self.normalize_content(content2)
@@ -63,7 +70,7 @@ class SimilarityAnalyzer:
                 'cosine_similarity': self.calculate_cosine_similarity(normalized1, normalized2),
                 'jaccard_similarity': self.calculate_jaccard_similarity(normalized1, normalized2),
                 'keyword_similarity': self.calculate_keyword_similarity(content1, content2),
-                'structure_similarity': self.calculate_structure_similarity(content1, content2)
+                'structure_similarity': self.calculate_structure_similarity(document1, document2)
             }
             
             # 総合類似度を計算（重み付き平均）
@@ -210,7 +217,7 @@ class SimilarityAnalyzer:
             logger.error(f"キーワード類似度計算エラー: {e}")
             return 0.0
     
-    def calculate_structure_similarity(self, content1: str, content2: str) -> float:
+    def calculate_structure_similarity(self, content1: Union[str, ArticleDocument], content2: Union[str, ArticleDocument]) -> float:
         """記事構造の類似度を計算"""
         try:
             structure1 = self.extract_structure(content1)
@@ -268,20 +275,9 @@ class SimilarityAnalyzer:
         
         return keywords
     
-    def extract_structure(self, content: str) -> Dict:
-        """記事構造を抽出"""
-        # 見出しを抽出
-        headings = re.findall(r'#+\s*(.+)', content)
-        headings = [heading.strip().lower() for heading in headings]
-        
-        # 段落数をカウント
-        paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
-        paragraph_count = len(paragraphs)
-        
-        return {
-            'headings': headings,
-            'paragraph_count': paragraph_count
-        }
+    def extract_structure(self, content: Union[str, ArticleDocument]) -> Dict:
+        """記事構造を抽出（解析済みのドキュメントならシグネチャをそのまま使う）"""
+        return ensure_document(content).get_structure()
     
     def is_similar(self, similarity_scores: Dict[str, float], threshold: float = 0.7) -> Tuple[bool, str]:
         """
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+リクエスト合流（single-flight）モジュール
+同じ内容の処理が同時に複数要求された場合に、実際の処理を1回だけ実行して結果を共有する
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_flight_key(model: str, messages: List[Dict], params: Dict) -> str:
+    """
+    プロンプトを正規化したハッシュキーを生成
+
+    空白・改行の揺れだけが異なるプロンプトは同じリクエストとして扱う。
+    """
+    normalized = [
+        {"role": message.get("role"), "content": re.sub(r"\s+", " ", str(message.get("content", ""))).strip()}
+        for message in messages
+    ]
+    payload = json.dumps(
+        {"model": model, "messages": normalized, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.metrics = {"executions": 0, "coalesced": 0}
+
+    def do(self, key: str, fn: Callable) -> Tuple[object, bool]:
+        """
+        key が同じ実行中の処理があればその結果を待ち、無ければ fn を実行する
+
+        Args:
+            key: 合流判定用のキー
+            fn: 引数なしで呼び出す処理
+
+        Returns:
+            Tuple[object, bool]: (結果, 他の呼び出しの結果を共有したか)
+            fn が例外を送出した場合は待っていた全員に同じ例外を送出する
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.metrics["coalesced"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.metrics["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            if call.waiters:
+                logger.info(f"同一リクエストを合流しました（待機 {call.waiters} 件）")
+            call.event.set()
+
+        return call.result, False
+
+    def get_metrics(self) -> Dict:
+        """メトリクスを取得"""
+        with self._lock:
+            return {**self.metrics, "in_flight": len(self._calls)}
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+OpenAI互換スタブサーバーモジュール
+Chat Completions APIと同じ形式で決定的な日本語記事・タイトルを返すローカルHTTPサーバー
+レイテンシ分布・エラー率・429バーストを設定でき、実APIの応答を記録・再生することもできる
+
+使い方:
+    python -m modules.stub_openai_server --port 8089 --latency-median 1.5 --error-rate 0.02
+    （config.json の llm.base_url に http://127.0.0.1:8089/v1 を設定する）
+
+    記録: python -m modules.stub_openai_server --record data/stub_recordings.jsonl --upstream https://api.openai.com/v1
+    再生: python -m modules.stub_openai_server --replay data/stub_recordings.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SECTION_PHRASES = {
+    "概要": [
+        "{product}は、{category}分野で手軽に始められるアイテムとして注目されています。",
+        "今回は{product}を実際の生活に取り入れた様子を、できるだけ具体的にまとめました。",
+        "{category}に興味はあるものの、何から選べばよいか迷っている方も多いのではないでしょうか。",
+        "届いてすぐに感じたのは、作りが丁寧で扱いやすいという点でした。"
+    ],
+    "メリット": [
+        "まず良かったのは、準備にかかる時間が短く毎日続けやすいことです。",
+        "価格に対して満足度が高く、コストパフォーマンスの良さを実感しました。",
+        "初心者でも迷わず使える設計で、説明書を読み込まなくても直感的に扱えます。",
+        "使い続けるうちに生活のリズムが整い、気持ちにも余裕が生まれました。",
+        "家族と共有しやすく、会話のきっかけになったのも嬉しいポイントです。"
+    ],
+    "デメリット": [
+        "一方で、効果の感じ方には個人差がある点は理解しておく必要があります。",
+        "置き場所を事前に考えておかないと、意外と場所を取ると感じるかもしれません。",
+        "最初の数日は慣れが必要で、すぐに成果を求める方には物足りない可能性があります。",
+        "人気のため時期によっては在庫が少なく、価格が変動することもあります。"
+    ],
+    "まとめ": [
+        "総合的に見て、{product}は{category}を無理なく続けたい方におすすめできる選択肢です。",
+        "気になっている方は、まずは自分の目的に合うかどうかを確認してみてください。",
+        "長く付き合えるアイテムを探している方にとって、検討する価値は十分にあります。"
+    ]
+}
+
+TITLE_PATTERNS = [
+    "{product}を徹底レビュー！使って分かった本当の実力",
+    "{product}の使い方ガイド｜初心者が最初に知りたいポイント",
+    "{category}初心者必見！{product}で始める新習慣",
+    "【{category}】{product}は買い？メリットと注意点を解説",
+    "{product}を1ヶ月使ってみた正直な感想"
+]
+
+
+def request_hash(body: Dict) -> str:
+    """リクエスト内容（モデル・メッセージ・パラメータ）のハッシュ"""
+    payload = {key: body.get(key) for key in ("model", "messages", "max_tokens", "temperature", "n")}
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _extract_field(messages: List[Dict], labels: List[str], default: str, bracketed: bool = False) -> str:
+    """プロンプトから「商品名: ...」のような値を取り出す"""
+    for message in reversed(messages):
+        content = str(message.get("content", ""))
+        for line in content.splitlines():
+            for label in labels:
+                if line.startswith(label + ":"):
+                    return line.split(":", 1)[1].strip()
+        # タイトル用プロンプトは「...」で商品名を囲んでいる
+        if bracketed and message.get("role") == "user" and "「" in content and "」" in content:
+            return content.split("「", 1)[1].split("」", 1)[0]
+    return default
+
+
+class StubResponder:
+    def __init__(self, latency_median: float = 0.8, latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, burst_interval: float = 0.0, burst_duration: float = 0.0,
+                 seed: int = 0):
+        """
+        応答生成器を初期化
+
+        Args:
+            latency_median: レイテンシの中央値（秒、対数正規分布）
+            latency_sigma: 対数正規分布のσ（大きいほどテールが長い）
+            error_rate: 500エラーを返す確率
+            burst_interval: 429バーストの周期（秒、0で無効）
+            burst_duration: 各周期の先頭で429を返し続ける秒数
+            seed: 乱数シード
+        """
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.burst_interval = burst_interval
+        self.burst_duration = burst_duration
+        self.seed = seed
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+
+    def sample_latency(self) -> float:
+        with self._lock:
+            return self._rng.lognormvariate(math.log(max(self.latency_median, 1e-6)), self.latency_sigma)
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+    def in_rate_limit_burst(self) -> bool:
+        if self.burst_interval <= 0 or self.burst_duration <= 0:
+            return False
+        elapsed = time.monotonic() - self.started_at
+        return (elapsed % self.burst_interval) < self.burst_duration
+
+    def build_completion(self, body: Dict) -> Dict:
+        """リクエストから決定的な応答を生成"""
+        messages = body.get("messages", [])
+        digest = request_hash(body)
+        rng = random.Random(int(digest[:16], 16) ^ self.seed)
+
+        product = _extract_field(messages, ["商品名", "主要商品"], "おすすめ商品", bracketed=True)
+        category = _extract_field(messages, ["カテゴリ"], "暮らし")
+        user_text = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "user")
+
+        if "タイトル" in user_text:
+            count = 1
+            for message in messages:
+                content = str(message.get("content", ""))
+                if "件" in content and "タイトル" in content:
+                    digits = "".join(ch for ch in content.split("件", 1)[0][-3:] if ch.isdigit())
+                    count = int(digits) if digits else 1
+            titles = rng.sample(TITLE_PATTERNS, k=min(count, len(TITLE_PATTERNS)))
+            while len(titles) < count:
+                titles.append(f"{rng.choice(TITLE_PATTERNS)}（{len(titles) + 1}）")
+            text = "\n".join(t.format(product=product, category=category) for t in titles)
+        else:
+            sections = []
+            for heading, phrases in SECTION_PHRASES.items():
+                picked = rng.sample(phrases, k=min(len(phrases), rng.randint(2, 3)))
+                paragraph = "".join(p.format(product=product, category=category) for p in picked)
+                sections.append(f"## {heading}\n\n{paragraph}")
+            text = "\n\n".join(sections)
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages)
+        completion_tokens = len(text)
+        # 先頭のシステムメッセージはプロバイダー側でキャッシュされたものとして扱う
+        system_chars = len(str(messages[0].get("content", ""))) if messages and messages[0].get("role") == "system" else 0
+        cached_tokens = (system_chars // 128) * 128 if system_chars >= 1024 else 0
+
+        return {
+            "id": f"chatcmpl-stub-{digest[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}
+            }
+        }
+
+
+class RecordingStore:
+    def __init__(self, path: str):
+        """記録・再生用のJSONLストア（1行1応答、リクエストハッシュで引く）"""
+        self.path = path
+        self._lock = threading.Lock()
+        self.responses: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry["hash"]] = entry["response"]
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.responses.get(key)
+
+    def add(self, key: str, response: Dict):
+        with self._lock:
+            self.responses[key] = response
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"hash": key, "response": response}, ensure_ascii=False) + "\n")
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    server_version = "StubOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s" % (self.address_string(), format % args))
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4.1-mini", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+            return
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+
+        server = self.server
+        responder: StubResponder = server.responder
+        with responder._lock:
+            responder.stats["requests"] += 1
+
+        if responder.in_rate_limit_burst():
+            with responder._lock:
+                responder.stats["rate_limited"] += 1
+            self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error"}},
+                            extra_headers={"retry-after": "1"})
+            return
+
+        time.sleep(responder.sample_latency())
+
+        if responder.should_fail():
+            with responder._lock:
+                responder.stats["errors"] += 1
+            self._send_json(500, {"error": {"message": "Internal error (stub)", "type": "server_error"}})
+            return
+
+        key = request_hash(body)
+        response = None
+        if server.store is not None:
+            response = server.store.get(key)
+            if response is None and server.replay:
+                self._send_json(404, {"error": {"message": "no recording for request", "type": "invalid_request_error"}})
+                return
+        if response is None:
+            if server.upstream:
+                response = self._forward(body)
+            else:
+                response = responder.build_completion(body)
+            if server.store is not None and not server.replay:
+                server.store.add(key, response)
+
+        with responder._lock:
+            responder.stats["ok"] += 1
+        self._send_json(200, response)
+
+    def _forward(self, body: Dict) -> Dict:
+        """記録モードで上流のAPIへ転送"""
+        request = urllib.request.Request(
+            self.server.upstream.rstrip("/") + "/chat/completions",
+            data=json.dumps(body).encode("utf-8"),
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": self.headers.get("Authorization", "")
+            },
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return json.loads(response.read())
+
+    def _send_json(self, status: int, payload: Dict, extra_headers: Optional[Dict] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubOpenAIServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8089, responder: Optional[StubResponder] = None,
+                 record_path: Optional[str] = None, replay_path: Optional[str] = None,
+                 upstream: Optional[str] = None):
+        """
+        スタブサーバーを初期化
+
+        Args:
+            host: 待ち受けホスト
+            port: 待ち受けポート（0で空きポートを自動選択）
+            responder: 応答生成器
+            record_path: 応答を記録するJSONLファイル
+            replay_path: 記録済みの応答だけを返す再生モードのJSONLファイル
+            upstream: 記録モードで転送する上流APIのURL（省略時はスタブの応答を記録）
+        """
+        self.httpd = ThreadingHTTPServer((host, port), StubRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.responder = responder or StubResponder()
+        self.httpd.replay = replay_path is not None
+        path = replay_path or record_path
+        self.httpd.store = RecordingStore(path) if path else None
+        self.httpd.upstream = upstream
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """バックグラウンドスレッドで起動"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"スタブサーバーを起動しました: {self.base_url}")
+        return self
+
+    def serve_forever(self):
+        logger.info(f"スタブサーバーを起動しました: {self.base_url}")
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self) -> Dict:
+        return dict(self.httpd.responder.stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI互換のローカルスタブサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-median", type=float, default=0.8, help="レイテンシの中央値（秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="対数正規分布のσ")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500エラーを返す確率")
+    parser.add_argument("--burst-interval", type=float, default=0.0, help="429バーストの周期（秒）")
+    parser.add_argument("--burst-duration", type=float, default=0.0, help="429を返し続ける秒数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", help="応答を記録するJSONLファイル")
+    parser.add_argument("--replay", help="記録済み応答を再生するJSONLファイル")
+    parser.add_argument("--upstream", help="記録モードで転送する上流APIのURL")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    responder = StubResponder(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        burst_interval=args.burst_interval,
+        burst_duration=args.burst_duration,
+        seed=args.seed
+    )
+    server = StubOpenAIServer(args.host, args.port, responder,
+                              record_path=args.record, replay_path=args.replay, upstream=args.upstream)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n停止します: {server.get_stats()}")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
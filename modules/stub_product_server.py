@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+商品ページのスタブサーバーモジュール
+/dp/<ASIN> に対してASINから決定的に作った商品ページHTMLを返すローカルHTTPサーバー
+ETag・Last-Modifiedを付け、条件付きリクエスト（If-None-Match / If-Modified-Since）には304を返す
+取り扱い終了（404）やリダイレクトするASIN、CAPTCHAへの転送・5xxを返すASINも設定できる
+商品情報の更新やリンク切れ検査を、実サイトにアクセスせずに再現性のある条件で試すために使う
+
+使い方:
+    python -m modules.stub_product_server --port 8090 --latency 0.05
+    python -m modules.product_enricher --base-url http://127.0.0.1:8090
+"""
+
+import argparse
+import hashlib
+import logging
+import re
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PATH_PATTERN = re.compile(r'^/(?:[^/]+/)?dp/([A-Z0-9]{10})')
+CAPTCHA_PATH = "/errors/validateCaptcha"
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{name}</title>
+<link rel="canonical" href="https://www.amazon.co.jp/dp/{asin}"></head>
+<body>
+<span id="productTitle">{name}</span>
+<div id="corePrice_feature_div"><span class="a-price"><span class="a-offscreen">￥{price:,}</span></span></div>
+<div id="availability"><span>{availability}</span></div>
+</body></html>"""
+
+
+class StubCatalog:
+    def __init__(self):
+        """ASINごとの商品ページ（価格・在庫を変更すると ETag と Last-Modified が変わる）"""
+        self._lock = threading.Lock()
+        self.pages: Dict[str, Tuple[bytes, str, float]] = {}
+        self.overrides: Dict[str, Dict] = {}
+        self.missing: Set[str] = set()
+        self.redirects: Dict[str, str] = {}
+        self.errors: Dict[str, Dict] = {}
+        self.stats = {"requests": 0, "ok": 0, "not_modified": 0, "not_found": 0}
+
+    def set_product(self, asin: str, price: Optional[int] = None, availability: Optional[str] = None):
+        """価格・在庫を変更（次のリクエストから新しいページを返す）"""
+        with self._lock:
+            override = self.overrides.setdefault(asin, {})
+            if price is not None:
+                override["price"] = price
+            if availability is not None:
+                override["availability"] = availability
+            self.pages.pop(asin, None)
+
+    def set_missing(self, asin: str):
+        """取り扱い終了の商品として404を返す"""
+        with self._lock:
+            self.missing.add(asin)
+
+    def set_redirect(self, asin: str, location: str):
+        """別のURLへの302を返す（パスだけならこのサーバー内のURL）"""
+        with self._lock:
+            self.redirects[asin] = location
+
+    def set_captcha(self, asin: str):
+        """ボット対策のCAPTCHAページへ転送する"""
+        self.set_redirect(asin, f"{CAPTCHA_PATH}?amzn=stub")
+
+    def set_error(self, asin: str, status: int = 503, retry_after: Optional[int] = None, times: int = 0):
+        """
+        指定したエラーステータス（429・5xxなど）を返す
+
+        Args:
+            retry_after: Retry-After ヘッダーの秒数（Noneなら付けない）
+            times: エラーを返す回数（0なら clear() するまで返し続ける）
+        """
+        with self._lock:
+            self.errors[asin] = {"status": status, "retry_after": retry_after, "remaining": times or None}
+
+    def take_error(self, asin: str) -> Optional[Dict]:
+        """このリクエストで返すエラー（回数指定があれば1回分消費する）"""
+        with self._lock:
+            error = self.errors.get(asin)
+            if error and error["remaining"] is not None:
+                error["remaining"] -= 1
+                if error["remaining"] <= 0:
+                    del self.errors[asin]
+            return error
+
+    def clear(self, asin: str):
+        """404・リダイレクト・エラーの設定を外して通常の商品ページに戻す"""
+        with self._lock:
+            self.missing.discard(asin)
+            self.redirects.pop(asin, None)
+            self.errors.pop(asin, None)
+
+    def get_page(self, asin: str) -> Tuple[bytes, str, float]:
+        """(本文, ETag, 最終更新時刻)"""
+        with self._lock:
+            page = self.pages.get(asin)
+            if page is None:
+                seed = int(hashlib.md5(asin.encode("ascii")).hexdigest(), 16)
+                override = self.overrides.get(asin, {})
+                body = PAGE_TEMPLATE.format(
+                    asin=asin,
+                    name=f"スタブ商品 {asin}",
+                    price=override.get("price", 1000 + seed % 90 * 100),
+                    availability=override.get("availability", "在庫あり。")
+                ).encode("utf-8")
+                # Last-Modified は秒単位なので、更新のたびに1秒以上進める
+                last_modified = float(int(time.time()))
+                previous = self.pages.get(asin)
+                if previous and previous[2] >= last_modified:
+                    last_modified = previous[2] + 1
+                page = (body, '"' + hashlib.md5(body).hexdigest() + '"', last_modified)
+                self.pages[asin] = page
+            return page
+
+
+class StubProductRequestHandler(BaseHTTPRequestHandler):
+    server_version = "StubProduct/1.0"
+    protocol_version = "HTTP/1.1"
+    # ヘッダーと本文を別々に書くため、keep-alive で遅延ACKを待たないようにする
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s" % (self.address_string(), format % args))
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body: bool):
+        catalog: StubCatalog = self.server.catalog
+        with catalog._lock:
+            catalog.stats["requests"] += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        match = _PATH_PATTERN.match(self.path)
+        if not match and (self.path == "/" or self.path.startswith(("/s?", CAPTCHA_PATH))):
+            # トップページ・検索結果ページ・CAPTCHAページ（リダイレクト先の確認用）
+            self._send(200, b"<html><body></body></html>", {"Content-Type": "text/html; charset=utf-8"}, send_body)
+            return
+        if not match:
+            with catalog._lock:
+                catalog.stats["not_found"] += 1
+            self._send(404, b"not found", {"Content-Type": "text/plain"}, send_body)
+            return
+
+        asin = match.group(1)
+        if asin in catalog.missing:
+            with catalog._lock:
+                catalog.stats["not_found"] += 1
+            self._send(404, b"not found", {"Content-Type": "text/plain"}, send_body)
+            return
+        if asin in catalog.redirects:
+            self._send(302, b"", {"Location": catalog.redirects[asin]}, send_body)
+            return
+        error = catalog.take_error(asin)
+        if error:
+            headers = {"Content-Type": "text/plain"}
+            if error["retry_after"] is not None:
+                headers["Retry-After"] = str(error["retry_after"])
+            self._send(error["status"], b"error", headers, send_body)
+            return
+
+        body, etag, last_modified = catalog.get_page(asin)
+        headers = {
+            "Content-Type": "text/html; charset=utf-8",
+            "ETag": etag,
+            "Last-Modified": formatdate(last_modified, usegmt=True)
+        }
+        if self._not_modified(etag, last_modified):
+            with catalog._lock:
+                catalog.stats["not_modified"] += 1
+            self._send(304, b"", headers, send_body=False)
+            return
+        with catalog._lock:
+            catalog.stats["ok"] += 1
+        self._send(200, body, headers, send_body)
+
+    def _not_modified(self, etag: str, last_modified: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(",")]
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _send(self, status: int, body: bytes, headers: Dict, send_body: bool):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body) if status != 304 else 0))
+        self.end_headers()
+        if send_body and status != 304:
+            self.wfile.write(body)
+
+
+class StubProductServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8090, latency: float = 0.0,
+                 catalog: Optional[StubCatalog] = None):
+        """
+        スタブサーバーを初期化
+
+        Args:
+            host: 待ち受けホスト
+            port: 待ち受けポート（0で空きポートを自動選択）
+            latency: 1リクエストごとの応答遅延（秒）
+            catalog: 返す商品ページ
+        """
+        self.httpd = ThreadingHTTPServer((host, port), StubProductRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.catalog = catalog or StubCatalog()
+        self.httpd.latency = latency
+        self._thread = None
+
+    @property
+    def catalog(self) -> StubCatalog:
+        return self.httpd.catalog
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """バックグラウンドスレッドで起動"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"商品ページのスタブサーバーを起動しました: {self.base_url}")
+        return self
+
+    def serve_forever(self):
+        logger.info(f"商品ページのスタブサーバーを起動しました: {self.base_url}")
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self) -> Dict:
+        return dict(self.catalog.stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="商品ページのローカルスタブサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答遅延（秒）")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = StubProductServer(args.host, args.port, args.latency)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n停止します: {server.get_stats()}")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+タイトル候補プールモジュール
+1回のAPI呼び出しで生成した複数のタイトル候補を商品×記事タイプごとに保持し、
+過去記事のタイトルと重ならない候補から順に払い出す
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def title_bigrams(title: str) -> Set[str]:
+    """タイトルの文字bigram集合（記号・空白は除く）"""
+    chars = [ch for ch in title.lower() if ch.isalnum()]
+    if len(chars) < 2:
+        return set(chars)
+    return {chars[i] + chars[i + 1] for i in range(len(chars) - 1)}
+
+
+class TitleIndex:
+    def __init__(self):
+        """bigram → タイトルIDの転置インデックス"""
+        self.titles: List[str] = []
+        self.sizes: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        self._known: Set[str] = set()
+
+    def add(self, title: str):
+        if not title or title in self._known:
+            return
+        self._known.add(title)
+        title_id = len(self.titles)
+        grams = title_bigrams(title)
+        self.titles.append(title)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(title_id)
+
+    def __contains__(self, title: str) -> bool:
+        return title in self._known
+
+    def max_similarity(self, title: str) -> Tuple[float, Optional[str]]:
+        """登録済みタイトルとのJaccard類似度の最大値と、その相手"""
+        grams = title_bigrams(title)
+        if not grams:
+            return 0.0, None
+
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for title_id in self.postings.get(gram, ()):
+                shared[title_id] = shared.get(title_id, 0) + 1
+
+        best_score = 0.0
+        best_id = None
+        for title_id, count in shared.items():
+            score = count / (len(grams) + self.sizes[title_id] - count)
+            if score > best_score:
+                best_score = score
+                best_id = title_id
+
+        return best_score, self.titles[best_id] if best_id is not None else None
+
+
+class TitleCandidatePool:
+    def __init__(self, history_manager=None, min_uniqueness: float = 0.4):
+        """
+        タイトル候補プールを初期化
+
+        Args:
+            history_manager: 過去記事のタイトルを参照する ArticleHistoryManager
+            min_uniqueness: 払い出す候補に求める独自性スコア（1 - 最大類似度）の下限
+        """
+        self.history_manager = history_manager
+        self.min_uniqueness = min_uniqueness
+        self._lock = threading.Lock()
+        self.pools: Dict[Tuple[str, str], List[str]] = {}
+        self.index = TitleIndex()
+        self._indexed_history_count = 0
+        self.metrics = {"issued": 0, "rejected": 0, "refills": 0}
+
+    def _sync_history(self):
+        """履歴に追加された記事のタイトルをインデックスへ取り込む"""
+        if not self.history_manager:
+            return
+        articles = self.history_manager.history_data.get("articles", [])
+        for article in articles[self._indexed_history_count:]:
+            self.index.add(article.get("title", ""))
+        self._indexed_history_count = len(articles)
+
+    def uniqueness(self, title: str) -> float:
+        """過去タイトル・払い出し済みタイトルに対する独自性スコア（0.0-1.0）"""
+        with self._lock:
+            self._sync_history()
+            return 1.0 - self.index.max_similarity(title)[0]
+
+    def add_candidates(self, product_name: str, article_type: str, titles: List[str]):
+        """候補をプールに追加"""
+        key = (product_name, article_type)
+        with self._lock:
+            pool = self.pools.setdefault(key, [])
+            for title in titles:
+                if title and title not in pool and title not in self.index:
+                    pool.append(title)
+            self.metrics["refills"] += 1
+
+    def take_best(self, product_name: str, article_type: str) -> Optional[str]:
+        """
+        独自性スコアが最も高い未使用の候補を払い出す
+
+        Returns:
+            Optional[str]: 下限を満たす候補が無い場合はNone
+        """
+        key = (product_name, article_type)
+        with self._lock:
+            self._sync_history()
+            pool = self.pools.get(key)
+            if not pool:
+                return None
+
+            scored = []
+            for title in pool:
+                similarity, similar_title = self.index.max_similarity(title)
+                scored.append((1.0 - similarity, title, similar_title))
+
+            # 下限を満たさない候補は以後も使えないため捨てる
+            usable = [item for item in scored if item[0] >= self.min_uniqueness]
+            self.metrics["rejected"] += len(scored) - len(usable)
+            for score, title, similar_title in scored:
+                if score < self.min_uniqueness:
+                    logger.info(f"既存タイトルと類似するため候補を除外: {title}（類似: {similar_title}）")
+
+            if not usable:
+                self.pools[key] = []
+                return None
+
+            usable.sort(key=lambda item: item[0], reverse=True)
+            best_score, best_title, _ = usable[0]
+            self.pools[key] = [title for _, title, _ in usable[1:]]
+
+            self.index.add(best_title)
+            self.metrics["issued"] += 1
+            logger.info(f"タイトル候補を使用: {best_title}（独自性 {best_score:.2f}、残り {len(self.pools[key])} 件）")
+            return best_title
+
+    def remaining(self, product_name: str, article_type: str) -> int:
+        with self._lock:
+            return len(self.pools.get((product_name, article_type), []))
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            return {**self.metrics, "pooled": sum(len(pool) for pool in self.pools.values())}
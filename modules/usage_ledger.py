@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+トークン使用量台帳モジュール
+LLM呼び出しごとのトークン数・レイテンシ・結果を追記専用のJSONLに記録し、
+日別・カテゴリ別・呼び出し種別ごとの集計と日次トークン予算の管理を行う
+
+使い方:
+    python -m modules.usage_ledger --by day
+    python -m modules.usage_ledger --by category --since 2025-09-01
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+GROUP_FIELDS = {
+    "day": lambda record: record.get("timestamp", "")[:10],
+    "category": lambda record: record.get("category") or "不明",
+    "call_type": lambda record: record.get("call_type") or "不明",
+    "model": lambda record: record.get("model") or "不明",
+    "outcome": lambda record: record.get("outcome") or "不明"
+}
+
+# 失敗として数えない結果種別
+SUCCESS_OUTCOMES = {"success", "cache_hit", "coalesced"}
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """日次トークン予算を使い切ったことを表す例外"""
+
+
+class UsageLedger:
+    def __init__(self, ledger_file: str = "data/llm_usage.jsonl", daily_token_budget: Optional[int] = None):
+        """
+        使用量台帳を初期化
+
+        Args:
+            ledger_file: 台帳ファイル（JSONL、1行1呼び出し）
+            daily_token_budget: 1日あたりのトークン予算（Noneまたは0で無制限）
+        """
+        self.ledger_file = ledger_file
+        self.daily_token_budget = daily_token_budget or None
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(ledger_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # 当日分の使用量だけはメモリに保持して予算判定を高速にする
+        self._today = datetime.now().strftime("%Y-%m-%d")
+        self._today_tokens = self._load_tokens_for_day(self._today)
+
+    def record(self, call_type: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               cached_tokens: int = 0, latency: float = 0.0, retry_index: int = 0,
+               outcome: str = "success", **context) -> Dict:
+        """
+        1回のLLM呼び出しを記録
+
+        Args:
+            call_type: 呼び出し種別（"title", "article" など）
+            model: 使用モデル
+            prompt_tokens: 入力トークン数
+            completion_tokens: 出力トークン数
+            cached_tokens: プロバイダー側でキャッシュされた入力トークン数
+            latency: レイテンシ（秒）
+            retry_index: 再試行の番号（初回は0）
+            outcome: 結果種別（"success", "rate_limited", "timeout", "error", "cache_hit" など）
+            **context: category, article_type, attempt などの付加情報
+        """
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "call_type": call_type,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "latency": round(latency, 4),
+            "retry_index": retry_index,
+            "outcome": outcome
+        }
+        record.update({key: value for key, value in context.items() if value is not None})
+
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            try:
+                with open(self.ledger_file, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except Exception as e:
+                logger.warning(f"使用量台帳への記録に失敗: {e}")
+
+            day = record["timestamp"][:10]
+            if day != self._today:
+                self._today = day
+                self._today_tokens = 0
+            self._today_tokens += record["total_tokens"]
+
+        return record
+
+    def get_today_tokens(self) -> int:
+        """当日の使用トークン数を取得"""
+        with self._lock:
+            today = datetime.now().strftime("%Y-%m-%d")
+            if today != self._today:
+                self._today = today
+                self._today_tokens = 0
+            return self._today_tokens
+
+    def remaining_budget(self) -> Optional[int]:
+        """当日の残り予算（無制限の場合はNone）"""
+        if not self.daily_token_budget:
+            return None
+        return max(0, self.daily_token_budget - self.get_today_tokens())
+
+    def check_budget(self):
+        """予算を使い切っている場合は TokenBudgetExceeded を送出"""
+        remaining = self.remaining_budget()
+        if remaining is not None and remaining <= 0:
+            raise TokenBudgetExceeded(
+                f"本日のトークン予算（{self.daily_token_budget}）を使い切ったため記事生成を停止します"
+            )
+
+    def iter_records(self, since: Optional[str] = None) -> Iterator[Dict]:
+        """台帳の記録を1件ずつ読み出す（since は "YYYY-MM-DD" 形式）"""
+        if not os.path.exists(self.ledger_file):
+            return
+        with open(self.ledger_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if since and record.get("timestamp", "")[:10] < since:
+                    continue
+                yield record
+
+    def summarize(self, group_by: str = "day", since: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        記録を集計
+
+        Args:
+            group_by: "day", "category", "call_type", "model", "outcome" のいずれか
+            since: この日付以降の記録のみ集計
+
+        Returns:
+            Dict[str, Dict]: グループごとの呼び出し数・トークン数・レイテンシ
+        """
+        key_func = GROUP_FIELDS[group_by]
+        summary: Dict[str, Dict] = {}
+
+        for record in self.iter_records(since):
+            group = summary.setdefault(key_func(record), {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "total_tokens": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+                "failures": 0
+            })
+            group["calls"] += 1
+            group["prompt_tokens"] += record.get("prompt_tokens", 0)
+            group["completion_tokens"] += record.get("completion_tokens", 0)
+            group["cached_tokens"] += record.get("cached_tokens", 0)
+            group["total_tokens"] += record.get("total_tokens", 0)
+            group["total_latency"] += record.get("latency", 0.0)
+            group["max_latency"] = max(group["max_latency"], record.get("latency", 0.0))
+            if record.get("outcome") not in SUCCESS_OUTCOMES:
+                group["failures"] += 1
+
+        for group in summary.values():
+            group["average_latency"] = group["total_latency"] / group["calls"] if group["calls"] else 0.0
+
+        return dict(sorted(summary.items()))
+
+    def _load_tokens_for_day(self, day: str) -> int:
+        total = 0
+        try:
+            for record in self.iter_records(since=day):
+                if record.get("timestamp", "")[:10] == day:
+                    total += record.get("total_tokens", 0)
+        except Exception as e:
+            logger.warning(f"使用量台帳の読み込みに失敗: {e}")
+        return total
+
+
+def main(argv=None):
+    """集計CLI"""
+    parser = argparse.ArgumentParser(description="LLM使用量台帳の集計")
+    parser.add_argument("--file", default="data/llm_usage.jsonl", help="台帳ファイル")
+    parser.add_argument("--by", choices=sorted(GROUP_FIELDS.keys()), default="day", help="集計単位")
+    parser.add_argument("--since", help="集計開始日 (YYYY-MM-DD)")
+    parser.add_argument("--json", action="store_true", help="JSON形式で出力")
+    args = parser.parse_args(argv)
+
+    ledger = UsageLedger(args.file)
+    summary = ledger.summarize(args.by, args.since)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{args.by:<20} {'calls':>7} {'prompt':>10} {'completion':>10} {'cached':>10} {'total':>10} {'avg_lat':>8} {'max_lat':>8} {'fail':>5}")
+    for key, group in summary.items():
+        print(
+            f"{key:<20} {group['calls']:>7} {group['prompt_tokens']:>10} {group['completion_tokens']:>10} "
+            f"{group['cached_tokens']:>10} {group['total_tokens']:>10} {group['average_latency']:>8.2f} "
+            f"{group['max_latency']:>8.2f} {group['failures']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from modules.product_research import ProductResearcher
 from modules.article_generator import ArticleGenerator
 from modules.note_poster import NotePoster
+from modules.browser_pool import BrowserPool
+from modules.article_validator import ArticleValidator
+from modules.rotation_planner import RotationPlanner
+from modules.link_health import LinkHealthChecker
+from modules.product_record import as_dicts
 from modules.image_generator_wrapper import ImageGeneratorWrapper
 
 class MainController:
@@ -33,18 +38,68 @@ class MainController:
         )
         
         self.article_generator = ArticleGenerator(
-            openai_api_key=self.config['openai']['api_key']
+            openai_api_key=self.config['openai']['api_key'],
+            llm_config=self.config.get('llm', {})
         )
         
+        # 商品ローテーション（記事履歴から最も長く使われていない商品の組み合わせを選ぶ）
+        rotation_config = self.config.get('rotation', {})
+        if rotation_config.get('enabled', True):
+            self.product_researcher.rotation_planner = RotationPlanner(
+                history_manager=self.article_generator.history_manager,
+                product_cooldown_hours=rotation_config.get('product_cooldown_hours', 72),
+                combination_cooldown_days=rotation_config.get('combination_cooldown_days', 30)
+            )
+        # リンク切れの確認（リンク切れの商品は検索リンクで投稿する）
+        link_health_config = self.config.get('link_health', {})
+        if link_health_config.get('enabled', True):
+            self.product_researcher.link_health = LinkHealthChecker(
+                ttl_hours=link_health_config.get('ttl_hours', 24),
+                per_host_limit=link_health_config.get('per_host_limit', 4),
+                timeout=link_health_config.get('timeout_seconds', 10),
+                failure_threshold=link_health_config.get('failure_threshold', 2)
+            )
+        # 1日分の商品セットの計画（run_daily_schedule の開始時に作成）
+        self.daily_product_plan: List[List[Dict]] = []
+        
+        # 投稿ごとにブラウザを起動せず、起動したままのブラウザから新しいコンテキストを借りる
+        browser_config = self.config.get('browser', {})
+        pool_config = browser_config.get('pool', {})
+        self.browser_pool = None
+        if pool_config.get('enabled', True):
+            self.browser_pool = BrowserPool(
+                headless=browser_config.get('headless', True),
+                size=pool_config.get('size', 1),
+                max_uses=pool_config.get('max_uses', 20),
+                max_rss_mb=pool_config.get('max_rss_mb', 1024)
+            )
+        
         self.note_poster = NotePoster(
             username=self.config['note']['username'],
             password=self.config['note']['password'],
-            headless=self.config.get('browser', {}).get('headless', True),
-            enable_photo_gallery=True  # みんなのフォトギャラリー機能を有効化
+            headless=browser_config.get('headless', True),
+            enable_photo_gallery=True,  # みんなのフォトギャラリー機能を有効化
+            session_file=browser_config.get('session_file', 'data/note_session.json'),
+            browser_pool=self.browser_pool
         )
         
         self.image_generator = ImageGeneratorWrapper()
         
+        # 投稿前の記事検証（ブラウザを起動する前に不備のある記事を止める）
+        validation_config = self.config.get('validation', {})
+        self.article_validator = ArticleValidator(
+            min_length=validation_config.get('min_length', 300),
+            max_length=validation_config.get('max_length', 10000),
+            required_sections=validation_config.get('required_sections'),
+            min_links=validation_config.get('min_links', 1),
+            min_tags=validation_config.get('min_tags', 1),
+            max_tags=validation_config.get('max_tags', 5),
+            title_pool=self.article_generator.title_pool
+        )
+        # 事前に生成・検証済みの記事（buffer_size が0なら投稿のたびに生成する）
+        self.article_buffer_size = validation_config.get('buffer_size', 0)
+        self.article_buffer: List[Dict] = []
+        
         # 統計情報
         self.daily_stats = {
             'articles_generated': 0,
@@ -132,7 +187,13 @@ class MainController:
                 "max_interval_minutes": 180
             },
             "browser": {
-                "headless": True
+                "headless": True,
+                "pool": {
+                    "enabled": True,
+                    "size": 1,
+                    "max_uses": 20,
+                    "max_rss_mb": 1024
+                }
             }
         }
         
@@ -166,51 +227,53 @@ class MainController:
         try:
             self.logger.info("記事生成・投稿プロセス開始")
             
-            # 1. 記事タイプをランダム選択
-            article_type = random.choice(["レビュー", "ハウツー", "商品紹介"])
-            self.logger.info(f"記事タイプ: {article_type}")
-            
-            # 2. 商品情報を取得
-            products = self.product_researcher.get_products_for_article(article_type, 3)
-            if not products:
-                self.logger.error("商品情報の取得に失敗")
-                return False
-            
-            self.logger.info(f"選択された商品: {[p['name'] for p in products]}")
-            
-            # 3. 記事を生成
-            article_data = self.article_generator.generate_complete_article(products, article_type)
-            self.daily_stats['articles_generated'] += 1
-            
-            self.logger.info(f"記事生成完了: {article_data['title']}")
+            # 1-3. 検証済みの記事を取得（事前生成分があればそれを使う）
+            if self.article_buffer:
+                article_data = self.article_buffer.pop(0)
+                self.logger.info(f"事前生成済みの記事を使用: {article_data['title']}（残り {len(self.article_buffer)} 件）")
+            else:
+                article_data = self.generate_article()
+                if not article_data:
+                    return False
+                
+                result = self.article_validator.validate(article_data)
+                self.article_validator.log_result(result)
+                if not result.valid:
+                    self.logger.error("記事の検証に失敗したため投稿を中止します")
+                    self.daily_stats['errors'].append(f"記事検証失敗: {', '.join(result.errors)}")
+                    return False
+                article_data = result.article
             
-            # 4. noteに投稿
-            await self.note_poster.start_browser()
+            products = article_data['products']
             
-            # ログイン
-            if not await self.note_poster.login():
-                self.logger.error("noteログインに失敗")
+            # 4. noteに投稿（途中で例外が出てもブラウザ・プールのコンテキストは必ず返す）
+            try:
+                await self.note_poster.start_browser()
+                
+                # ログイン（保存済みのセッションが有効ならログインしない）
+                if not await self.note_poster.ensure_logged_in():
+                    self.logger.error("noteログインに失敗")
+                    return False
+                
+                # 記事投稿
+                # サムネイル画像を生成
+                thumbnail_path = await self.generate_thumbnail_image(article_data['title'], article_data['category'])
+                
+                # 生成に失敗した場合はデフォルト画像を使用
+                if not thumbnail_path:
+                    thumbnail_path = self.select_thumbnail_image(article_data['category'])
+                
+                success = await self.note_poster.post_article(
+                    article_data['title'],
+                    article_data['content'],
+                    article_data['tags'],
+                    thumbnail_path,
+                    products,  # アフィリエイトリンク変換用
+                    article_data['category'],  # みんなのフォトギャラリー用カテゴリ
+                    document=article_data.get('document')  # 解析済みの本文
+                )
+            finally:
                 await self.note_poster.close_browser()
-                return False
-            
-            # 記事投稿
-            # サムネイル画像を生成
-            thumbnail_path = await self.generate_thumbnail_image(article_data['title'], article_data['category'])
-            
-            # 生成に失敗した場合はデフォルト画像を使用
-            if not thumbnail_path:
-                thumbnail_path = self.select_thumbnail_image(article_data['category'])
-            
-            success = await self.note_poster.post_article(
-                article_data['title'],
-                article_data['content'],
-                article_data['tags'],
-                thumbnail_path,
-                products,  # アフィリエイトリンク変換用
-                article_data['category']  # みんなのフォトギャラリー用カテゴリ
-            )
-            
-            await self.note_poster.close_browser()
             
             if not success:
                 self.logger.error("note投稿に失敗")
@@ -223,8 +286,9 @@ class MainController:
             self.daily_stats['note_posts_success'] += 1
             self.logger.info(f"note投稿成功: {note_url}")
             
-            # 5. 記事データを保存
+            # 5. 記事データを保存し、履歴の記事を投稿済みにする（商品ローテーションの使用実績になる）
             self.save_article_data(article_data, note_url)
+            self.mark_article_posted(article_data, note_url)
             
             self.logger.info("記事生成・投稿プロセス完了")
             return True
@@ -234,6 +298,53 @@ class MainController:
             self.daily_stats['errors'].append(str(e))
             return False
     
+    def generate_article(self) -> Optional[Dict]:
+        """記事タイプと商品を選んで記事を生成"""
+        # 1. 記事タイプをランダム選択
+        article_type = random.choice(["レビュー", "ハウツー", "商品紹介"])
+        self.logger.info(f"記事タイプ: {article_type}")
+        
+        # 2. 商品情報を取得（1日分の計画があればその順に使う）
+        if self.daily_product_plan:
+            products = self.product_researcher.arrange_for_article(self.daily_product_plan.pop(0), article_type)
+        else:
+            products = self.product_researcher.get_products_for_article(None, 3, article_type)
+        if not products:
+            self.logger.error("商品情報の取得に失敗")
+            return None
+        
+        self.logger.info(f"選択された商品: {[p['name'] for p in products]}")
+        
+        # 3. 記事を生成
+        article_data = self.article_generator.generate_complete_article(products, article_type)
+        self.daily_stats['articles_generated'] += 1
+        
+        self.logger.info(f"記事生成完了: {article_data['title']}")
+        return article_data
+    
+    def fill_article_buffer(self, count: int):
+        """記事をまとめて生成し、一括検証を通過したものを投稿待ちに積む"""
+        generated = []
+        for _ in range(count):
+            try:
+                article_data = self.generate_article()
+            except Exception as e:
+                self.logger.error(f"事前生成でエラー: {e}")
+                self.daily_stats['errors'].append(f"事前生成: {str(e)}")
+                break
+            if article_data:
+                generated.append(article_data)
+        
+        results = self.article_validator.validate_batch(generated)
+        for result in results:
+            self.article_validator.log_result(result)
+            if result.valid:
+                self.article_buffer.append(result.article)
+            else:
+                self.daily_stats['errors'].append(f"記事検証失敗: {', '.join(result.errors)}")
+        
+        self.logger.info(f"事前生成: {len(generated)}件中 {len(self.article_buffer)}件が検証を通過")
+    
     async def generate_thumbnail_image(self, title: str, category: str) -> Optional[str]:
         """記事タイトルとカテゴリに基づいてサムネイル画像を生成"""
         try:
@@ -327,7 +438,7 @@ class MainController:
                 "category": article_data['category'],
                 "note_url": note_url,
                 "generated_at": article_data['generated_at'],
-                "products": article_data['products']
+                "products": as_dicts(article_data['products'])
             }
             
             if os.path.exists(articles_file):
@@ -346,6 +457,12 @@ class MainController:
         except Exception as e:
             self.logger.error(f"記事データ保存エラー: {e}")
     
+    def mark_article_posted(self, article_data: Dict, note_url: str):
+        """記事履歴の該当記事を投稿済みにする"""
+        history_manager = getattr(self.article_generator, 'history_manager', None)
+        if history_manager and article_data.get('history_id') is not None:
+            history_manager.mark_posted(article_data['history_id'], note_url)
+    
     def save_daily_stats(self):
         """日次統計を保存"""
         try:
@@ -384,6 +501,33 @@ class MainController:
             'errors': []
         }
     
+    async def check_affiliate_links(self):
+        """カタログと記事履歴の商品リンクのうち、有効期限切れの確認結果を更新"""
+        checker = self.product_researcher.link_health
+        if not checker:
+            return
+        try:
+            urls = LinkHealthChecker.collect_urls(
+                self.product_researcher.catalog.get_records(),
+                self._load_articles_for_link_check()
+            )
+            await checker.check(urls)
+        except Exception as e:
+            self.logger.warning(f"リンク確認に失敗（前回の結果を使用）: {e}")
+    
+    def _load_articles_for_link_check(self) -> List[Dict]:
+        """リンク確認の対象にする過去記事（記事履歴が無効なら保存済みの投稿記事を使う）"""
+        history_manager = self.article_generator.history_manager
+        if history_manager is not None:
+            return history_manager.history_data.get("articles", [])
+        articles_file = os.path.join("data", "generated_articles.json")
+        if not os.path.exists(articles_file):
+            self.logger.info("記事履歴が無効で保存済みの記事も無いため、カタログのリンクだけを確認します")
+            return []
+        self.logger.info(f"記事履歴が無効のため、{articles_file} の記事のリンクを確認します")
+        with open(articles_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
     async def run_daily_schedule(self):
         """1日のスケジュールを実行"""
         daily_posts = self.config['schedule']['daily_posts']
@@ -394,6 +538,16 @@ class MainController:
         
         self.logger.info(f"本日の投稿スケジュール開始: {daily_posts}記事予定")
         
+        # 商品リンクを確認してから計画する（リンク切れの商品は検索リンクになる）
+        await self.check_affiliate_links()
+        
+        # 1日分の商品セットをまとめて計画
+        self.daily_product_plan = self.product_researcher.plan_day(daily_posts, 3)
+        
+        # 投稿前にまとめて生成・検証しておく
+        if self.article_buffer_size > 0:
+            self.fill_article_buffer(min(self.article_buffer_size, daily_posts) - len(self.article_buffer))
+        
         for i in range(daily_posts):
             try:
                 self.logger.info(f"記事 {i+1}/{daily_posts} の投稿開始")
@@ -419,13 +573,25 @@ class MainController:
         self.save_daily_stats()
         self.logger.info("本日の投稿スケジュール完了")
     
+    async def shutdown(self):
+        """プールのブラウザを終了（スケジューラーの終了時に呼ぶ）"""
+        if self.browser_pool:
+            await self.browser_pool.stop()
+    
+    async def _run_daily_schedule_once(self):
+        # asyncio.run ごとにイベントループが変わるため、ブラウザもその日の実行の中で終了する
+        try:
+            await self.run_daily_schedule()
+        finally:
+            await self.shutdown()
+    
     def run_scheduler(self):
         """スケジューラーを実行"""
         self.logger.info("スケジューラー開始")
         
         # 毎日指定時間に実行
         schedule.every().day.at(self.config['schedule']['start_time']).do(
-            lambda: asyncio.run(self.run_daily_schedule())
+            lambda: asyncio.run(self._run_daily_schedule_once())
         )
         
         # 毎日0時に統計をリセット
@@ -442,7 +608,10 @@ async def main():
     
     # テスト実行（1記事のみ）
     print("テスト実行: 1記事を生成・投稿します")
-    success = await controller.generate_and_post_article()
+    try:
+        success = await controller.generate_and_post_article()
+    finally:
+        await controller.shutdown()
     
     if success:
         print("テスト実行成功")
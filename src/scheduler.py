@@ -184,6 +184,8 @@ class AutoPosterScheduler:
                     await self._sleep_until_next(wait_sec)
 
         finally:
+            # 実行中ずっと起動していたブラウザを終了
+            await self.controller.shutdown()
             print("システムを終了します")
 
     def run(self):
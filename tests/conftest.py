@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# リポジトリのルートから modules パッケージを読み込む
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.stub_product_server import StubProductServer  # noqa: E402
+
+
+@pytest.fixture
+def stub_server():
+    """空きポートで起動した商品ページのスタブサーバー"""
+    server = StubProductServer(port=0).start()
+    try:
+        yield server
+    finally:
+        server.stop()
@@ -0,0 +1,41 @@
+import json
+
+from modules.affiliate_links import normalize_affiliate_link, retag_text
+from modules.affiliate_retag import retag_file
+from modules.article_history_manager import generate_content_hash
+
+
+def test_url_followed_by_japanese_text():
+    text = "詳細はhttps://www.amazon.co.jp/dp/B000TEST?tag=x-22をご覧ください"
+
+    # 直後の日本語はURLに含めず、本文はそのまま残す
+    assert retag_text(text, "new-22") == "詳細はhttps://www.amazon.co.jp/dp/B000TEST?tag=new-22&language=ja_JPをご覧ください"
+
+
+def test_trailing_punctuation_and_markdown_brackets_stay_outside():
+    text = "[商品](https://amazon.com/dp/B000TEST)。 https://www.amazon.co.jp/dp/B000TEST."
+
+    assert retag_text(text, "new-22") == (
+        "[商品](https://www.amazon.co.jp/dp/B000TEST?tag=new-22&language=ja_JP)。 "
+        "https://www.amazon.co.jp/dp/B000TEST?tag=new-22&language=ja_JP.")
+
+
+def test_repeated_query_parameters_are_kept():
+    link = normalize_affiliate_link("https://www.amazon.co.jp/s?k=a&rh=p_1&rh=p_2&tag=old-22", "new-22")
+
+    assert link == "https://www.amazon.co.jp/s?k=a&rh=p_1&rh=p_2&tag=new-22&language=ja_JP"
+
+
+def test_retag_file_recomputes_history_hash(tmp_path):
+    content = "おすすめ https://www.amazon.co.jp/dp/B000TEST?tag=old-22 です"
+    history = {"articles": [{"id": 1, "content": content, "content_hash": generate_content_hash(content),
+                             "content_length": len(content)}]}
+    path = tmp_path / "article_history.json"
+    path.write_text(json.dumps(history, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    retag_file(str(path), "new-22")
+    article = json.loads(path.read_text(encoding="utf-8"))["articles"][0]
+
+    assert "tag=new-22" in article["content"]
+    assert article["content_hash"] == generate_content_hash(article["content"])
+    assert article["content_length"] == len(article["content"])
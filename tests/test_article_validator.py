@@ -0,0 +1,32 @@
+from modules.article_validator import ArticleValidator
+from modules.markdown_document import AFFILIATE_DISCLAIMER
+
+
+def _article(content):
+    return {"title": "テスト記事", "content": content, "tags": ["#テスト"], "category": "書籍",
+            "article_type": "レビュー",
+            "products": [{"name": "テスト商品", "url": "https://www.amazon.co.jp/dp/B000TEST"}]}
+
+
+def test_sections_without_blank_lines_are_accepted_and_repaired():
+    content = ("## 概要\n" + "本文です。" * 20 + "\n## メリット\n1. よい\n## デメリット\n1. 重い\n"
+               "## まとめ\nおわり")
+
+    result = ArticleValidator(min_length=100).validate(_article(content))
+
+    assert result.valid, result.errors
+    # 見出しは残したまま、不足しているリンクと免責事項だけを補う
+    assert set(result.repairs) == {"商品リンクを末尾に追加", "免責事項を冒頭に追加"}
+    document = result.article["document"]
+    assert document.headings == ["概要", "メリット", "デメリット", "まとめ"]
+    assert document.link_urls == ["https://www.amazon.co.jp/dp/B000TEST"]
+    assert result.article["content"].startswith(AFFILIATE_DISCLAIMER)
+
+
+def test_missing_section_is_still_rejected():
+    content = "## 概要\n" + "本文です。" * 20 + "\n## デメリット\n1. 重い\n## まとめ\nおわり"
+
+    result = ArticleValidator(min_length=100).validate(_article(content))
+
+    assert not result.valid
+    assert result.errors == ["見出し「メリット」がありません"]
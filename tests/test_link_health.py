@@ -0,0 +1,76 @@
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from modules.link_health import LinkHealthChecker  # noqa: E402
+
+
+def _url(asin):
+    return f"https://www.amazon.co.jp/dp/{asin}"
+
+
+@pytest.fixture
+def checker(stub_server, tmp_path):
+    return LinkHealthChecker(str(tmp_path / "link_health.json"), base_url=stub_server.base_url,
+                             timeout=5, failure_threshold=2)
+
+
+def test_ok_and_missing_links(stub_server, checker):
+    stub_server.catalog.set_product("B000000001", price=1000)
+    stub_server.catalog.set_missing("B000000002")
+
+    first = checker.check_sync([_url("B000000001"), _url("B000000002")])
+    assert first[_url("B000000001")]["broken"] is False
+    # 1回目の404ではまだリンク切れにしない
+    assert first[_url("B000000002")]["failures"] == 1
+    assert not checker.is_broken(_url("B000000002"))
+
+    # 疑いのあるリンクだけ、有効期限内でも確かめ直す
+    second = checker.check_sync([_url("B000000001"), _url("B000000002")])
+    assert list(second) == [_url("B000000002")]
+    assert checker.is_broken(_url("B000000002"))
+    assert not checker.is_broken(_url("B000000001"))
+
+
+def test_redirect_to_search_page_is_broken(stub_server, checker):
+    stub_server.catalog.set_redirect("B000000003", "/s?k=B000000003")
+
+    checker.check_sync([_url("B000000003")])
+    checker.check_sync([_url("B000000003")])
+
+    result = checker.results[_url("B000000003")]
+    assert result["broken"] and result["reason"] == "redirected_away"
+
+
+@pytest.mark.parametrize("block", ["captcha", "signin", "error"])
+def test_blocked_or_failing_responses_keep_previous_state(stub_server, checker, block):
+    asin = "B000000004"
+    stub_server.catalog.set_product(asin, price=1000)
+    checker.check_sync([_url(asin)])
+    before = dict(checker.results[_url(asin)])
+
+    if block == "captcha":
+        stub_server.catalog.set_captcha(asin)
+    elif block == "signin":
+        stub_server.catalog.set_redirect(asin, "/ap/signin?openid.return_to=x")
+    else:
+        stub_server.catalog.set_error(asin, 503)
+    for _ in range(3):
+        assert checker.check_sync([_url(asin)], force=True) == {}
+
+    assert checker.results[_url(asin)] == before
+    assert not checker.is_broken(_url(asin))
+
+
+def test_ok_response_resets_failures(stub_server, checker):
+    asin = "B000000005"
+    stub_server.catalog.set_missing(asin)
+    checker.check_sync([_url(asin)])
+    stub_server.catalog.clear(asin)
+    stub_server.catalog.set_product(asin, price=1000)
+    checker.check_sync([_url(asin)])
+    stub_server.catalog.set_missing(asin)
+    checker.check_sync([_url(asin)], force=True)
+
+    result = checker.results[_url(asin)]
+    assert result["failures"] == 1 and not result["broken"]
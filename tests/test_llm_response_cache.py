@@ -0,0 +1,26 @@
+from modules.llm_response_cache import LLMResponseCache
+
+
+def test_hits_survive_restart_in_lru_order(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), max_entries=2, access_flush_hits=100)
+    cache.put("hot", "title", {"content": "hot"})
+    cache.put("cold", "title", {"content": "cold"})
+    assert cache.get("hot", "title") == {"content": "hot"}
+    cache.flush()
+
+    # 再起動後も、参照した「hot」ではなく「cold」が先に削除される
+    restarted = LLMResponseCache(str(tmp_path), max_entries=2)
+    restarted.put("new", "title", {"content": "new"})
+
+    assert set(restarted.index) == {"hot", "new"}
+
+
+def test_hits_are_written_back_in_batches(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), access_flush_hits=2)
+    cache.put("key", "title", {"content": "value"})
+    saved = LLMResponseCache(str(tmp_path)).index["key"]["last_access"]
+
+    cache.get("key", "title")
+    assert LLMResponseCache(str(tmp_path)).index["key"]["last_access"] == saved
+    cache.get("key", "title")
+    assert LLMResponseCache(str(tmp_path)).index["key"]["last_access"] > saved
@@ -0,0 +1,39 @@
+from modules.markdown_document import HEADING, LINK_CARD, PARAGRAPH, ArticleDocument, Block
+
+CONTENT = "## 概要\n本文です。\n## メリット\n1. よい\n## まとめ\nおわり"
+
+
+def test_headings_without_blank_lines_start_new_sections():
+    document = ArticleDocument.parse(CONTENT)
+
+    assert document.headings == ["概要", "メリット", "まとめ"]
+    assert document.find_section("メリット", exclude="デメリット") == ("メリット", 1, 2)
+    # 空行を補わずに元のMarkdownへ戻せる
+    assert document.to_markdown() == CONTENT
+
+
+def test_structure_matches_heading_lines_and_blank_line_paragraphs():
+    document = ArticleDocument.parse("## 概要\n本文です。\n## メリット\nよい\n\n## まとめ\nおわり")
+
+    assert document.get_structure() == {"headings": ["概要", "メリット", "まとめ"], "paragraph_count": 2}
+
+
+def test_url_line_inside_paragraph_becomes_link_card():
+    document = ArticleDocument.parse("詳細はこちら。\nhttps://www.amazon.co.jp/dp/B000TEST\n続きの文章です。")
+
+    assert [block.kind for block in document.blocks] == [PARAGRAPH, LINK_CARD, PARAGRAPH]
+    assert document.link_urls == ["https://www.amazon.co.jp/dp/B000TEST"]
+    assert document.input_blocks()[1] == ("link_card", "https://www.amazon.co.jp/dp/B000TEST")
+
+
+def test_insertion_after_section_without_blank_lines():
+    document = ArticleDocument.parse(CONTENT)
+    _, _, end = document.find_section("メリット")
+
+    linked = document.with_insertions({end: [Block(PARAGRAPH, "おすすめです。"),
+                                             Block.link_card("https://www.amazon.co.jp/dp/B000TEST")]})
+
+    assert linked.to_markdown() == ("## 概要\n本文です。\n## メリット\n1. よい\n\nおすすめです。\n\n"
+                                    "https://www.amazon.co.jp/dp/B000TEST\n\n## まとめ\nおわり")
+    assert ArticleDocument.parse(linked.to_markdown()).headings == ["概要", "メリット", "まとめ"]
+    assert linked.blocks[-1].kind == HEADING
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from modules import product_enricher  # noqa: E402
+from modules.product_enricher import ProductEnricher  # noqa: E402
+
+
+def _write_catalog(path, products):
+    catalog = {"version": 1, "genres": {}, "products": products}
+    path.write_text(json.dumps(catalog, ensure_ascii=False), encoding="utf-8")
+
+
+def _product(product_id, asin, price_range):
+    return {"id": product_id, "genre": "書籍", "name": product_id, "keywords": [],
+            "price_range": price_range, "description": "", "link": f"https://www.amazon.co.jp/dp/{asin}"}
+
+
+def _load_products(path):
+    return {record["id"]: record for record in json.loads(path.read_text(encoding="utf-8"))["products"]}
+
+
+def test_enrich_stores_current_price_apart_from_price_range(stub_server, tmp_path):
+    stub_server.catalog.set_product("B000000001", price=20000, availability="在庫あり。")
+    stub_server.catalog.set_product("B000000002", price=40000, availability="残り1点")
+    stub_server.catalog.set_missing("B000000003")
+    catalog_file = tmp_path / "catalog.json"
+    _write_catalog(catalog_file, [
+        _product("inside", "B000000001", "15000-30000"),
+        _product("outside", "B000000002", "15000-30000"),
+        _product("missing", "B000000003", "1000-2000"),
+        {**_product("search", "B000000004", "500"), "link": "SEARCH:本"}
+    ])
+
+    enricher = ProductEnricher(str(tmp_path / "cache.json"), base_url=stub_server.base_url, max_retries=0)
+    result = enricher.enrich_catalog(str(catalog_file))
+    products = _load_products(catalog_file)
+
+    # 手書きの価格帯は変えず、取得した価格は price に取得日時つきで保存する
+    assert products["inside"]["price_range"] == "15000-30000"
+    assert products["outside"]["price_range"] == "15000-30000"
+    assert products["inside"]["price"] == 20000
+    assert products["outside"]["price"] == 40000
+    assert products["outside"]["price_checked_at"]
+    assert products["inside"]["availability"] == "在庫あり。"
+    assert products["outside"]["availability"] == "残り1点"
+    # 取得できなかった商品・検索リンクの商品はそのまま
+    assert products["missing"]["price_range"] == "1000-2000"
+    assert "price" not in products["missing"] and "availability" not in products["missing"]
+    assert products["search"]["price_range"] == "500"
+    assert result["version"] == 2
+
+    # 一時的な値上がりの後の値下がりも price に反映され、価格帯は広がらない
+    stub_server.catalog.set_product("B000000002", price=12000)
+    enricher = ProductEnricher(str(tmp_path / "cache.json"), base_url=stub_server.base_url, max_retries=0)
+    result = enricher.enrich_catalog(str(catalog_file))
+    products = _load_products(catalog_file)
+    assert products["outside"]["price"] == 12000
+    assert products["outside"]["price_range"] == "15000-30000"
+    assert result["changed"] == 1 and result["version"] == 3
+
+
+def test_enrich_fills_empty_price_range(stub_server, tmp_path):
+    stub_server.catalog.set_product("B000000001", price=3000)
+    catalog_file = tmp_path / "catalog.json"
+    _write_catalog(catalog_file, [_product("blank", "B000000001", "")])
+
+    ProductEnricher(str(tmp_path / "cache.json"), base_url=stub_server.base_url).enrich_catalog(str(catalog_file))
+
+    assert _load_products(catalog_file)["blank"]["price_range"] == "3000"
+
+
+def test_retry_honors_retry_after(stub_server, tmp_path, monkeypatch):
+    stub_server.catalog.set_product("B000000001", price=1500)
+    stub_server.catalog.set_error("B000000001", 429, retry_after=7, times=1)
+    catalog_file = tmp_path / "catalog.json"
+    _write_catalog(catalog_file, [_product("book", "B000000001", "1000-2000")])
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(product_enricher.asyncio, "sleep", fake_sleep)
+    result = ProductEnricher(str(tmp_path / "cache.json"), base_url=stub_server.base_url,
+                             max_retries=1).enrich_catalog(str(catalog_file))
+
+    assert 7 in delays
+    assert result["ok"] == 1
+    assert _load_products(catalog_file)["book"]["price"] == 1500
+
+
+def test_enrich_uses_conditional_requests(stub_server, tmp_path):
+    stub_server.catalog.set_product("B000000001", price=1500)
+    catalog_file = tmp_path / "catalog.json"
+    _write_catalog(catalog_file, [_product("book", "B000000001", "1000-2000")])
+    cache_file = str(tmp_path / "cache.json")
+
+    first = ProductEnricher(cache_file, base_url=stub_server.base_url).enrich_catalog(str(catalog_file))
+    second = ProductEnricher(cache_file, base_url=stub_server.base_url).enrich_catalog(str(catalog_file))
+
+    assert first["ok"] == 1
+    # 2回目は ETag による304で、価格は変わらず version も上げない
+    assert second["not_modified"] == 1 and second["ok"] == 0
+    assert second["changed"] == 0 and second["version"] == first["version"]
+    assert _load_products(catalog_file)["book"]["price_range"] == "1000-2000"
+    assert _load_products(catalog_file)["book"]["price"] == 1500
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from modules.article_history_manager import ArticleHistoryManager
+from modules.rotation_planner import PENDING_RETENTION, RotationPlanner
+
+
+def _add(history, name):
+    return history.add_article({"title": name, "content": name, "category": "書籍",
+                                "products": [{"name": name, "selected_category": "書籍"}]})
+
+
+def test_unposted_articles_are_tracked_without_rescanning_history(tmp_path):
+    history = ArticleHistoryManager(str(tmp_path / "history.json"))
+    planner = RotationPlanner(history, seed=1)
+    failed = _add(history, "failed")
+    later = _add(history, "later")
+    history.mark_posted(later)
+
+    planner.choose_genre(["書籍"])
+
+    # 投稿待ちの記事があっても、履歴は次回から新しい記事だけを読む
+    assert planner._scan_from == 2
+    assert list(planner._pending_articles) == [failed]
+    assert planner.product_use_count == {"later": 1}
+
+    history.mark_posted(failed)
+    planner.choose_genre(["書籍"])
+    planner.choose_genre(["書籍"])
+
+    assert planner.product_use_count == {"later": 1, "failed": 1}
+    assert planner._pending_articles == {}
+
+
+def test_old_unposted_articles_stop_being_tracked(tmp_path):
+    history = ArticleHistoryManager(str(tmp_path / "history.json"))
+    planner = RotationPlanner(history, seed=1)
+    _add(history, "failed")
+    history.history_data["articles"][0]["created_at"] = (
+        datetime.now() - PENDING_RETENTION - timedelta(hours=1)).isoformat()
+
+    planner.choose_genre(["書籍"])
+
+    assert planner._scan_from == 1
+    assert planner._pending_articles == {}
+    assert planner.product_use_count == {}